@@ -1,10 +1,10 @@
-from PySide6.QtWidgets import QDialog, QDialogButtonBox, QVBoxLayout, QListWidget, QListWidgetItem, QCheckBox
+from PySide6.QtWidgets import QDialog, QDialogButtonBox, QVBoxLayout, QListWidget, QListWidgetItem, QCheckBox, QLabel
 
-from asdf import ASDF
+from prefetch import Prefetcher
 
 
 class AddPluginDialog(QDialog):
-    def __init__(self, asdf: ASDF):
+    def __init__(self, prefetcher: Prefetcher):
         super().__init__()
         self.plugin = None
         self.setWindowTitle("Add plugin")
@@ -14,19 +14,42 @@ class AddPluginDialog(QDialog):
         self.button_box.rejected.connect(super().reject)
         self.install_latest_checkbox = QCheckBox("Install latest version and set as GLOBAL version")
         self.install_latest_checkbox.setChecked(True)
+        self.status_label = QLabel("Loading plugins…")
         self.layout = QVBoxLayout()
         self.listbox = QListWidget()
         self.layout.addWidget(self.listbox)
+        self.layout.addWidget(self.status_label)
         self.layout.addWidget(self.install_latest_checkbox)
         self.layout.addWidget(self.button_box)
         self.setLayout(self.layout)
-        all_plugins = set(asdf.plugins_list_all())
-        installed_plugins = set(asdf.plugins_list_installed())
+        self.listbox.currentItemChanged.connect(self.current_item_changed)
+
+        # Opens straight away; `plugin list all` may have to sync the plugin index first
+        self.loaded = False
+        prefetcher.fetched.connect(self.fetched)
+        self.futures = {kind: prefetcher.get(kind, fresh=kind == 'plugins-installed')
+                        for kind in ('plugins-all', 'plugins-installed')}
+        self.fetched('plugins-all', '', None)
+
+
+    def result(self, kind: str) -> list[str]:
+        future = self.futures[kind]
+        return (future.result() if future.done() and future.exception() is None else None) or []
+
+
+    def fetched(self, kind: str, plugin: str, value):
+        if kind not in self.futures or self.loaded or not all(f.done() for f in self.futures.values()):
+            return
+        self.loaded = True
+        all_plugins = set(self.result('plugins-all'))
+        installed_plugins = set(self.result('plugins-installed'))
         not_installed_plugins = sorted(list(all_plugins - installed_plugins))
         self.listbox.addItems(not_installed_plugins)
-        self.listbox.currentItemChanged.connect(self.current_item_changed)
+        self.status_label.setText(f"{len(not_installed_plugins)} plugins available")
 
 
     def current_item_changed(self, current: QListWidgetItem):
+        if current is None:
+            return
         self.plugin = current.text()
         self.button_box.button(QDialogButtonBox.Ok).setEnabled(True)
@@ -1,17 +1,17 @@
-from PySide6.QtWidgets import QDialog, QDialogButtonBox, QVBoxLayout, QListWidget, QListWidgetItem, QHBoxLayout, \
-    QCheckBox
+from PySide6.QtCore import QModelIndex
+from PySide6.QtWidgets import QDialog, QDialogButtonBox, QVBoxLayout, QListView, QHBoxLayout, QCheckBox, QLineEdit, \
+    QLabel
 
-from utils import semver_sort
-from asdf import ASDF
+from prefetch import Prefetcher
+from version_model import VersionListModel
 
 
 class AddVersionDialog(QDialog):
-    def __init__(self, asdf: ASDF, plugin: str):
+    def __init__(self, prefetcher: Prefetcher, plugin: str):
         super().__init__()
         self.plugin = plugin
         self.version = None
-        latest = asdf.latest_version(plugin) or "(unknown)"
-        self.setWindowTitle(f"Add version for {plugin} (latest={latest})")
+        self.setWindowTitle(f"Add version for {plugin} (latest=…)")
         self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.button_box.button(QDialogButtonBox.Ok).setEnabled(False)
         self.button_box.accepted.connect(self.accept)
@@ -22,19 +22,67 @@ class AddVersionDialog(QDialog):
         self.set_local_version = QCheckBox("Set as local version")
         self.check_layout.addWidget(self.set_global_version)
         self.check_layout.addWidget(self.set_local_version)
+        self.filter_layout = QHBoxLayout()
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter (^ for prefix)")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.stable_only = QCheckBox("Stable only")
+        self.group_major = QCheckBox("Newest per major line")
+        self.filter_layout.addWidget(self.filter_edit)
+        self.filter_layout.addWidget(self.stable_only)
+        self.filter_layout.addWidget(self.group_major)
+        self.count_label = QLabel("Loading versions…")
         self.layout = QVBoxLayout()
-        self.listbox = QListWidget()
+        self.model = VersionListModel(parent=self)
+        self.listbox = QListView()
+        self.listbox.setUniformItemSizes(True)
+        self.listbox.setModel(self.model)
+        self.layout.addLayout(self.filter_layout)
         self.layout.addWidget(self.listbox)
+        self.layout.addWidget(self.count_label)
         self.layout.addLayout(self.check_layout)
         self.layout.addWidget(self.button_box)
         self.setLayout(self.layout)
-        all_versions = set(asdf.versions_list_all(plugin))
-        all_installed_versions = set(asdf.versions_list_installed(plugin)[0])
-        not_installed_versions = semver_sort(list(all_versions - all_installed_versions))
-        self.listbox.addItems(not_installed_versions)
-        self.listbox.currentItemChanged.connect(self.current_item_changed)
+        self.listbox.selectionModel().currentChanged.connect(self.current_item_changed)
+        self.model.modelReset.connect(self.filter_changed)
+        self.filter_edit.textChanged.connect(lambda text: self.model.set_filter(query=text))
+        self.stable_only.toggled.connect(lambda checked: self.model.set_filter(stable_only=checked))
+        self.group_major.toggled.connect(lambda checked: self.model.set_filter(group_major=checked))
 
+        # Opens straight away; the lists fill in as the (possibly prefetched) data arrives
+        self.prefetcher = prefetcher
+        self.loaded = False
+        prefetcher.fetched.connect(self.fetched)
+        self.futures = {kind: prefetcher.get(kind, plugin, fresh=kind == 'installed')
+                        for kind in ('latest', 'list-all', 'installed')}
+        for kind, future in self.futures.items():
+            if future.done():
+                self.fetched(kind, plugin, self.result(kind))
 
-    def current_item_changed(self, current: QListWidgetItem):
-        self.version = current.text()
-        self.button_box.button(QDialogButtonBox.Ok).setEnabled(True)
+
+    def result(self, kind: str):
+        future = self.futures[kind]
+        return future.result() if future.done() and future.exception() is None else None
+
+
+    def fetched(self, kind: str, plugin: str, value):
+        if plugin != self.plugin or kind not in self.futures:
+            return
+        if kind == 'latest':
+            self.setWindowTitle(f"Add version for {self.plugin} (latest={value or '(unknown)'})")
+        elif not self.loaded and all(self.futures[k].done() for k in ('list-all', 'installed')):
+            self.loaded = True
+            all_versions = self.result('list-all') or []
+            all_installed_versions = set(self.result('installed') or [])
+            self.model.set_versions([v for v in dict.fromkeys(all_versions) if v not in all_installed_versions])
+
+
+    def filter_changed(self):
+        if self.loaded:
+            self.count_label.setText(f"{self.model.rowCount()} of {self.model.total()} versions")
+        self.current_item_changed(self.listbox.currentIndex())
+
+
+    def current_item_changed(self, current: QModelIndex):
+        self.version = self.model.version(current)
+        self.button_box.button(QDialogButtonBox.Ok).setEnabled(self.version is not None)
@@ -1,205 +1,110 @@
-import os
-import re
-from pathlib import Path
-from shutil import which
-from subprocess import run
+from contextlib import contextmanager
 
+from PySide6.QtCore import QObject, QRunnable, QThread, QThreadPool, Signal
 from PySide6.QtGui import QCursor, Qt
 from PySide6.QtWidgets import QApplication
 
-from log import LogWidget
-
-
-class ASDF:
-    def __init__(self, log_widget: LogWidget | None = None, path: Path | None = None):
-        self.log_widget = log_widget
-        default_path = Path('~/.asdf/bin').expanduser()
-        default_bin = default_path / 'asdf'
-        self.env_path = ':'.join([default_path.as_posix(), os.environ['PATH']])
-        which_ = which('asdf', path=self.env_path)
-        which_bin = Path(which_) if which_ is not None else None
-        self.asdf_bin = path or which_bin or default_bin
-        if not self.asdf_bin.exists():
-            log_widget.error(f"`asdf` binary not found in {self.env_path!r}")
-        self.current_path = Path(os.curdir).resolve()
-        self.current_pattern = re.compile(r"""(\S+)\s+(\S+)\s+(.*)""")
-
-
-    def asdf(self, params: list[str] | None = None, log_output: bool = True, log_success: bool = False) -> list[str]:
-        QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
-        if not self.asdf_bin.exists():
-            msg = f"asdf binary not found at {self.asdf_bin}."
-            if self.log_widget is not None:
-                self.log_widget.error(msg)
-            print(msg)
-            return []
+from asdf_core import ASDFCore
+from metrics import caller
+from plugin_update import PluginUpdate
+from process import CommandHandle, CommandResult
 
-        try:
-            params = params or []
-            cmd = [self.asdf_bin.as_posix()] + params
-
-            if log_output and self.log_widget is not None:
-                self.log_widget.cmd(' '.join(cmd))
-
-            #path = ':'.join([os.environ['PATH'], Path('~/.asdf/bin').expanduser().as_posix()])
-            process = run(cmd, capture_output=True, cwd=self.current_path.as_posix(),
-                          env={**os.environ, 'PATH': self.env_path})
-
-            stdout_lines = [p.decode() for p in process.stdout.splitlines()]
-            if log_output:
-                if stdout_lines and self.log_widget is not None:
-                    [self.log_widget.info(line) for line in stdout_lines]
-                # else:
-                #    self.log_widget.info("(stdout empty)")
-
-            stderr_lines = [p.decode() for p in process.stderr.splitlines()]
-            if log_output:
-                if stderr_lines and self.log_widget is not None:
-                    [self.log_widget.stderr(line) for line in stderr_lines]
-                # else:
-                #    self.log_widget.info("(stderr empty)")
-
-            if process.returncode != 0 and self.log_widget is not None:
-                self.log_widget.error(f"Command {' '.join(cmd)!r} returned error code {process.returncode}.")
-                return []
-
-            if log_success and self.log_widget is not None:
-                self.log_widget.ok(f"Command {' '.join(cmd)!r} completed successfully.")
-
-            return stdout_lines + stderr_lines
-        except Exception as e:
-            self.log_widget.ok(f"Command {' '.join(cmd)!r} failed: {e}")
-        finally:
-            QApplication.restoreOverrideCursor()
-
-
-    def info(self):
-        return self.asdf(['info'])
-
-
-    def plugins_list_all(self):
-        return [p.split()[0] for p in self.asdf(['plugin', 'list', 'all'], log_output=False)]
-
-
-    def plugins_list_installed(self) -> list[str]:
-        return self.asdf(['plugin', 'list'], log_output=False)
-
-
-    def versions_list_installed(self, plugin: str) -> tuple[list[str], str | None]:
-        output = self.asdf(['list', plugin], log_output=False)
-        current = None
-        versions = []
-        for line in output:
-            striped_line = line.strip()
-            if striped_line.startswith('*'):
-                current = striped_line[1:]
-                versions.append(current)
-            else:
-                versions.append(striped_line)
-        return versions, current
-
-
-    def versions_list_all(self, plugin: str) -> list[str]:
-        return self.asdf(['list', 'all', plugin], log_output=False)
-
-
-    def set_global_version(self, plugin: str, version: str) -> list[str]:
-        return self.asdf(['global', plugin, version])
-
-
-    def set_local_version(self, plugin: str, version: str) -> list[str]:
-        return self.asdf(['local', plugin, version])
 
+class PluginUpdateSignals(QObject):
+    finished = Signal(list)  # [PluginUpdate]
 
-    def update_plugin(self, plugin: str) -> list[str]:
-        return self.asdf(['plugin', 'update', plugin])
 
+class PluginUpdateTask(QRunnable):
+    # Git fetches take seconds, so `update_plugins_async` runs them here and reports back through `signals`
+    def __init__(self, asdf: ASDFCore, plugins: list[str]):
+        super().__init__()
+        self.asdf = asdf
+        self.plugins = plugins
+        self.signals = PluginUpdateSignals()
 
-    def add_version(self, plugin: str, version: str) -> list[str]:
-        if version is None:
-            self.log_widget.error(f"Invalid version for plugin {plugin}.")
-            return []
-        self.log_widget.warning(f"Installing {plugin} {version}. This may take a few moments...")
-        output = self.asdf(['install', plugin, version], log_success=True)
-        return output
 
+    def run(self):
+        self.signals.finished.emit(self.asdf.fetch_plugin_updates(self.plugins))
 
-    def add_plugin(self, plugin: str) -> list[str]:
-        return self.asdf(['plugin', 'add', plugin])
 
+class ASDF(ASDFCore):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updating_plugins: set[str] = set()
+        self.update_tasks: set[PluginUpdateTask] = set()
 
-    def remove_plugin(self, plugin: str) -> list[str]:
-        return self.asdf(['plugin', 'remove', plugin])
 
+    @staticmethod
+    def in_gui_thread() -> bool:
+        app = QApplication.instance()
+        return app is not None and QThread.currentThread() is app.thread()
 
-    def where_version(self, plugin: str, version: str) -> str | None:
-        output = self.asdf(['where', plugin, version])
-        return output[0] if output else None
 
-
-    def uninstall_version(self, plugin: str, version: str) -> list[str]:
-        return self.asdf(['uninstall', plugin, version])
-
-
-    def reshim_version(self, plugin: str, version: str) -> list[str]:
-        return self.asdf(['reshim', plugin, version])
-
-
-    def update_all_plugins(self) -> list[str]:
-        return self.asdf(['plugin', 'update', '--all'])
-
-
-    def current_versions(self) -> dict:
-        current = {}
-        output = self.asdf(['current'], log_output=False)
-        for line in output:
-            if (m := self.current_pattern.match(line)) is not None:
-                current[m.group(1)] = (m.group(2), m.group(3))
-        return current
-
-
-    def update_asdf(self) -> list[str]:
-        return self.asdf(['update'])
-
-
-    def latest_version(self, plugin: str) -> str | None:
-        output = self.asdf(['latest', plugin])
-        return output[0] if output else None
-
-
-    def set_local_system(self, plugin: str):
-        return self.asdf(['local', plugin, 'system'])
-
-
-    def set_global_system(self, plugin: str):
-        return self.asdf(['global', plugin, 'system'])
-
-
-    def install_versions(self):
-        return self.asdf(['install'])
-
-
-    def remove_local_version(self, plugin: str):
-        tool_version_path = self.current_path / '.tool-versions'
-        if not tool_version_path.exists():
-            self.log_widget.error(f".tool-versions file not found in {self.current_path}.")
-            return
-
-        current_lines = tool_version_path.read_text('utf-8').splitlines()
-        if current_lines:
-            self.log_widget.info(f"Existing {tool_version_path} file:")
-            [self.log_widget.info(line) for line in current_lines]
-        else:
-            self.log_widget.error(f"{tool_version_path} file is empty.")
-            return
-
-        new_lines = [line for line in current_lines if not line.startswith(plugin)]
-        if new_lines != current_lines:
-            if not new_lines:
-                self.log_widget.warning(f"Updated {tool_version_path} file is now empty.")
-            else:
-                self.log_widget.info(f"Updated {tool_version_path} file:")
-                [self.log_widget.info(line) for line in new_lines]
-            tool_version_path.write_text('\n'.join(new_lines), 'utf-8')
-        else:
-            self.log_widget.error(f"{plugin} not found in {tool_version_path}.")
+    @contextmanager
+    def busy(self):
+        # Refresh workers call in here too; the override cursor belongs to the GUI thread only
+        gui_thread = self.in_gui_thread()
+        if gui_thread:
+            QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
+        try:
+            yield
+        finally:
+            if gui_thread:
+                QApplication.restoreOverrideCursor()
+
+
+    def asdf_async(self, params: list[str] | None = None, log_output: bool = True, log_success: bool = False,
+                   parent: QObject | None = None) -> CommandHandle:
+        cmd = [self.asdf_bin.as_posix()] + (params or [])
+        handle = CommandHandle(cmd, cwd=self.current_path.as_posix(), env=self.subprocess_env(),
+                               parent=parent)
+        caller_name = caller()
+        handle.finished.connect(lambda result: self.record_result(result, caller_name))
+        if self.log_widget is not None:
+            if log_output:
+                self.log_widget.cmd(' '.join(cmd))
+                handle.stdoutLine.connect(self.log_widget.info)
+                handle.stderrLine.connect(self.log_widget.stderr)
+            handle.finished.connect(lambda result: self.log_result(result, log_success))
+        handle.start()
+        return handle
+
+
+    def record_result(self, result: CommandResult, caller_name: str):
+        output_bytes = sum(len(line) + 1 for line in result.stdout_lines + result.stderr_lines)
+        self.metrics.record(result.cmd, self.metrics.now() - result.elapsed, result.elapsed, result.returncode,
+                            output_bytes, caller_name)
+
+
+    def log_result(self, result: CommandResult, log_success: bool = False):
+        cmd = ' '.join(result.cmd)
+        if result.error is not None:
+            self.log_widget.error(f"Command {cmd!r} failed: {result.error}")
+        elif result.cancelled:
+            self.log_widget.warning(f"Command {cmd!r} was cancelled.")
+        elif result.returncode != 0:
+            self.log_widget.error(f"Command {cmd!r} returned error code {result.returncode}.")
+        elif log_success:
+            self.log_widget.ok(f"Command {cmd!r} completed successfully.")
+
+
+    def update_plugins_async(self, plugins: list[str] | None = None) -> PluginUpdateSignals:
+        # `finished` is emitted on the GUI thread after the updates have been logged and moved plugins invalidated.
+        # Plugins that are still updating from an earlier request are left out of this one.
+        plugins = [p for p in (plugins if plugins is not None else self.plugins_list_installed())
+                   if p not in self.updating_plugins]
+        task = PluginUpdateTask(self.worker_copy(), plugins)
+        task.setAutoDelete(False)
+        self.updating_plugins.update(plugins)
+        self.update_tasks.add(task)
+        if self.log_widget is not None and plugins:
+            self.log_widget.info(f"Updating {len(plugins)} plugin(s)...")
+        task.signals.finished.connect(lambda updates: self.plugin_updates_finished(task, updates))
+        QThreadPool.globalInstance().start(task)
+        return task.signals
+
+
+    def plugin_updates_finished(self, task: PluginUpdateTask, updates: list[PluginUpdate]):
+        self.update_tasks.discard(task)
+        self.updating_plugins.difference_update(task.plugins)
+        self.report_plugin_updates(updates)
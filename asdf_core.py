@@ -0,0 +1,525 @@
+import copy
+import os
+import re
+import sys
+import tarfile
+from contextlib import nullcontext
+from pathlib import Path
+from shutil import which
+from subprocess import run
+from time import perf_counter
+from typing import Protocol
+
+from cache import DiskCache, git_head, LATEST_TTL, LIST_ALL_TTL, PLUGINS_ALL_TTL
+from coprocess import CoprocessPool, is_read_only
+from disk_usage import format_size
+from metrics import Metrics, caller
+from native import NativeBackend, NO_VERSION_SET
+from plugin_update import FAILED, TIMED_OUT, PluginUpdate, PluginUpdater
+from roots import Root, default_root
+from snapshots import SnapshotStore
+from toolversions import ToolVersionsCache
+from versioning import latest_in_line, latest_stable, version_key
+
+
+class Log(Protocol):
+    def info(self, line: str): ...
+    def cmd(self, line: str): ...
+    def ok(self, line: str | None = None): ...
+    def warning(self, line: str): ...
+    def error(self, line: str): ...
+    def stderr(self, line: str): ...
+
+
+class ASDFCore:
+    def __init__(self, log_widget: Log | None = None, path: Path | None = None, root: Root | None = None):
+        self.log_widget = log_widget
+        self.root = root or default_root()
+        default_path = Path('~/.asdf/bin').expanduser()
+        default_bin = default_path / 'asdf'
+        self.env_path = ':'.join([default_path.as_posix(), os.environ['PATH']])
+        which_ = which('asdf', path=self.env_path)
+        which_bin = Path(which_) if which_ is not None else None
+        self.asdf_bin = path or self.root.asdf_bin() or which_bin or default_bin
+        if not self.asdf_bin.exists() and log_widget is not None:
+            log_widget.error(f"`asdf` binary not found in {self.env_path!r}")
+        self.current_path = Path(os.curdir).resolve()
+        self.current_pattern = re.compile(r"""(\S+)\s+(\S+)\s+(.*)""")
+        self.data_dir = self.root.data_dir
+        self.coprocesses = CoprocessPool.create(self.asdf_bin)
+        self.metrics = Metrics()
+        self.cache = DiskCache(self.root.cache_path(), metrics=self.metrics)
+        self.tool_versions_cache = ToolVersionsCache()
+        self.snapshots = SnapshotStore.create()
+        # ASDFG_BACKEND=subprocess forces every query through the asdf script
+        native = NativeBackend(self.data_dir, self.tool_versions_cache)
+        use_native = os.environ.get('ASDFG_BACKEND', 'native') == 'native' and native.available()
+        self.native = native if use_native else None
+
+
+    def worker_copy(self) -> 'ASDFCore':
+        # Worker threads must not touch the log widget; everything else (caches, coprocesses, snapshots) is shared,
+        # so invalidations reach the workers and nothing is set up twice
+        worker = copy.copy(self)
+        worker.log_widget = None
+        return worker
+
+
+    def busy(self):
+        return nullcontext()
+
+
+    def subprocess_env(self) -> dict[str, str]:
+        return {**os.environ, **self.root.env(), 'PATH': self.env_path}
+
+
+    def asdf(self, params: list[str] | None = None, log_output: bool = True, log_success: bool = False) -> list[str]:
+        if not self.asdf_bin.exists():
+            self.log_error(f"asdf binary not found at {self.asdf_bin}.")
+            return []
+
+        with self.busy():
+            return self.run_asdf(params, log_output, log_success)
+
+
+    def run_asdf(self, params: list[str] | None, log_output: bool, log_success: bool) -> list[str]:
+        start, started = self.metrics.now(), perf_counter()
+        returncode, output_bytes = None, 0
+        try:
+            params = params or []
+            cmd = [self.asdf_bin.as_posix()] + params
+
+            if log_output and self.log_widget is not None:
+                self.log_widget.cmd(' '.join(cmd))
+
+            #path = ':'.join([os.environ['PATH'], Path('~/.asdf/bin').expanduser().as_posix()])
+            env = self.subprocess_env()
+            process = None
+            if self.coprocesses is not None and is_read_only(params):
+                process = self.coprocesses.run(cmd, self.current_path.as_posix(), env)
+            if process is None:
+                process = run(cmd, capture_output=True, cwd=self.current_path.as_posix(), env=env)
+            returncode, output_bytes = process.returncode, len(process.stdout) + len(process.stderr)
+
+            stdout_lines = [p.decode() for p in process.stdout.splitlines()]
+            if log_output:
+                if stdout_lines and self.log_widget is not None:
+                    [self.log_widget.info(line) for line in stdout_lines]
+                # else:
+                #    self.log_widget.info("(stdout empty)")
+
+            stderr_lines = [p.decode() for p in process.stderr.splitlines()]
+            if log_output:
+                if stderr_lines and self.log_widget is not None:
+                    [self.log_widget.stderr(line) for line in stderr_lines]
+                # else:
+                #    self.log_widget.info("(stderr empty)")
+
+            if process.returncode != 0:
+                if self.log_widget is not None:
+                    self.log_widget.error(f"Command {' '.join(cmd)!r} returned error code {process.returncode}.")
+                return []
+
+            if log_success and self.log_widget is not None:
+                self.log_widget.ok(f"Command {' '.join(cmd)!r} completed successfully.")
+
+            return stdout_lines + stderr_lines
+        except Exception as e:
+            if self.log_widget is not None:
+                self.log_widget.error(f"Command {' '.join(cmd)!r} failed: {e}")
+            return []
+        finally:
+            self.metrics.record([self.asdf_bin.as_posix()] + (params or []), start, perf_counter() - started,
+                                returncode, output_bytes, caller())
+
+
+    def asdf_streaming(self, params: list[str] | None = None, log_output: bool = True,
+                       log_success: bool = False) -> list[str]:
+        return self.asdf(params, log_output, log_success)
+
+
+    def info(self):
+        return self.asdf(['info'])
+
+
+    def plugin_head(self, plugin: str) -> str | None:
+        return git_head(self.data_dir / 'plugins' / plugin)
+
+
+    def invalidate_plugin(self, plugin: str):
+        self.cache.invalidate(f"latest:{plugin}")
+        self.cache.invalidate(f"list-all:{plugin}")
+
+
+    def plugins_list_all(self, refresh: bool = False) -> list[str]:
+        head = git_head(self.data_dir / 'repository')
+        if not refresh and (cached := self.cache.get('plugins-all', head, PLUGINS_ALL_TTL)) is not None:
+            return cached
+        plugins = [p.split()[0] for p in self.asdf(['plugin', 'list', 'all'], log_output=False) if p.strip()]
+        if plugins:
+            # `plugin list all` may have just synced the index repository
+            self.cache.set('plugins-all', plugins, git_head(self.data_dir / 'repository'))
+        return plugins
+
+
+    def cached_plugins_list_all(self) -> list[str] | None:
+        return self.cache.get('plugins-all', git_head(self.data_dir / 'repository'), PLUGINS_ALL_TTL)
+
+
+    def plugins_list_installed(self) -> list[str]:
+        if self.native is not None:
+            return self.native.plugins_list_installed()
+        return self.plugins_list_installed_subprocess()
+
+
+    def plugins_list_installed_subprocess(self) -> list[str]:
+        return self.asdf(['plugin', 'list'], log_output=False)
+
+
+    def versions_list_installed(self, plugin: str) -> tuple[list[str], str | None]:
+        if self.native is not None:
+            return self.native.versions_list_installed(plugin, self.current_path)
+        return self.versions_list_installed_subprocess(plugin)
+
+
+    def versions_list_installed_subprocess(self, plugin: str) -> tuple[list[str], str | None]:
+        output = self.asdf(['list', plugin], log_output=False)
+        current = None
+        versions = []
+        for line in output:
+            striped_line = line.strip()
+            if 'No versions installed' in striped_line:
+                continue
+            if striped_line.startswith('*'):
+                current = striped_line[1:]
+                versions.append(current)
+            else:
+                versions.append(striped_line)
+        return versions, current
+
+
+    def versions_list_all(self, plugin: str, refresh: bool = False) -> list[str]:
+        key, head = f"list-all:{plugin}", self.plugin_head(plugin)
+        if not refresh and (cached := self.cache.get(key, head, LIST_ALL_TTL)) is not None:
+            return cached
+        versions = self.asdf(['list', 'all', plugin], log_output=False)
+        if versions:
+            self.cache.set(key, versions, head)
+        return versions
+
+
+    def tool_versions_path(self, scope: str) -> Path:
+        filename = os.environ.get('ASDF_DEFAULT_TOOL_VERSIONS_FILENAME', '.tool-versions')
+        return (Path.home() if scope == 'global' else self.current_path) / filename
+
+
+    def install_path(self, plugin: str, version: str) -> Path:
+        directory = f"ref-{version[4:]}" if version.startswith('ref:') else version
+        return self.data_dir / 'installs' / plugin / directory
+
+
+    def version_installed(self, plugin: str, version: str) -> bool:
+        if version == 'system' or version.startswith('path:'):
+            return True
+        return self.install_path(plugin, version).is_dir()
+
+
+    def snapshot_version(self, plugin: str, version: str) -> dict | None:
+        # Archives the install before it is removed; None when snapshots are off or there is nothing to archive
+        if self.snapshots is None:
+            return None
+        install_path = self.install_path(plugin, version)
+        if not install_path.is_dir():
+            where = self.where_version(plugin, version)
+            install_path = Path(where) if where else install_path
+        return self.snapshots.save(plugin, version, install_path)
+
+
+    def restore_version(self, plugin: str, version: str) -> bool:
+        if self.snapshots is None or version == 'system' or version.startswith(('path:', 'latest')):
+            return False
+        return self.snapshots.restore(self.install_path(plugin, version))
+
+
+    def set_versions(self, scope: str, changes: dict[str, list[str] | None]) -> list[str]:
+        # Edits the global or local .tool-versions directly, every plugin in one write, instead of running
+        # `asdf global|local` once per plugin. Versions are checked the way asdf checks them.
+        if any(version.startswith('latest') for versions in changes.values() if versions for version in versions):
+            output = []
+            for plugin, versions in changes.items():
+                output += self.asdf([scope, plugin, *versions]) if versions is not None else []
+            return output
+
+        path = self.tool_versions_path(scope)
+        for plugin, versions in changes.items():
+            if not (self.data_dir / 'plugins' / plugin).is_dir():
+                self.log_error(f"No such plugin: {plugin}")
+                return []
+            for version in versions or []:
+                if not self.version_installed(plugin, version):
+                    self.log_error(f"version {version} is not installed for {plugin}")
+                    return []
+        try:
+            before, after = self.tool_versions_cache.edit(path, changes)
+        except (OSError, UnicodeDecodeError) as e:
+            self.log_error(f"Could not update {path}: {e}")
+            return []
+        if self.log_widget is not None:
+            for plugin, versions in changes.items():
+                self.log_widget.info(f"{path}: {plugin} {' '.join(versions)}" if versions is not None
+                                     else f"{path}: removed {plugin}")
+            self.log_widget.ok()
+        return after
+
+
+    def log_error(self, msg: str):
+        if self.log_widget is not None:
+            self.log_widget.error(msg)
+        else:
+            print(msg, file=sys.stderr)
+
+
+    def log_warning(self, msg: str):
+        if self.log_widget is not None:
+            self.log_widget.warning(msg)
+        else:
+            print(msg, file=sys.stderr)
+
+
+    def log_info(self, msg: str):
+        if self.log_widget is not None:
+            self.log_widget.info(msg)
+
+
+    def set_global_version(self, plugin: str, version: str) -> list[str]:
+        return self.set_versions('global', {plugin: [version]})
+
+
+    def set_local_version(self, plugin: str, version: str) -> list[str]:
+        return self.set_versions('local', {plugin: [version]})
+
+
+    def update_plugin(self, plugin: str) -> list[PluginUpdate]:
+        return self.update_plugins([plugin])
+
+
+    def update_plugins(self, plugins: list[str] | None = None) -> list[PluginUpdate]:
+        # Fetches run in parallel; only plugins whose HEAD moved lose their cached version lists
+        updates = self.fetch_plugin_updates(plugins if plugins is not None else self.plugins_list_installed())
+        self.report_plugin_updates(updates)
+        return updates
+
+
+    def fetch_plugin_updates(self, plugins: list[str]) -> list[PluginUpdate]:
+        return PluginUpdater(self.data_dir / 'plugins').update_all(plugins)
+
+
+    def report_plugin_updates(self, updates: list[PluginUpdate]):
+        for update in updates:
+            if update.moved:
+                self.invalidate_plugin(update.plugin)
+            if self.log_widget is None:
+                continue
+            if update.status in (FAILED, TIMED_OUT):
+                self.log_widget.error(update.describe())
+            elif update.moved:
+                self.log_widget.ok(update.describe())
+            else:
+                self.log_widget.info(update.describe())
+
+
+    def add_version(self, plugin: str, version: str) -> list[str]:
+        if version is None:
+            self.log_error(f"Invalid version for plugin {plugin}.")
+            return []
+        try:
+            restored = self.restore_version(plugin, version)
+        except (OSError, tarfile.TarError) as e:
+            self.log_warning(f"Could not restore the {plugin} {version} snapshot: {e}")
+            restored = False
+        if restored:
+            self.log_info(f"Restored {plugin} {version} from its snapshot.")
+            return self.asdf_streaming(['reshim', plugin, version], log_success=True)
+        self.log_warning(f"Installing {plugin} {version}. This may take a few moments...")
+        output = self.asdf_streaming(['install', plugin, version], log_success=True)
+        return output
+
+
+    def add_plugin(self, plugin: str) -> list[str]:
+        return self.asdf_streaming(['plugin', 'add', plugin])
+
+
+    def remove_plugin(self, plugin: str) -> list[str]:
+        output = self.asdf_streaming(['plugin', 'remove', plugin])
+        self.invalidate_plugin(plugin)
+        return output
+
+
+    def where_version(self, plugin: str, version: str) -> str | None:
+        output = self.asdf(['where', plugin, version])
+        return output[0] if output else None
+
+
+    def uninstall_version(self, plugin: str, version: str) -> list[str]:
+        try:
+            if (snapshot := self.snapshot_version(plugin, version)) is not None:
+                self.log_info(f"Saved a snapshot of {plugin} {version} ({format_size(snapshot['size'])}).")
+        except (OSError, tarfile.TarError) as e:
+            self.log_error(f"Could not snapshot {plugin} {version}: {e}")
+        return self.asdf_streaming(['uninstall', plugin, version])
+
+
+    def reshim_version(self, plugin: str, version: str) -> list[str]:
+        return self.asdf_streaming(['reshim', plugin, version])
+
+
+    def update_all_plugins(self) -> list[PluginUpdate]:
+        return self.update_plugins()
+
+
+    def current_versions(self, plugins: list[str] | None = None) -> dict:
+        # `plugins` narrows the result to those plugins; ones no longer installed are simply absent
+        if self.native is not None:
+            return self.native.current_versions(self.current_path, plugins)
+        current = self.current_versions_subprocess()
+        return current if plugins is None else {p: v for p, v in current.items() if p in plugins}
+
+
+    def current_versions_subprocess(self) -> dict:
+        current = {}
+        output = self.asdf(['current'], log_output=False)
+        for line in output:
+            if (m := self.current_pattern.match(line)) is not None:
+                current[m.group(1)] = (m.group(2), m.group(3))
+        return current
+
+
+    def check_backend_parity(self) -> list[str]:
+        native = self.native or NativeBackend(self.data_dir, self.tool_versions_cache)
+        # Without a working asdf both sides would simply be empty, which is no evidence of parity
+        if not self.asdf_bin.exists() or not self.asdf(['info'], log_output=False):
+            unavailable = f"asdf unavailable: {self.asdf_bin} is missing or failed"
+            self.log_error(f"Backend parity not checked: {unavailable}.")
+            return [unavailable]
+        mismatches = []
+        plugins = self.plugins_list_installed_subprocess()
+        if (native_plugins := native.plugins_list_installed()) != sorted(plugins):
+            mismatches.append(f"plugins: native={native_plugins} asdf={sorted(plugins)}")
+        native_current = native.current_versions(self.current_path)
+        asdf_current = self.current_versions_subprocess()
+        for plugin in sorted(set(native_current) | set(asdf_current)):
+            native_version = native_current.get(plugin, (None,))[0]
+            asdf_version = asdf_current.get(plugin, (None,))[0]
+            if native_version != asdf_version:
+                mismatches.append(f"{plugin} current: native={native_version} asdf={asdf_version}")
+        for plugin in plugins:
+            native_versions, native_installed = native.versions_list_installed(plugin, self.current_path)
+            asdf_versions, asdf_installed = self.versions_list_installed_subprocess(plugin)
+            if sorted(native_versions) != sorted(asdf_versions) or native_installed != asdf_installed:
+                mismatches.append(f"{plugin} installed: native={native_versions} (*{native_installed}) "
+                                  f"asdf={asdf_versions} (*{asdf_installed})")
+        if self.log_widget is not None:
+            if mismatches:
+                [self.log_widget.warning(f"Backend mismatch: {m}") for m in mismatches]
+            else:
+                self.log_widget.ok("Native backend matches asdf.")
+        return mismatches
+
+
+    def update_asdf(self) -> list[str]:
+        return self.asdf_streaming(['update'])
+
+
+    def cached_versions_list_all(self, plugin: str) -> list[str] | None:
+        return self.cache.get(f"list-all:{plugin}", self.plugin_head(plugin), LIST_ALL_TTL)
+
+
+    def has_latest_stable_script(self, plugin: str) -> bool:
+        return (self.data_dir / 'plugins' / plugin / 'bin' / 'latest-stable').is_file()
+
+
+    def latest_version(self, plugin: str, refresh: bool = False, cached_only: bool = False) -> str | None:
+        key, head = f"latest:{plugin}", self.plugin_head(plugin)
+        if not refresh:
+            # A cached version list answers in-process; plugins with their own latest-stable script may pick
+            # differently, so only they need asdf
+            if not self.has_latest_stable_script(plugin) and \
+                    (versions := self.cache.get(f"list-all:{plugin}", head, LIST_ALL_TTL)) is not None and \
+                    (latest := latest_stable(versions)) is not None:
+                return latest
+            if (cached := self.cache.get(key, head, LATEST_TTL)) is not None:
+                return cached
+        if cached_only:
+            return None
+        output = self.asdf(['latest', plugin])
+        latest = output[0] if output else None
+        if latest is None and (versions := self.cache.get(f"list-all:{plugin}", head, LIST_ALL_TTL)):
+            latest = latest_stable(versions)
+        if latest is not None:
+            self.cache.set(key, latest, head)
+        return latest
+
+
+    def outdated_versions(self, cached_only: bool = False) -> list[dict]:
+        # Every plugin whose current version is behind, in one pass over current versions and cached lists.
+        # `major` and `minor` are the newest releases that stay within the current version's line.
+        rows = []
+        for plugin, (current, source) in sorted(self.current_versions().items()):
+            current = current.split()[0] if current else current
+            if not current or current in ('system', NO_VERSION_SET) or current.startswith(('ref:', 'path:')):
+                continue
+            if (latest := self.latest_version(plugin, cached_only=cached_only)) is None:
+                continue
+            if version_key(current) >= version_key(latest):
+                continue
+            versions = self.cached_versions_list_all(plugin) or []
+            major, minor = latest_in_line(versions, current, 1), latest_in_line(versions, current, 2)
+            rows.append({
+                'plugin': plugin,
+                'current': current,
+                'latest': latest,
+                'major': major if major is not None and version_key(current) < version_key(major) else None,
+                'minor': minor if minor is not None and version_key(current) < version_key(minor) else None,
+                'source': source,
+            })
+        return rows
+
+
+    def set_local_system(self, plugin: str):
+        return self.set_versions('local', {plugin: ['system']})
+
+
+    def set_global_system(self, plugin: str):
+        return self.set_versions('global', {plugin: ['system']})
+
+
+    def install_versions(self):
+        return self.asdf_streaming(['install'])
+
+
+    def remove_local_version(self, plugin: str):
+        tool_version_path = self.tool_versions_path('local')
+        if not tool_version_path.exists():
+            self.log_widget.error(f".tool-versions file not found in {self.current_path}.")
+            return
+
+        try:
+            current_lines, new_lines = self.tool_versions_cache.edit(tool_version_path, {plugin: None})
+        except (OSError, UnicodeDecodeError) as e:
+            self.log_widget.error(f"Could not update {tool_version_path}: {e}")
+            return
+        if current_lines:
+            self.log_widget.info(f"Existing {tool_version_path} file:")
+            [self.log_widget.info(line) for line in current_lines]
+        else:
+            self.log_widget.error(f"{tool_version_path} file is empty.")
+            return
+
+        if new_lines != current_lines:
+            if not new_lines:
+                self.log_widget.warning(f"Updated {tool_version_path} file is now empty.")
+            else:
+                self.log_widget.info(f"Updated {tool_version_path} file:")
+                [self.log_widget.info(line) for line in new_lines]
+        else:
+            self.log_widget.error(f"{plugin} not found in {tool_version_path}.")
@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+FAKE_ASDF = '''#!{python}
+import os
+import sys
+import time
+
+DATA_DIR = {data_dir!r}
+LATENCY = {latency!r}
+LIST_ALL = {list_all!r}
+
+time.sleep(LATENCY)
+
+
+def installed(plugin):
+    try:
+        return sorted(os.listdir(os.path.join(DATA_DIR, 'installs', plugin)))
+    except OSError:
+        return []
+
+
+def current():
+    try:
+        with open('.tool-versions') as f:
+            return dict(line.split()[:2] for line in f if line.strip())
+    except OSError:
+        return {{}}
+
+
+def list_all(plugin):
+    return ['{{}}.{{}}.{{}}'.format(i // 100, (i // 10) % 10, i % 10) for i in range(LIST_ALL.get(plugin, LIST_ALL['*']))]
+
+
+args = sys.argv[1:]
+plugins = sorted(os.listdir(os.path.join(DATA_DIR, 'plugins')))
+if args[:1] == ['current']:
+    versions = current()
+    for plugin in plugins:
+        if plugin in versions:
+            print(f"{{plugin:<15}} {{versions[plugin]:<15}} {{os.path.abspath('.tool-versions')}}")
+        else:
+            print(f'{{plugin:<15}} ______          No version is set. Run "asdf <global|shell|local> {{plugin}} <version>"')
+elif args[:2] == ['list', 'all']:
+    print('\\n'.join(list_all(args[2])))
+elif args[:1] == ['list']:
+    versions = installed(args[1])
+    if not versions:
+        print('  No versions installed', file=sys.stderr)
+    selected = current().get(args[1])
+    print('\\n'.join(('*' if v == selected else '  ') + v for v in versions))
+elif args[:1] == ['latest']:
+    print(list_all(args[1])[-1])
+elif args[:3] == ['plugin', 'list', 'all']:
+    print('\\n'.join(f"{{p:<30}} https://example.invalid/{{p}}.git" for p in plugins))
+elif args[:2] == ['plugin', 'list']:
+    print('\\n'.join(plugins))
+elif args[:1] == ['info']:
+    print('ASDF VERSION: v0.0.0-bench')
+elif args[:1] == ['where']:
+    print(os.path.join(DATA_DIR, 'installs', args[1], args[2]))
+'''
+
+
+def make_fixture(root: Path, plugins: int, installed: int, list_all: int, list_all_big: int,
+                 latency: float) -> tuple[Path, Path, Path]:
+    data_dir = root / 'data'
+    work_dir = root / 'work'
+    bin_dir = root / 'bin'
+    for path in (data_dir / 'plugins', data_dir / 'installs', work_dir, bin_dir):
+        path.mkdir(parents=True)
+    names = ['nodejs'] + [f"plugin{index:03}" for index in range(1, plugins)]
+    tool_versions = []
+    for index, name in enumerate(names):
+        (data_dir / 'plugins' / name / 'bin').mkdir(parents=True)
+        for version in range(installed):
+            (data_dir / 'installs' / name / f"1.{version}.{index % 10}").mkdir(parents=True)
+        if index % 2 == 0 and installed:
+            tool_versions.append(f"{name} 1.0.{index % 10}")
+    (work_dir / '.tool-versions').write_text('\n'.join(tool_versions) + '\n', 'utf-8')
+
+    asdf_bin = bin_dir / 'asdf'
+    asdf_bin.write_text(FAKE_ASDF.format(python=sys.executable, data_dir=data_dir.as_posix(), latency=latency,
+                                         list_all={'*': list_all, 'nodejs': list_all_big}), 'utf-8')
+    asdf_bin.chmod(0o755)
+    return data_dir, work_dir, asdf_bin
+
+
+def measure(func, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'repeat': repeat,
+        'min_ms': min(timings) * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    root = Path(tempfile.mkdtemp(prefix='asdfg-bench-'))
+    data_dir, work_dir, asdf_bin = make_fixture(root, args.plugins, args.installed, args.list_all, args.list_all_big,
+                                                args.latency)
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    os.environ['ASDF_DATA_DIR'] = data_dir.as_posix()
+    os.environ['XDG_CACHE_HOME'] = (root / 'cache').as_posix()
+    os.environ['PATH'] = os.pathsep.join([asdf_bin.parent.as_posix(), os.environ['PATH']])
+    os.chdir(work_dir)
+
+    # Imported late so the environment above is in place before Qt and the wrapper initialize
+    from PySide6.QtCore import QEventLoop
+    from PySide6.QtWidgets import QApplication
+    from add_version import AddVersionDialog
+    from asdf import ASDF
+    from main import MainWindow
+    from versioning import sort_versions
+
+    app = QApplication.instance() or QApplication([])
+    asdf = ASDF(None, path=asdf_bin)
+    results = {}
+
+    native = asdf.native
+    results['current_versions[native]'] = measure(asdf.current_versions, args.repeat)
+    asdf.native = None
+    results['current_versions[subprocess]'] = measure(asdf.current_versions, args.repeat)
+    results['versions_list_installed[subprocess]'] = measure(lambda: asdf.versions_list_installed('nodejs'),
+                                                             args.repeat)
+    asdf.native = native
+    results['versions_list_installed[native]'] = measure(lambda: asdf.versions_list_installed('nodejs'),
+                                                         args.repeat)
+
+    window = MainWindow()
+
+    def refresh():
+        loop = QEventLoop()
+        window.refresh_engine.signals.finished.connect(loop.quit)
+        window.refresh_tree()
+        loop.exec()
+        window.refresh_engine.signals.finished.disconnect(loop.quit)
+
+    def settle_sizes():
+        # Each finished refresh starts a size scan; its result must land before (or be counted after) a measurement
+        window.refresh_engine.wait_sizes()
+        app.processEvents()
+
+    window.asdf.cache.clear()
+    results['refresh_tree[cold]'] = measure(refresh, 1)
+    settle_sizes()
+    changes = window.model.changes
+    results['refresh_tree[warm]'] = measure(refresh, args.repeat)
+    settle_sizes()
+    warm_rows_touched = window.model.changes - changes
+    results['AddVersionDialog[nodejs] open'] = measure(lambda: AddVersionDialog(window.prefetcher, 'nodejs'),
+                                                      args.repeat)
+
+    def populate_dialog():
+        window.prefetcher.invalidate('nodejs')
+        dialog = AddVersionDialog(window.prefetcher, 'nodejs')
+        while not dialog.loaded:
+            app.processEvents()
+
+    results['AddVersionDialog[nodejs] populated'] = measure(populate_dialog, args.repeat)
+
+    versions = asdf.versions_list_all('nodejs')
+    results['sort_versions[nodejs list all]'] = measure(lambda: sort_versions(versions), args.repeat)
+    app.processEvents()
+
+    report = {
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'keep')},
+        'results': results,
+        'backend_mismatches': asdf.check_backend_parity(),
+        'warm_refresh_rows_touched': warm_rows_touched,
+        'fixture': root.as_posix() if args.keep else None,
+    }
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark asdfg against a synthetic asdf installation.")
+    parser.add_argument('--plugins', type=int, default=200)
+    parser.add_argument('--installed', type=int, default=5, help="installed versions per plugin")
+    parser.add_argument('--list-all', type=int, default=200, help="`list all` size for most plugins")
+    parser.add_argument('--list-all-big', type=int, default=5000, help="`list all` size for nodejs")
+    parser.add_argument('--latency', type=float, default=0.0, help="extra seconds per fake asdf call")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help="keep the generated fixture directory")
+    parser.add_argument('--output', type=Path, help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    report = json.dumps(run(args), indent=2)
+    if args.output is not None:
+        args.output.write_text(report + '\n', 'utf-8')
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+
+from metrics import Metrics
+
+
+LIST_ALL_TTL = 24 * 60 * 60
+LATEST_TTL = 6 * 60 * 60
+PLUGINS_ALL_TTL = 24 * 60 * 60
+RESCAN_EVERY = 256  # sets between directory rescans, to notice entries other processes wrote
+
+
+def default_cache_dir() -> Path:
+    return Path(os.environ.get('XDG_CACHE_HOME') or '~/.cache').expanduser() / 'asdfg'
+
+
+def git_head(repo: Path) -> str | None:
+    git_dir = repo / '.git'
+    try:
+        if git_dir.is_file():  # worktree/submodule style `gitdir: <path>` pointer
+            git_dir = (repo / git_dir.read_text('utf-8').partition('gitdir:')[2].strip()).resolve()
+        head = (git_dir / 'HEAD').read_text('utf-8').strip()
+    except OSError:
+        return None
+    if not head.startswith('ref:'):
+        return head  # detached
+    ref = head[4:].strip()
+    try:
+        return (git_dir / ref).read_text('utf-8').strip()
+    except OSError:
+        pass
+    try:
+        for line in (git_dir / 'packed-refs').read_text('utf-8').splitlines():
+            sha, _, name = line.partition(' ')
+            if name == ref:
+                return sha
+    except OSError:
+        pass
+    return None
+
+
+class DiskCache:
+    def __init__(self, path: Path | None = None, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 metrics: Metrics | None = None):
+        self.path = path or default_cache_dir()
+        self.metrics = metrics
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory: dict[str, dict] = {}
+        self.sizes: dict[str, int] | None = None  # entry file name -> bytes, kept current by set/invalidate
+        self.size = 0
+        self.sets = 0
+        self.lock = Lock()
+
+
+    def entry_path(self, key: str) -> Path:
+        return self.path / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+
+    def load(self, key: str) -> dict | None:
+        path = self.entry_path(key)
+        with self.lock:
+            entry = self.memory.get(key)
+        if entry is None:
+            try:
+                entry = json.loads(path.read_text('utf-8'))
+            except (OSError, ValueError):
+                return None
+            if entry.get('key') != key:
+                return None
+            with self.lock:
+                self.memory[key] = entry
+        try:
+            os.utime(path)  # eviction is least-recently-used by mtime
+        except OSError:
+            pass
+        return entry
+
+
+    def get(self, key: str, head: str | None = None, ttl: float | None = None):
+        entry = self.load(key)
+        hit = entry is not None and entry.get('head') == head and (
+            ttl is None or time.time() - entry.get('time', 0) <= ttl)
+        if self.metrics is not None:
+            self.metrics.count(f"cache.{key.split(':', 1)[0]}.{'hit' if hit else 'miss'}")
+        return entry.get('value') if hit else None
+
+
+    def set(self, key: str, value, head: str | None = None):
+        entry = {'key': key, 'head': head, 'time': time.time(), 'value': value}
+        data = json.dumps(entry).encode('utf-8')
+        path = self.entry_path(key)
+        with self.lock:
+            self.memory[key] = entry
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.path, prefix='.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_name, path)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+        except OSError:
+            return
+        with self.lock:
+            self.sets += 1
+            if self.sizes is not None and self.sets % RESCAN_EVERY:
+                self.size += len(data) - self.sizes.get(path.name, 0)
+                self.sizes[path.name] = len(data)
+                if len(self.sizes) <= self.max_entries and self.size <= self.max_bytes:
+                    return
+        self.evict()
+
+
+    def invalidate(self, key: str):
+        path = self.entry_path(key)
+        with self.lock:
+            self.memory.pop(key, None)
+            if self.sizes is not None:
+                self.size -= self.sizes.pop(path.name, 0)
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+    def evict(self):
+        try:
+            with os.scandir(self.path) as entries:
+                files = [(e.stat().st_mtime, e.stat().st_size, e.name) for e in entries
+                         if e.name.endswith('.json') and e.is_file()]
+        except OSError:
+            return
+        sizes = {name: size for _, size, name in files}
+        total = sum(sizes.values())
+        evicted = False
+        for _, size, name in sorted(files):
+            if len(sizes) <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.unlink(self.path / name)
+            except OSError:
+                pass
+            del sizes[name]
+            total -= size
+            evicted = True
+        with self.lock:
+            self.sizes, self.size = sizes, total
+            if evicted:
+                self.memory.clear()
+
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        try:
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.json'):
+                        os.unlink(entry.path)
+        except OSError:
+            pass
@@ -0,0 +1,220 @@
+# Imported first so its STARTED timestamp is taken before any other import is paid for
+from startup import StartupProfile
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from asdf_core import ASDFCore
+from daemon import DaemonClient, DaemonError, run as run_daemon, socket_path
+from roots import Root, configured_roots, duplicate_versions
+
+
+COMMANDS = ('status', 'outdated', 'sync', 'parity', 'duplicates', 'daemon')
+
+
+class ConsoleLog:
+    def __init__(self, stream=sys.stderr, quiet: bool = False):
+        self.stream = stream
+        self.quiet = quiet
+        self.errors = 0
+
+
+    def write(self, line: str):
+        print(line, file=self.stream, flush=True)
+
+
+    def info(self, line: str):
+        if not self.quiet:
+            self.write(line)
+
+
+    def cmd(self, line: str):
+        if not self.quiet:
+            self.write(f"CMD: {line}")
+
+
+    def ok(self, line: str | None = None):
+        if not self.quiet:
+            self.write(line or 'OK')
+
+
+    def warning(self, line: str):
+        self.write(f"WARNING: {line}")
+
+
+    def error(self, line: str):
+        self.errors += 1
+        self.write(f"ERROR: {line}")
+
+
+    def stderr(self, line: str):
+        if not self.quiet:
+            self.write(f"STDERR: {line}")
+
+
+def status(asdf: ASDFCore, refresh: bool = False) -> list[dict]:
+    rows = []
+    for plugin, (current, source) in sorted(asdf.current_versions().items()):
+        installed, installed_current = asdf.versions_list_installed(plugin)
+        rows.append({
+            'plugin': plugin,
+            'current': current,
+            'source': source,
+            'installed': installed,
+            'installed_current': installed_current,
+            'latest': asdf.latest_version(plugin, cached_only=not refresh),
+        })
+    return rows
+
+
+def daemon_status(root: Root, cwd: Path) -> list[dict] | None:
+    # The same rows from a running daemon, or None to work them out here
+    if (client := DaemonClient.connect()) is None:
+        return None
+    try:
+        if not client.serves(root):
+            return None
+        rows = client.call('tree', root=root.data_dir.as_posix(), cwd=cwd.as_posix())
+    except DaemonError:
+        return None
+    finally:
+        client.close()
+    return [{'plugin': plugin, 'current': current, 'source': source, 'installed': installed,
+             'installed_current': installed_current, 'latest': latest}
+            for plugin, current, latest, source, installed, installed_current in rows]
+
+
+def daemon_command(stop: bool, show_status: bool) -> int:
+    if not stop and not show_status:
+        return run_daemon(ConsoleLog())
+    if (client := DaemonClient.connect()) is None:
+        print(f"no daemon listening on {socket_path().as_posix()}", file=sys.stderr)
+        return 1
+    try:
+        if stop:
+            client.call('shutdown')
+        else:
+            info = client.call('ping')
+            print(f"pid {info['pid']}, up {info['uptime']:.0f}s on {client.path.as_posix()}, "
+                  f"serving {', '.join(info['roots'])}")
+    except DaemonError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    return 0
+
+
+def outdated(asdf: ASDFCore) -> list[dict]:
+    return asdf.outdated_versions()
+
+
+def missing_installs(asdf: ASDFCore) -> list[tuple[str, str]] | None:
+    if asdf.native is None:
+        return None
+    missing = []
+    for plugin in asdf.native.plugins_list_installed():
+        if (resolved := asdf.native.resolve_version(plugin, asdf.current_path)) is None:
+            continue
+        installed = asdf.native.installed_versions(plugin)
+        missing.extend((plugin, v) for v in resolved[0]
+                       if v != 'system' and not v.startswith('path:') and v not in installed)
+    return missing
+
+
+def print_table(rows: list[dict], columns: list[str]):
+    widths = [max([len(column)] + [len(str(row[column] or '')) for row in rows]) for column in columns]
+    print('  '.join(column.upper().ljust(width) for column, width in zip(columns, widths)).rstrip())
+    for row in rows:
+        print('  '.join(str(row[column] or '').ljust(width) for column, width in zip(columns, widths)).rstrip())
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS + ('-h', '--help'):
+        # No subcommand: the GUI (and its Qt import) is only loaded here
+        profile = StartupProfile() if '--profile-startup' in argv else None
+        from main import main as gui_main
+        if profile is not None:
+            profile.mark('imports')
+        return gui_main(profile)
+
+    parser = argparse.ArgumentParser(prog='asdfg', description="asdf status and maintenance without the GUI.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    status_parser = subparsers.add_parser('status', help="current, installed and latest versions per plugin")
+    status_parser.add_argument('--json', action='store_true')
+    status_parser.add_argument('--refresh', action='store_true', help="query asdf for latest versions not cached")
+    outdated_parser = subparsers.add_parser('outdated', help="plugins whose current version is not the latest; "
+                                                             "exits with 1 if there are any")
+    outdated_parser.add_argument('--json', action='store_true')
+    sync_parser = subparsers.add_parser('sync', help="install every current version that is not installed")
+    sync_parser.add_argument('--dry-run', action='store_true')
+    subparsers.add_parser('parity', help="compare the native backend with asdf's own output")
+    duplicates_parser = subparsers.add_parser('duplicates', help="versions installed in more than one of the roots "
+                                                                 "in ASDFG_ROOTS")
+    duplicates_parser.add_argument('--json', action='store_true')
+    daemon_parser = subparsers.add_parser('daemon', help="serve warm asdf state to the GUI and the CLI over a "
+                                                         "local socket, in the foreground")
+    daemon_parser.add_argument('--stop', action='store_true', help="stop the running daemon")
+    daemon_parser.add_argument('--status', action='store_true', help="show whether a daemon is running")
+    args = parser.parse_args(argv)
+
+    if args.command == 'daemon':
+        return daemon_command(args.stop, args.status)
+
+    if args.command == 'duplicates':
+        rows = [{'plugin': plugin, 'version': version, 'roots': [root.name for root, _ in places],
+                 'paths': [path.as_posix() for _, path in places]}
+                for plugin, version, places in duplicate_versions(configured_roots())]
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            for row in rows:
+                row['roots'] = ', '.join(row['roots'])
+            print_table(rows, ['plugin', 'version', 'roots'])
+        return 0
+
+    # The other commands work on the first root
+    root = configured_roots()[0]
+    log = ConsoleLog(quiet=getattr(args, 'json', False))
+    asdf = ASDFCore(log, root=root)
+
+    if args.command == 'status':
+        # --refresh may have to ask asdf for latest versions, which the daemon only does in the background
+        rows = (not args.refresh and daemon_status(root, asdf.current_path)) or status(asdf, args.refresh)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            for row in rows:
+                row['installed'] = ' '.join(row['installed'])
+            print_table(rows, ['plugin', 'current', 'latest', 'installed', 'source'])
+        return 0
+
+    if args.command == 'outdated':
+        rows = outdated(asdf)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        elif rows:
+            print_table(rows, ['plugin', 'current', 'minor', 'major', 'latest', 'source'])
+        return 1 if rows else 0
+
+    if args.command == 'sync':
+        # Without the native backend asdf works out what is missing itself
+        missing = missing_installs(asdf)
+        commands = [['install']] if missing is None else [['install', plugin, version] for plugin, version in missing]
+        for params in commands:
+            if args.dry_run:
+                print(' '.join(['asdf'] + params))
+            else:
+                asdf.asdf(params, log_success=True)
+        return 1 if log.errors else 0
+
+    if args.command == 'parity':
+        return 1 if asdf.check_backend_parity() else 0
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
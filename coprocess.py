@@ -0,0 +1,174 @@
+import atexit
+import os
+import secrets
+import shlex
+import tempfile
+from pathlib import Path
+from queue import Empty, LifoQueue
+from subprocess import CompletedProcess, DEVNULL, PIPE, Popen
+from threading import Lock
+
+
+# Subcommands that only read state, so re-running one after a coprocess dies is harmless
+READ_ONLY = {'current', 'latest', 'list', 'where', 'which', 'info', 'version', 'help'}
+
+# Runs in `bash -c DRIVER <asdf bin>`, so $0 is what bin/asdf expects when it is sourced. Sourcing it once (for the
+# harmless `--version`) loads lib/utils.bash and defines its `asdf_cmd` dispatcher, so each request only forks the warm
+# shell instead of exec'ing a fresh bash that loads everything again. A request is one line of shell words: the working
+# directory, then the asdf arguments. Stdout is framed by a per-process sentinel carrying the exit code; stderr goes to
+# a file.
+DRIVER = r'''
+. "$ASDF_DIR/bin/asdf" --version >/dev/null 2>&1
+if [ "$(type -t asdf_cmd)" != function ]; then
+  asdf_cmd() { . "$ASDF_DIR/bin/asdf"; }
+fi
+while IFS= read -r request; do
+  (
+    eval "set -- $request"
+    cd -- "$1" || exit 127
+    shift
+    asdf_cmd "$@"
+  ) </dev/null 2>"$ASDFG_STDERR"
+  printf '\n%s %d\n' "$ASDFG_SENTINEL" "$?"
+done
+'''
+
+
+def is_read_only(params: list[str]) -> bool:
+    if params[:2] == ['plugin', 'list']:
+        return params[2:3] != ['all']  # `plugin list all` may sync the plugin index
+    return bool(params) and params[0] in READ_ONLY
+
+
+def asdf_dir(asdf_bin: Path) -> Path | None:
+    # Only the bash implementation of asdf has libraries to keep loaded
+    root = asdf_bin.resolve().parent.parent
+    if (root / 'lib' / 'utils.bash').is_file() and (root / 'asdf.sh').is_file():
+        return root
+    return None
+
+
+class Coprocess:
+    def __init__(self, asdf_bin: Path, root: Path, env: dict[str, str]):
+        self.env = env
+        self.served = 0
+        self.sentinel = secrets.token_hex(16).encode()
+        fd, self.stderr_path = tempfile.mkstemp(prefix='asdfg-', suffix='.stderr')
+        os.close(fd)
+        self.process = Popen(['bash', '--noprofile', '--norc', '-c', DRIVER, asdf_bin.as_posix()],
+                             stdin=PIPE, stdout=PIPE, stderr=DEVNULL, start_new_session=True,
+                             env={**env, 'ASDF_DIR': root.as_posix(), 'ASDFG_STDERR': self.stderr_path,
+                                  'ASDFG_SENTINEL': self.sentinel.decode()})
+
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+
+    def run(self, cmd: list[str], cwd: str) -> CompletedProcess | None:
+        request = ' '.join(shlex.quote(word) for word in [cwd] + cmd[1:])
+        try:
+            self.process.stdin.write(request.encode() + b'\n')
+            self.process.stdin.flush()
+            stdout = bytearray()
+            while line := self.process.stdout.readline():
+                if line.startswith(self.sentinel):
+                    returncode = int(line.split()[1])
+                    with open(self.stderr_path, 'rb') as f:
+                        stderr = f.read()
+                    self.served += 1
+                    # Drop the newline the driver puts in front of the sentinel
+                    return CompletedProcess(cmd, returncode, bytes(stdout[:-1]), stderr)
+                stdout += line
+        except (OSError, ValueError):
+            pass
+        self.close()  # EOF or a broken pipe: the shell died mid-command
+        return None
+
+
+    def close(self):
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            stream.close()
+        try:
+            os.unlink(self.stderr_path)
+        except OSError:
+            pass
+
+
+class CoprocessPool:
+    def __init__(self, asdf_bin: Path, root: Path, size: int = 4):
+        self.asdf_bin = asdf_bin
+        self.root = root
+        self.size = size
+        self.idle: LifoQueue[Coprocess] = LifoQueue()
+        self.spawned: list[Coprocess] = []
+        self.lock = Lock()
+        self.disabled = False
+        atexit.register(self.close)
+
+
+    @classmethod
+    def create(cls, asdf_bin: Path) -> 'CoprocessPool | None':
+        # ASDFG_COPROCESSES=0 turns it off; any other number is the pool size
+        size = int(os.environ.get('ASDFG_COPROCESSES', '4'))
+        if size <= 0 or (root := asdf_dir(asdf_bin)) is None:
+            return None
+        return cls(asdf_bin, root, size)
+
+
+    def acquire(self, env: dict[str, str]) -> Coprocess | None:
+        if self.disabled:
+            return None
+        while True:
+            try:
+                coprocess = self.idle.get_nowait()
+            except Empty:
+                break
+            if coprocess.alive() and coprocess.env == env:
+                return coprocess
+            self.discard(coprocess)  # died while idle, or the environment has changed since it started
+        with self.lock:
+            if len(self.spawned) >= self.size:
+                return None  # all busy: the caller runs a one-off process instead of queueing
+            try:
+                coprocess = Coprocess(self.asdf_bin, self.root, env)
+            except OSError:
+                return None
+            self.spawned.append(coprocess)
+        return coprocess
+
+
+    def release(self, coprocess: Coprocess):
+        if coprocess.alive():
+            self.idle.put(coprocess)
+        else:
+            self.discard(coprocess)
+
+
+    def discard(self, coprocess: Coprocess):
+        with self.lock:
+            if coprocess in self.spawned:
+                self.spawned.remove(coprocess)
+        coprocess.close()
+
+
+    def run(self, cmd: list[str], cwd: str, env: dict[str, str]) -> CompletedProcess | None:
+        if any('\n' in word for word in cmd) or (coprocess := self.acquire(env)) is None:
+            return None
+        try:
+            result = coprocess.run(cmd, cwd)
+        finally:
+            self.release(coprocess)
+        if result is None and coprocess.served == 0:
+            self.disabled = True  # this asdf can't be driven this way; stop paying for shells that die at once
+        return result
+
+
+    def close(self):
+        with self.lock:
+            spawned, self.spawned = self.spawned, []
+        for coprocess in spawned:
+            coprocess.close()
@@ -0,0 +1,415 @@
+import json
+import os
+import socket
+import socketserver
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Callable
+
+from asdf_core import ASDFCore, Log
+from cache import default_cache_dir, git_head
+from roots import Root, configured_roots
+
+
+POLL_INTERVAL = 2.0
+WARM_INTERVAL = 15 * 60
+MAX_TREES = 16
+
+
+def socket_path() -> Path:
+    if path := os.environ.get('ASDFG_SOCKET'):
+        return Path(path).expanduser()
+    if runtime_dir := os.environ.get('XDG_RUNTIME_DIR'):
+        return Path(runtime_dir) / 'asdfg.sock'
+    return default_cache_dir() / 'asdfg.sock'
+
+
+class DaemonError(Exception):
+    pass
+
+
+class Tree:
+    # One root's rows as seen from one directory: {plugin: [plugin, current, latest, path, versions, installed current]},
+    # the same rows MainWindow keeps, so a client can show them as they are
+    def __init__(self, core: ASDFCore, cwd: Path):
+        self.core = core.worker_copy()
+        self.core.current_path = cwd
+        self.rows: dict[str, list] | None = None
+        self.heads: dict[str, str | None] = {}
+        self.lock = Lock()
+        self.ready = Event()  # set once the first refresh is done; until then the tree is nobody's to read
+
+
+    def row(self, plugin: str, current: str, path: str) -> list:
+        # Latest only from the cache: the daemon fills in what is missing in the background and says so
+        versions, installed_current = self.core.versions_list_installed(plugin)
+        latest = self.core.latest_version(plugin, cached_only=True)
+        return [plugin, current, latest, path, versions, installed_current]
+
+
+    def refresh(self, plugins: list[str] | None = None) -> list[str] | None:
+        # Re-resolves the given plugins (all when None); returns the plugins whose rows changed, None for all
+        current_versions = self.core.current_versions(plugins)
+        rows = {plugin: self.row(plugin, *current_versions[plugin]) for plugin in sorted(current_versions)}
+        heads = {plugin: self.core.plugin_head(plugin) for plugin in rows}
+        with self.lock:
+            if self.rows is None:
+                self.rows, self.heads = rows, heads
+                return None
+            gone = [p for p in (self.rows if plugins is None else plugins) if p in self.rows and p not in rows]
+            changed = gone + [p for p, row in rows.items() if self.rows.get(p) != row]
+            for plugin in gone:
+                del self.rows[plugin]
+            self.rows.update(rows)
+            self.heads.update(heads)
+        return sorted(changed)
+
+
+    def snapshot(self, plugins: list[str] | None = None) -> list[list]:
+        with self.lock:
+            return [row for plugin, row in sorted((self.rows or {}).items()) if plugins is None or plugin in plugins]
+
+
+class Subscriber:
+    def __init__(self, connection: 'Connection', root: str, cwd: str):
+        self.connection = connection
+        self.root = root
+        self.cwd = cwd
+
+
+class Daemon:
+    # Owns the asdf state of every configured root, keeps it fresh and serves it to clients. Clients ask for a
+    # tree (root + directory) and get rows straight from memory; subscribers hear which plugins changed.
+    def __init__(self, roots: list[Root] | None = None, path: Path | None = None, log: Log | None = None,
+                 poll_interval: float = POLL_INTERVAL):
+        self.path = path or socket_path()
+        self.log = log
+        self.cores = {root.data_dir.as_posix(): ASDFCore(None, root=root) for root in roots or configured_roots()}
+        self.trees: OrderedDict[tuple[str, str], Tree] = OrderedDict()
+        self.trees_lock = Lock()
+        self.subscribers: list[Subscriber] = []
+        self.subscribers_lock = Lock()
+        self.poll_interval = poll_interval
+        self.warm_executor = ThreadPoolExecutor(4)
+        self.warming: set[tuple[str, str]] = set()
+        self.warming_lock = Lock()
+        self.stopped = Event()
+        self.server: socketserver.ThreadingUnixStreamServer | None = None
+        self.started = time.time()
+
+
+    def info(self, line: str):
+        if self.log is not None:
+            self.log.info(line)
+
+
+    def core(self, root: str | None) -> tuple[str, ASDFCore]:
+        key = root or next(iter(self.cores))
+        if (core := self.cores.get(key)) is None:
+            raise DaemonError(f"not serving root {key}")
+        return key, core
+
+
+    def tree(self, root: str | None, cwd: str) -> tuple[str, Tree]:
+        key, core = self.core(root)
+        with self.trees_lock:
+            if (tree := self.trees.get((key, cwd))) is not None:
+                self.trees.move_to_end((key, cwd))
+                created = False
+            else:
+                tree = self.trees[(key, cwd)] = Tree(core, Path(cwd))
+                created = True
+                while len(self.trees) > MAX_TREES:
+                    self.trees.popitem(last=False)
+        if not created:
+            # Another request is filling it in; its rows are the ones to return
+            tree.ready.wait()
+            if tree.rows is None:
+                raise DaemonError(f"could not resolve {cwd} in {key}")
+            return key, tree
+        try:
+            tree.refresh()
+        except BaseException:
+            with self.trees_lock:
+                if self.trees.get((key, cwd)) is tree:
+                    del self.trees[(key, cwd)]
+            raise
+        finally:
+            tree.ready.set()
+        self.warm(key, tree)
+        return key, tree
+
+
+    def handle(self, method: str, params: dict) -> Any:
+        if method == 'ping':
+            return {'pid': os.getpid(), 'roots': list(self.cores), 'uptime': time.time() - self.started}
+        if method == 'tree':
+            key, tree = self.tree(params.get('root'), params.get('cwd') or os.getcwd())
+            plugins = params.get('plugins')
+            if params.get('fresh') or plugins is not None:
+                self.changed(key, tree, tree.refresh(plugins))
+            return tree.snapshot(plugins)
+        if method == 'list_all':
+            return self.core(params.get('root'))[1].versions_list_all(params['plugin'])
+        if method == 'latest':
+            return self.core(params.get('root'))[1].latest_version(params['plugin'])
+        if method == 'shutdown':
+            Thread(target=self.shutdown, daemon=True).start()
+            return True
+        raise DaemonError(f"unknown method {method!r}")
+
+
+    def changed(self, key: str, tree: Tree, plugins: list[str] | None):
+        if plugins == []:
+            return
+        cwd = tree.core.current_path.as_posix()
+        event = {'event': 'changed', 'root': key, 'cwd': cwd, 'plugins': plugins}
+        with self.subscribers_lock:
+            subscribers = [s for s in self.subscribers if s.root == key and s.cwd == cwd]
+        for subscriber in subscribers:
+            if not subscriber.connection.send(event):
+                self.unsubscribe(subscriber.connection)
+
+
+    def subscribe(self, connection: 'Connection', root: str | None, cwd: str) -> str:
+        key, _ = self.tree(root, cwd)
+        with self.subscribers_lock:
+            self.subscribers.append(Subscriber(connection, key, cwd))
+        return key
+
+
+    def unsubscribe(self, connection: 'Connection'):
+        with self.subscribers_lock:
+            self.subscribers = [s for s in self.subscribers if s.connection is not connection]
+
+
+    def warm(self, key: str, tree: Tree, plugins: list[str] | None = None, force: bool = False):
+        # Latest versions and list-all output are fetched off the request path; rows that gain a latest version
+        # are announced like any other change
+        for plugin in plugins if plugins is not None else [row[0] for row in tree.snapshot()]:
+            with self.warming_lock:
+                if (key, plugin) in self.warming:
+                    continue
+                self.warming.add((key, plugin))
+            self.warm_executor.submit(self.warm_plugin, key, tree, plugin, force)
+
+
+    def warm_plugin(self, key: str, tree: Tree, plugin: str, force: bool):
+        try:
+            core = self.cores[key]
+            core.versions_list_all(plugin, refresh=force)
+            core.latest_version(plugin, refresh=force)
+            with self.trees_lock:
+                trees = [t for (k, _), t in self.trees.items() if k == key and t.ready.is_set()]
+            for t in trees:
+                self.changed(key, t, t.refresh([plugin]))
+        except Exception as e:  # a broken plugin must not take the warmer down
+            self.info(f"warming {plugin} failed: {e}")
+        finally:
+            with self.warming_lock:
+                self.warming.discard((key, plugin))
+
+
+    def poll(self):
+        # Cheap re-resolution of every tree: native reads are mtime-cached, so an idle poll is a few stats.
+        # Plugins whose git HEAD moved have their cached version lists dropped and re-fetched.
+        last_warm = time.monotonic()
+        while not self.stopped.wait(self.poll_interval):
+            with self.trees_lock:
+                trees = list(self.trees.items())
+            for (key, _), tree in trees:
+                if tree.core.native is None or not tree.ready.is_set():
+                    continue  # without the native backend every poll would spawn asdf
+                moved = [p for p, head in list(tree.heads.items()) if git_head(tree.core.data_dir / 'plugins' / p) != head]
+                for plugin in moved:
+                    self.cores[key].invalidate_plugin(plugin)
+                try:
+                    self.changed(key, tree, tree.refresh())
+                except Exception as e:
+                    self.info(f"refreshing {key} failed: {e}")
+                if moved:
+                    self.warm(key, tree, moved)
+            if time.monotonic() - last_warm > WARM_INTERVAL:
+                last_warm = time.monotonic()
+                for (key, _), tree in trees:
+                    self.warm(key, tree)
+
+
+    def serve_forever(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            if DaemonClient.connect(self.path) is not None:
+                raise DaemonError(f"a daemon is already listening on {self.path}")
+            self.path.unlink()  # left behind by one that died
+        old_umask = os.umask(0o077)  # the socket is for this user only
+        try:
+            self.server = Server(self.path.as_posix(), Connection)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon = self
+        Thread(target=self.poll, name='asdfg-poll', daemon=True).start()
+        self.info(f"asdfg daemon {os.getpid()} listening on {self.path} for {', '.join(self.cores)}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stopped.set()
+            self.server.server_close()
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+            self.warm_executor.shutdown(wait=False, cancel_futures=True)
+
+
+    def shutdown(self):
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    daemon: Daemon
+
+
+class Connection(socketserver.StreamRequestHandler):
+    # JSON lines both ways: {"id", "method", "params"} in, {"id", "result"} or {"id", "error"} out, and
+    # {"event": "changed", ...} for subscribed connections
+    def setup(self):
+        super().setup()
+        self.lock = Lock()
+
+
+    def send(self, message: dict) -> bool:
+        try:
+            with self.lock:
+                self.wfile.write(json.dumps(message).encode() + b'\n')
+                self.wfile.flush()
+            return True
+        except OSError:
+            return False
+
+
+    def handle(self):
+        daemon = self.server.daemon
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    method, params = request.get('method'), request.get('params') or {}
+                    if method == 'subscribe':
+                        result = daemon.subscribe(self, params.get('root'), params.get('cwd') or os.getcwd())
+                    else:
+                        result = daemon.handle(method, params)
+                    reply = {'id': request.get('id'), 'result': result}
+                except (DaemonError, KeyError, TypeError, ValueError, AttributeError) as e:
+                    reply = {'id': request.get('id') if isinstance(request, dict) else None, 'error': str(e)}
+                if not self.send(reply):
+                    break
+        finally:
+            daemon.unsubscribe(self)
+
+
+class DaemonClient:
+    # Talks to a running daemon; `connect` returns None when there is none, so callers fall back to direct mode
+    def __init__(self, sock: socket.socket, path: Path):
+        self.sock = sock
+        self.path = path
+        self.reader = sock.makefile('rb')
+        self.ids = 0
+        self.lock = Lock()
+
+
+    @classmethod
+    def connect(cls, path: Path | None = None, timeout: float = 0.5) -> 'DaemonClient | None':
+        if os.environ.get('ASDFG_DAEMON', '1') == '0':
+            return None
+        path = path or socket_path()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path.as_posix())
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock, path)
+
+
+    def call(self, method: str, timeout: float | None = 30.0, **params) -> Any:
+        with self.lock:
+            self.ids += 1
+            try:
+                self.sock.settimeout(timeout)
+                self.sock.sendall(json.dumps({'id': self.ids, 'method': method, 'params': params}).encode() + b'\n')
+                line = self.reader.readline()
+            except OSError as e:
+                raise DaemonError(f"daemon connection failed: {e}") from e
+        if not line:
+            raise DaemonError("daemon closed the connection")
+        try:
+            reply = json.loads(line)
+        except ValueError as e:
+            raise DaemonError(f"unreadable reply from the daemon: {e}") from e
+        if not isinstance(reply, dict):
+            raise DaemonError("unreadable reply from the daemon")
+        if 'error' in reply:
+            raise DaemonError(reply['error'])
+        return reply.get('result')
+
+
+    def serves(self, root: Root) -> bool:
+        try:
+            return root.data_dir.as_posix() in self.call('ping', timeout=2.0)['roots']
+        except DaemonError:
+            return False
+
+
+    def subscribe(self, root: Root, cwd: Path, callback: Callable[[list[str] | None], None]) -> bool:
+        # Events arrive on a connection of their own, read by a daemon thread that calls `callback`
+        subscriber = DaemonClient.connect(self.path)
+        if subscriber is None:
+            return False
+        try:
+            subscriber.call('subscribe', root=root.data_dir.as_posix(), cwd=cwd.as_posix())
+        except DaemonError:
+            subscriber.close()
+            return False
+
+        def read():
+            subscriber.sock.settimeout(None)
+            try:
+                for line in subscriber.reader:
+                    event = json.loads(line)
+                    if event.get('event') == 'changed':
+                        callback(event.get('plugins'))
+            except (OSError, ValueError):
+                pass
+            finally:
+                subscriber.close()
+
+        Thread(target=read, name='asdfg-daemon-events', daemon=True).start()
+        return True
+
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def run(log: Log | None = None) -> int:
+    daemon = Daemon(log=log)
+    try:
+        daemon.serve_forever()
+    except DaemonError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,125 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+
+from cache import DiskCache
+from native import NativeBackend, version_env_var
+
+
+SIZES_TTL = 60 * 60
+
+def dir_size(path: Path) -> int:
+    # Allocated bytes, not following symlinks, counting hard-linked files once
+    total = 0
+    seen: set[tuple[int, int]] = set()
+    stack = [path.as_posix()]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif st.st_nlink > 1:
+                        if (st.st_dev, st.st_ino) in seen:
+                            continue
+                        seen.add((st.st_dev, st.st_ino))
+                    total += st.st_blocks * 512
+        except OSError:
+            continue
+    return total
+
+
+def format_size(size: int | None) -> str:
+    if size is None:
+        return ''
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class SizeScanner:
+    def __init__(self, installs_path: Path, cache: DiskCache | None = None, max_workers: int | None = None):
+        self.installs_path = installs_path
+        self.cache = cache
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 2) * 2)
+        self.key = f"sizes:{installs_path}"
+        self.sizes: dict[str, list[int]] | None = None  # version path -> [inode, mtime, size, measured at]
+        self.lock = Lock()
+
+
+    def version_dirs(self) -> list[tuple[str, str, os.stat_result]]:
+        found = []
+        for plugin_path in sorted(self.installs_path.iterdir()) if self.installs_path.is_dir() else []:
+            try:
+                with os.scandir(plugin_path) as entries:
+                    found += [(plugin_path.name, entry.name, entry.stat()) for entry in entries if entry.is_dir()]
+            except OSError:
+                continue
+        return found
+
+
+    def scan(self) -> dict[str, dict[str, int]]:
+        with self.lock:
+            if self.sizes is None:
+                self.sizes = (self.cache.get(self.key) if self.cache is not None else None) or {}
+            known = dict(self.sizes)
+
+        # Sizes are approximate: a version directory's inode and mtime catch a reinstall, but not files added
+        # deeper in the tree (say `npm install -g` into lib/node_modules), so a size is also re-measured once it
+        # is older than SIZES_TTL
+        sizes: dict[str, list[int]] = {}
+        stale = []
+        now = int(time.time())
+        for plugin, version, st in self.version_dirs():
+            path = (self.installs_path / plugin / version).as_posix()
+            if (entry := known.get(path)) is not None and len(entry) == 4 and \
+                    entry[:2] == [st.st_ino, st.st_mtime_ns] and now - entry[3] < SIZES_TTL:
+                sizes[path] = entry
+            else:
+                stale.append((path, st))
+        if stale:
+            with ThreadPoolExecutor(self.max_workers) as executor:
+                for (path, st), size in zip(stale, executor.map(lambda item: dir_size(Path(item[0])), stale)):
+                    sizes[path] = [st.st_ino, st.st_mtime_ns, size, now]
+        if sizes != known:
+            with self.lock:
+                self.sizes = sizes
+            if self.cache is not None:
+                self.cache.set(self.key, sizes)
+
+        result: dict[str, dict[str, int]] = {}
+        for path, (_, _, size, _) in sizes.items():
+            plugin, version = Path(path).relative_to(self.installs_path).parts
+            result.setdefault(plugin, {})[f"ref:{version[4:]}" if version.startswith('ref-') else version] = size
+        return result
+
+
+def referenced_versions(native: NativeBackend, current_path: Path) -> set[tuple[str, str]]:
+    # Everything the global file, the directory chain or the environment could select
+    referenced = set()
+    directories = [native.home, *current_path.parents, current_path]
+    for directory in directories:
+        for plugin, versions in native.tool_versions(directory / native.tool_versions_filename).items():
+            referenced.update((plugin, version) for version in versions)
+    for plugin in native.plugins_list_installed():
+        referenced.update((plugin, version) for version in os.environ.get(version_env_var(plugin), '').split())
+        if native.legacy_enabled:
+            for directory in directories:
+                if (found := native.find_in_directory(plugin, directory)) is not None:
+                    referenced.update((plugin, version) for version in found[0])
+    return referenced
+
+
+def prune_plan(native: NativeBackend, current_path: Path) -> list[tuple[str, str]]:
+    referenced = referenced_versions(native, current_path)
+    installed = [(plugin, version) for plugin in sorted(os.listdir(native.installs_path))
+                 for version in native.installed_versions(plugin)] if native.installs_path.is_dir() else []
+    return [(plugin, version) for plugin, version in installed if (plugin, version) not in referenced]
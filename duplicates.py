@@ -0,0 +1,81 @@
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QDialog, QDialogButtonBox, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem
+
+from disk_usage import format_size
+from roots import Root, duplicate_versions
+
+
+class DuplicatesDialog(QDialog):
+    def __init__(self, roots: list[tuple[Root, dict[str, dict[str, int]]]]):
+        super().__init__()
+        self.roots = [root for root, _ in roots]
+        self.sizes = {root.data_dir: sizes for root, sizes in roots}
+        self.selected: list[tuple[Root, str, str]] = []
+        self.setWindowTitle("Versions installed in more than one root")
+        self.resize(800, 600)
+
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(3)
+        self.tree.setColumnWidth(0, 300)
+        self.tree.setColumnWidth(1, 300)
+        self.tree.setHeaderLabels(['plugin/version', 'path', 'size'])
+        self.summary = QLabel()
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Cancel)
+        self.uninstall_button = self.button_box.addButton("Uninstall selected", QDialogButtonBox.AcceptRole)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(super().reject)
+
+        self.layout = QVBoxLayout()
+        self.layout.addWidget(QLabel("Check the copies to uninstall; the unchecked roots keep theirs:"))
+        self.layout.addWidget(self.tree)
+        self.layout.addWidget(self.summary)
+        self.layout.addWidget(self.button_box)
+        self.setLayout(self.layout)
+
+        self.items: list[tuple[QTreeWidgetItem, Root, str, str]] = []
+        reclaimable = 0
+        for plugin, version, places in duplicate_versions(self.roots):
+            version_item = QTreeWidgetItem([f"{plugin} {version}", '', ''])
+            self.tree.addTopLevelItem(version_item)
+            sizes = []
+            for root, path in places:
+                size = self.size(root, plugin, version)
+                sizes.append(size or 0)
+                item = QTreeWidgetItem([root.name, path.as_posix(), format_size(size)])
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(0, Qt.Unchecked)
+                version_item.addChild(item)
+                self.items.append((item, root, plugin, version))
+            reclaimable += sum(sizes) - max(sizes)
+        self.tree.expandAll()
+        self.reclaimable = reclaimable
+        self.tree.itemChanged.connect(self.item_changed)
+        self.update_selection()
+
+
+    def size(self, root: Root, plugin: str, version: str) -> int | None:
+        return self.sizes.get(root.data_dir, {}).get(plugin, {}).get(version)
+
+
+    @staticmethod
+    def all_checked(version_item: QTreeWidgetItem) -> bool:
+        return all(version_item.child(i).checkState(0) == Qt.Checked for i in range(version_item.childCount()))
+
+
+    def item_changed(self, item: QTreeWidgetItem):
+        # At least one copy of every version stays: checking the last unchecked one is undone
+        if (parent := item.parent()) is not None and item.checkState(0) == Qt.Checked and self.all_checked(parent):
+            item.setCheckState(0, Qt.Unchecked)
+            return
+        self.update_selection()
+
+
+    def update_selection(self):
+        self.selected = [(root, plugin, version) for item, root, plugin, version in self.items
+                         if item.checkState(0) == Qt.Checked]
+        total = sum(self.size(root, plugin, version) or 0 for root, plugin, version in self.selected)
+        self.summary.setText(f"{self.tree.topLevelItemCount()} version(s) installed more than once, "
+                             f"{format_size(self.reclaimable)} reclaimable; "
+                             f"{len(self.selected)} selected, {format_size(total)} to free")
+        keeps_one = not any(self.all_checked(self.tree.topLevelItem(i)) for i in range(self.tree.topLevelItemCount()))
+        self.uninstall_button.setEnabled(bool(self.selected) and keeps_one)
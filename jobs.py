@@ -0,0 +1,351 @@
+import itertools
+import os
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+from PySide6.QtWidgets import (QDockWidget, QHBoxLayout, QLabel, QPushButton, QSpinBox, QTreeWidget, QTreeWidgetItem,
+                               QVBoxLayout, QWidget)
+
+from asdf import ASDF
+from process import CommandHandle, CommandResult
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+JOB_KINDS = {
+    'install': lambda job: ['reshim' if job.restored else 'install', job.plugin, job.version],
+    'uninstall': lambda job: ['uninstall', job.plugin, job.version],
+    'reshim': lambda job: ['reshim', job.plugin, job.version],
+    'install-all': lambda job: ['install'],
+    'plugin-add': lambda job: ['plugin', 'add', job.plugin],
+    'plugin-remove': lambda job: ['plugin', 'remove', job.plugin],
+    'update-asdf': lambda job: ['update'],
+    'prune': lambda job: ['uninstall', *job.targets[job.step]],
+}
+
+
+class Job:
+    ids = itertools.count(1)
+
+    def __init__(self, kind: str, plugin: str | None = None, version: str | None = None,
+                 on_success: Callable[[], None] | None = None, targets: list[tuple[str, str]] | None = None,
+                 asdf: ASDF | None = None):
+        self.id = next(self.ids)
+        self.kind = kind
+        self.plugin = plugin  # None: touches every plugin, so it runs alone
+        self.version = version
+        self.targets = targets or []  # (plugin, version) per step of a batched job
+        self.asdf = asdf  # the root it runs against; None for the queue's own
+        self.step = 0
+        self.prepared_step: int | None = None  # snapshot work is done once per step, before its command
+        self.restored = False  # an install that was restored from a snapshot only needs a reshim
+        self.on_success = on_success
+        self.state = QUEUED
+        self.handle: CommandHandle | None = None
+        self.result: CommandResult | None = None
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.last_line = ''
+
+
+    def params(self) -> list[str]:
+        return JOB_KINDS[self.kind](self)
+
+
+    @property
+    def steps(self) -> int:
+        return max(1, len(self.targets))
+
+
+    @property
+    def label(self) -> str:
+        if self.targets:
+            label = f"{self.kind} ({len(self.targets)} versions)"
+        else:
+            label = ' '.join(p for p in (self.kind, self.plugin, self.version) if p)
+        return label if self.asdf is None else f"{label} in {self.asdf.root.name}"
+
+
+    @property
+    def elapsed(self) -> float | None:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+    def reset(self):
+        del self.targets[:self.step]  # a retried batch picks up where it stopped
+        self.step = 0
+        self.prepared_step = None
+        self.restored = False
+        self.state = QUEUED
+        self.handle = None
+        self.result = None
+        self.started_at = self.finished_at = None
+        self.last_line = ''
+
+
+class JobQueue(QObject):
+    jobChanged = Signal(object)
+    jobFinished = Signal(object)
+    jobRemoved = Signal(object)
+    jobPrepared = Signal(object, object)  # job, snapshot error message or None; emitted from the snapshot thread
+
+    def __init__(self, asdf: ASDF, parallelism: int | None = None, parent: QObject | None = None):
+        super().__init__(parent)
+        self.asdf = asdf
+        self.snapshot_executor = ThreadPoolExecutor(1) if asdf.snapshots is not None else None
+        self.jobPrepared.connect(self.job_prepared)
+        self.parallelism = parallelism or int(os.environ.get('ASDFG_JOBS', '0')) or max(1, (os.cpu_count() or 2) // 2)
+        self.jobs: list[Job] = []
+
+
+    def submit(self, job: Job) -> Job:
+        self.jobs.append(job)
+        self.jobChanged.emit(job)
+        self.schedule()
+        return job
+
+
+    def set_parallelism(self, parallelism: int):
+        self.parallelism = max(1, parallelism)
+        self.schedule()
+
+
+    def running(self) -> list[Job]:
+        return [job for job in self.jobs if job.state == RUNNING]
+
+
+    def job_asdf(self, job: Job) -> ASDF:
+        return job.asdf or self.asdf
+
+
+    def can_start(self, job: Job, running: list[Job]) -> bool:
+        if job.plugin is None:
+            return not running
+        asdf = self.job_asdf(job)
+        return all(other.plugin is not None and (other.plugin != job.plugin or self.job_asdf(other) is not asdf)
+                   for other in running)
+
+
+    def schedule(self):
+        running = self.running()
+        for job in self.jobs:
+            if len(running) >= self.parallelism:
+                break
+            if job.state != QUEUED:
+                continue
+            if not self.can_start(job, running):
+                if job.plugin is None:
+                    break  # keep queue order: nothing may overtake an exclusive job
+                continue
+            self.start(job)
+            running.append(job)
+
+
+    def start(self, job: Job):
+        if job.state != RUNNING:
+            job.state = RUNNING
+            job.started_at = time.monotonic()
+        asdf = self.job_asdf(job)
+        if self.snapshot_executor is not None and job.prepared_step != job.step and self.snapshot_target(job):
+            # Archiving or extracting an install takes seconds, so it happens off the GUI thread first
+            job.prepared_step = job.step
+            job.last_line = "restoring snapshot…" if job.kind == 'install' else "saving snapshot…"
+            self.snapshot_executor.submit(self.prepare, job)
+            self.jobChanged.emit(job)
+            return
+        prefix = f"[{job.label}] "
+        log = asdf.log_widget
+        if log is not None:
+            log.cmd(f"{prefix}asdf {' '.join(job.params())}")
+        job.handle = handle = asdf.asdf_async(job.params(), log_output=False, log_success=True, parent=self)
+        if log is not None:
+            handle.stdoutLine.connect(lambda line: log.info(prefix + line))
+            handle.stderrLine.connect(lambda line: log.stderr(prefix + line))
+        handle.stdoutLine.connect(lambda line: self.job_output(job, line))
+        handle.finished.connect(lambda result: self.job_finished(job, result))
+        self.jobChanged.emit(job)
+
+
+    @staticmethod
+    def snapshot_target(job: Job) -> tuple[str, str] | None:
+        if job.kind == 'prune':
+            return job.targets[job.step]
+        if job.kind in ('install', 'uninstall') and job.plugin and job.version:
+            return job.plugin, job.version
+        return None
+
+
+    def prepare(self, job: Job):
+        plugin, version = self.snapshot_target(job)
+        error = None
+        try:
+            if job.kind == 'install':
+                job.restored = self.job_asdf(job).restore_version(plugin, version)
+            else:
+                self.job_asdf(job).snapshot_version(plugin, version)
+        except (OSError, tarfile.TarError) as e:
+            error = f"snapshot of {plugin} {version} failed: {e}"
+        self.jobPrepared.emit(job, error)
+
+
+    def job_prepared(self, job: Job, error: str | None):
+        if (log := self.asdf.log_widget) is not None:
+            plugin, version = self.snapshot_target(job)
+            if error is not None:
+                log.warning(f"[{job.label}] {error}")
+            elif job.restored:
+                log.info(f"[{job.label}] restored {plugin} {version} from its snapshot")
+        if job.state == RUNNING:
+            self.start(job)
+
+
+    def job_output(self, job: Job, line: str):
+        job.last_line = line
+        self.jobChanged.emit(job)
+
+
+    def job_finished(self, job: Job, result: CommandResult):
+        job.handle.deleteLater()
+        job.handle = None
+        if result.ok and job.step + 1 < job.steps:
+            job.step += 1
+            self.start(job)
+            return
+        job.result = result
+        job.finished_at = time.monotonic()
+        job.state = DONE if result.ok else CANCELLED if result.cancelled else FAILED
+        if job.state == DONE and job.on_success is not None:
+            job.on_success()
+        self.jobChanged.emit(job)
+        self.jobFinished.emit(job)
+        self.schedule()
+
+
+    def cancel(self, job: Job):
+        if job.state == QUEUED:
+            job.state = CANCELLED
+            self.jobChanged.emit(job)
+            self.schedule()
+        elif job.state == RUNNING and job.handle is not None:
+            job.handle.cancel()
+        elif job.state == RUNNING:  # still saving or restoring its snapshot; job_prepared won't start it
+            job.state = CANCELLED
+            job.finished_at = time.monotonic()
+            self.jobChanged.emit(job)
+            self.jobFinished.emit(job)
+            self.schedule()
+
+
+    def retry(self, job: Job):
+        if job.state in (FAILED, CANCELLED):
+            job.reset()
+            self.jobChanged.emit(job)
+            self.schedule()
+
+
+    def clear_finished(self):
+        for job in [job for job in self.jobs if job.state in (DONE, FAILED, CANCELLED)]:
+            self.jobs.remove(job)
+            self.jobRemoved.emit(job)
+
+
+class JobsPanel(QDockWidget):
+    def __init__(self, queue: JobQueue, parent: QWidget | None = None):
+        super().__init__("Jobs", parent)
+        self.queue = queue
+        self.items: dict[int, QTreeWidgetItem] = {}
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(4)
+        self.tree.setHeaderLabels(['job', 'status', 'elapsed', 'output'])
+        self.tree.setColumnWidth(0, 250)
+        self.tree.setRootIsDecorated(False)
+        self.tree.currentItemChanged.connect(self.update_buttons)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_selected)
+        self.retry_button = QPushButton("Retry")
+        self.retry_button.clicked.connect(self.retry_selected)
+        clear_button = QPushButton("Clear finished")
+        clear_button.clicked.connect(self.queue.clear_finished)
+        self.parallelism = QSpinBox()
+        self.parallelism.setRange(1, max(1, os.cpu_count() or 1) * 2)
+        self.parallelism.setValue(self.queue.parallelism)
+        self.parallelism.valueChanged.connect(self.queue.set_parallelism)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.cancel_button)
+        buttons.addWidget(self.retry_button)
+        buttons.addWidget(clear_button)
+        buttons.addStretch()
+        buttons.addWidget(QLabel("Parallel jobs:"))
+        buttons.addWidget(self.parallelism)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.tree)
+        layout.addLayout(buttons)
+        widget = QWidget()
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        self.queue.jobChanged.connect(self.update_job)
+        self.queue.jobRemoved.connect(self.remove_job)
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.update_running)
+        self.update_buttons()
+
+
+    def selected(self) -> Job | None:
+        item = self.tree.currentItem()
+        return item.data(0, Qt.UserRole) if item is not None else None
+
+
+    def cancel_selected(self):
+        if (job := self.selected()) is not None:
+            self.queue.cancel(job)
+
+
+    def retry_selected(self):
+        if (job := self.selected()) is not None:
+            self.queue.retry(job)
+
+
+    def update_job(self, job: Job):
+        if (item := self.items.get(job.id)) is None:
+            item = self.items[job.id] = QTreeWidgetItem([job.label])
+            item.setData(0, Qt.UserRole, job)
+            self.tree.addTopLevelItem(item)
+        item.setText(1, job.state)
+        item.setText(2, f"{job.elapsed:.0f}s" if job.elapsed is not None else '')
+        item.setText(3, job.last_line)
+        if job.state == RUNNING and not self.timer.isActive():
+            self.timer.start()
+        self.update_buttons()
+
+
+    def remove_job(self, job: Job):
+        if (item := self.items.pop(job.id, None)) is not None:
+            self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
+
+
+    def update_running(self):
+        running = self.queue.running()
+        for job in running:
+            self.items[job.id].setText(2, f"{job.elapsed:.0f}s")
+        if not running:
+            self.timer.stop()
+
+
+    def update_buttons(self):
+        job = self.selected()
+        self.cancel_button.setEnabled(job is not None and job.state in (QUEUED, RUNNING))
+        self.retry_button.setEnabled(job is not None and job.state in (FAILED, CANCELLED))
@@ -1,48 +1,129 @@
-from PySide6.QtCore import QCoreApplication
-from PySide6.QtGui import QFontDatabase
-from PySide6.QtWidgets import QTextEdit
+import os
+from collections import deque
+from pathlib import Path
 
+from PySide6.QtCore import QCoreApplication, QTimer, Signal
+from PySide6.QtGui import QColor, QFontDatabase, QTextCharFormat, QTextCursor
+from PySide6.QtWidgets import QPlainTextEdit
 
-class LogWidget(QTextEdit):
-    def __init__(self):
+
+LEVELS = {
+    'info': ('', None),
+    'cmd': ('CMD: ', 'cyan'),
+    'ok': ('', 'green'),
+    'warning': ('WARNING: ', 'orange'),
+    'error': ('ERROR: ', 'red'),
+    'stderr': ('STDERR: ', 'yellow'),
+}
+
+
+class LogWidget(QPlainTextEdit):
+    flushRequested = Signal()
+
+    def __init__(self, max_lines: int | None = None, spill_path: Path | None = None, flush_msecs: int = 30):
         super().__init__()
         self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
         font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
         font.setPointSize(11)
         self.setFont(font)
+        # Oldest lines are evicted by the document itself once the limit is reached
+        self.max_lines = max_lines or int(os.environ.get('ASDFG_LOG_MAX_LINES', '10000'))
+        self.setMaximumBlockCount(self.max_lines)
+        # Opened per flush in append mode, so nothing is left buffered or open when the app goes away
+        self.spill_path = spill_path or os.environ.get('ASDFG_LOG_FILE') or None
+        self.formats = {}
+        for level, (_, color) in LEVELS.items():
+            fmt = QTextCharFormat()
+            if color is not None:
+                fmt.setForeground(QColor(color))
+            self.formats[level] = fmt
+        # Lines may be queued from any thread; they are rendered in batches on the GUI thread
+        self.pending: deque[tuple[str, str]] = deque()
+        self.flush_scheduled = False
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(flush_msecs)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flushRequested.connect(self.flush_timer.start)
+        if (app := QCoreApplication.instance()) is not None:
+            app.aboutToQuit.connect(self.flush)  # lines still waiting on the timer
+
+
+    def enqueue(self, level: str, line: str):
+        self.pending.append((level, f"{LEVELS[level][0]}{line}"))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.flushRequested.emit()
+
+
+    def flush(self):
+        self.flush_scheduled = False
+        pending = self.pending
+        count = len(pending)
+        if not count:
+            return
+        batch = [pending.popleft() for _ in range(count)]
+
+        if self.spill_path is not None:
+            try:
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(f"{line}\n" for _, line in batch))
+            except OSError:
+                pass
+
+        # Whatever would be evicted straight away is not worth laying out
+        batch = batch[-self.max_lines:]
+        vert_scrollbar = self.verticalScrollBar()
+        at_end = vert_scrollbar.value() >= vert_scrollbar.maximum() - 4
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.beginEditBlock()
+        first = self.document().isEmpty()
+        start = 0
+        while start < len(batch):
+            level = batch[start][0]
+            end = start + 1
+            while end < len(batch) and batch[end][0] == level:
+                end += 1
+            text = '\n'.join(line for _, line in batch[start:end])
+            cursor.insertText(text if first else f"\n{text}", self.formats[level])
+            first = False
+            start = end
+        cursor.endEditBlock()
+        if at_end:
+            self.scroll_to_end()
+
+
+    def clear(self):
+        self.pending.clear()
+        super().clear()
 
 
     def scroll_to_end(self):
         vert_scrollbar = self.verticalScrollBar()
         vert_scrollbar.setValue(vert_scrollbar.maximum())
-        QCoreApplication.processEvents()
 
 
     def info(self, line: str):
-        self.append(line)
-        self.scroll_to_end()
+        self.enqueue('info', line)
 
 
     def cmd(self, line: str):
-        self.append(f"<font color=cyan>CMD: {line}</font>")
-        self.scroll_to_end()
+        self.enqueue('cmd', line)
 
 
     def ok(self, line: str | None = None):
-        self.append(f"<font color=green>{line or 'OK'}</font>")
-        self.scroll_to_end()
+        self.enqueue('ok', line or 'OK')
 
 
     def warning(self, line: str):
-        self.append(f"<font color=orange>WARNING: {line}</font>")
-        self.scroll_to_end()
+        self.enqueue('warning', line)
 
 
     def error(self, line: str):
-        self.append(f"<font color=red>ERROR: {line}</font>")
-        self.scroll_to_end()
+        self.enqueue('error', line)
 
 
     def stderr(self, line: str):
-        self.append(f"<font color=yellow>STDERR: {line}</font>")
-        self.scroll_to_end()
+        self.enqueue('stderr', line)
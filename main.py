@@ -1,53 +1,92 @@
+import json
 import os
 import sys
+from functools import partial
 from pathlib import Path
 
-from PySide6.QtCore import QThread, QObject, Signal, QTimer
+from PySide6.QtCore import QEvent, QModelIndex, QObject, QTimer
 from PySide6.QtGui import QFont, Qt, QAction, QCursor
-from PySide6.QtWidgets import (QApplication, QMainWindow, QTreeWidget, QTreeWidgetItem, QMenu, QMessageBox, QToolBar,
+from PySide6.QtWidgets import (QApplication, QMainWindow, QTreeView, QMenu, QMessageBox, QToolBar,
                                QSplitter, QStyle)
 
-from add_plugin import AddPluginDialog
-from add_version import AddVersionDialog
 from asdf import ASDF
+from disk_usage import format_size
+from jobs import Job, JobQueue, JobsPanel
 from log import LogWidget
-from utils import semver_sort
+from performance import PerformancePanel, StallsPanel
+from plugin_update import PluginUpdate
+from prefetch import Prefetcher
+from refresh import RefreshEngine, RefreshToken
+from roots import Root, configured_roots
+from stalls import DEFAULT_THRESHOLD_MS, StallWatchdog, threshold_from_env
+from startup import StartupProfile
+from tree_model import Node, Row, TreeModel
+from watcher import AsdfWatcher
+from versioning import sort_versions
+from workspace import WorkspaceScanner
 
 
 __version__ = "1.1.2"
+USER_INPUT_EVENTS = {QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.Wheel}
+
+
+class RootView:
+    # What the window keeps per asdf root; with more than one root each gets a top-level group in the tree
+    def __init__(self, root: Root, asdf: ASDF, current_path: Path, parent: QObject):
+        self.root = root
+        self.key = root.data_dir.as_posix()
+        self.asdf = asdf
+        self.engine = RefreshEngine(asdf, parent=parent)
+        self.prefetcher = Prefetcher(asdf, parent=parent)
+        # Installs, plugin updates and .tool-versions edits made outside asdfg only re-resolve the rows they touch
+        self.watcher = AsdfWatcher(asdf.data_dir, current_path, parent=parent)
+        self.snapshot: dict[str, list] = {}
+        self.sizes: dict[str, dict[str, int]] = {}
 
 
 class MainWindow(QMainWindow):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, profile: StartupProfile | None = None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.profile = profile
         self.log = LogWidget()
         self.log.info(f"asdfg {__version__}")
         self.log.info("© 2023 Don Welch <dwelch91@gmail.com>")
         self.log.info(f"CWD: {Path(os.curdir).resolve().as_posix()}")
-        self.asdf = ASDF(self.log)
-        self.latest_versions: dict[str, str] = {}
-        self.asdf.info()
-        self.tree = QTreeWidget()
-        self.tree.setColumnCount(4)
+        self.current_path = Path(os.curdir).resolve()
+        self.views = [RootView(root, ASDF(self.log, root=root), self.current_path, self) for root in configured_roots()]
+        # The first root's; toolbar actions work on the root of the selected row
+        self.asdf = self.views[0].asdf
+        self.refresh_engine = self.views[0].engine
+        self.prefetcher = self.views[0].prefetcher
+        self.model = TreeModel(['plugin/installed version(s)', 'current version', 'latest version',
+                                '.tool-versions path', 'size'], self)
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
+        self.tree.setUniformRowHeights(True)
         self.tree.setColumnWidth(0, 250)
         self.tree.setColumnWidth(1, 250)
         self.tree.setColumnWidth(2, 250)
-        self.tree.setHeaderLabels(['plugin/installed version(s)', 'current version', 'latest version', '.tool-versions path'])
         self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
         self.tree.customContextMenuRequested.connect(self.show_context_menu)
+        self.tree.setMouseTracking(True)
         self.setWindowTitle(f"asdfg - {self.asdf.current_path}")
 
         self.toolbar = QToolBar("asdfg")
         self.toolbar.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
         refresh_action = QAction(self.style().standardIcon(QStyle.SP_BrowserReload), "Refresh", self)
-        refresh_action.triggered.connect(self.refresh_tree)
+        refresh_action.triggered.connect(lambda: self.refresh_tree())
         self.toolbar.addAction(refresh_action)
 
         install_versions_action = QAction(self.style().standardIcon(QStyle.SP_MediaPlay), "Install versions", self)
         install_versions_action.setToolTip("asdf install")
-        install_versions_action.triggered.connect(self.asdf.install_versions)
+        install_versions_action.triggered.connect(lambda: self.submit(self.current_view(), 'install-all'))
         self.toolbar.addAction(install_versions_action)
 
+        scan_workspace_action = QAction(self.style().standardIcon(QStyle.SP_DirOpenIcon), "Scan workspace", self)
+        scan_workspace_action.setToolTip("Find every .tool-versions under a directory and install what's missing")
+        scan_workspace_action.triggered.connect(self.scan_workspace)
+        self.toolbar.addAction(scan_workspace_action)
+
         update_all_action = QAction(self.style().standardIcon(QStyle.SP_MediaSeekForward), "Update plugins", self)
         update_all_action.setToolTip("asdf plugin update --all")
         update_all_action.triggered.connect(self.update_all_plugins)
@@ -58,6 +97,17 @@ class MainWindow(QMainWindow):
         update_asdf_action.triggered.connect(self.update_asdf)
         self.toolbar.addAction(update_asdf_action)
 
+        prune_action = QAction(self.style().standardIcon(QStyle.SP_TrashIcon), "Prune", self)
+        prune_action.setToolTip("Uninstall versions that no .tool-versions file refers to")
+        prune_action.triggered.connect(self.prune)
+        self.toolbar.addAction(prune_action)
+
+        if len(self.views) > 1:
+            duplicates_action = QAction(self.style().standardIcon(QStyle.SP_FileDialogDetailedView), "Duplicates", self)
+            duplicates_action.setToolTip("Versions installed in more than one asdf root")
+            duplicates_action.triggered.connect(self.show_duplicates)
+            self.toolbar.addAction(duplicates_action)
+
         add_plugin_action = QAction(self.style().standardIcon(QStyle.SP_FileDialogListView), "Add plugin", self)
         add_plugin_action.setToolTip("asdf plugin add")
         add_plugin_action.triggered.connect(self.add_plugin)
@@ -67,6 +117,14 @@ class MainWindow(QMainWindow):
         clear_log_output_action.triggered.connect(self.log.clear)
         self.toolbar.addAction(clear_log_output_action)
 
+        # Reports where the event loop blocks; on from the start with ASDFG_WATCHDOG set
+        self.watchdog = StallWatchdog(threshold_from_env() or DEFAULT_THRESHOLD_MS, self)
+        self.watchdog_action = QAction(self.style().standardIcon(QStyle.SP_MessageBoxWarning), "Watchdog", self)
+        self.watchdog_action.setToolTip("Record where the window stops responding (see the Stalls panel)")
+        self.watchdog_action.setCheckable(True)
+        self.watchdog_action.toggled.connect(self.toggle_watchdog)
+        self.toolbar.addAction(self.watchdog_action)
+
         self.addToolBar(self.toolbar)
 
         self.splitter = QSplitter()
@@ -77,51 +135,214 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(self.splitter)
 
-        self.current_path = Path(os.curdir).resolve()
-        self.latest_thread = None
+        self.workspace_scanner = WorkspaceScanner(cache=self.asdf.cache)
+        self.jobs = JobQueue(self.asdf, parent=self)
+        self.jobs.jobFinished.connect(self.job_finished)
+        self.jobs_panel = JobsPanel(self.jobs, self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.jobs_panel)
+        self.performance_panel = PerformancePanel(self.asdf.metrics, self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.performance_panel)
+        self.tabifyDockWidget(self.jobs_panel, self.performance_panel)
+        self.stalls_panel = StallsPanel(self.watchdog, self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.stalls_panel)
+        self.tabifyDockWidget(self.performance_panel, self.stalls_panel)
+        self.jobs_panel.raise_()
+        self.watchdog_action.setChecked(threshold_from_env() is not None)
 
-        QTimer.singleShot(0, self.refresh_tree)
+        self.live = False
+        for view in self.views:
+            view.engine.signals.currentResolved.connect(partial(self.current_resolved, view))
+            view.engine.signals.pluginResolved.connect(partial(self.plugin_resolved, view))
+            view.engine.signals.finished.connect(partial(self.refresh_finished, view))
+            view.engine.signals.sizesResolved.connect(partial(self.sizes_resolved, view))
+            view.watcher.changed.connect(partial(self.watched_change, view))
+            view.engine.signals.daemonChanged.connect(partial(self.daemon_changed, view))
+            view.engine.signals.daemonAttached.connect(partial(self.daemon_attached, view))
+        if len(self.views) > 1:
+            self.model.update(self.model.root, [self.root_row(view) for view in self.views])
 
+        # Warm the dialogs' data for whatever plugin the user is looking at, and for everything once the user has
+        # left the window alone for a while; user input pushes that back. It happens once per session.
+        self.tree.selectionModel().currentChanged.connect(lambda index: self.prefetch(index))
+        self.tree.entered.connect(lambda index: self.prefetch(index, hover=True))
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(3000)
+        self.idle_timer.timeout.connect(self.prefetch_idle)
+        self.idle_prefetched = False
+        QApplication.instance().installEventFilter(self)
 
-    def get_latest(self, plugin: str) -> str:
-        try:
-            return self.latest_versions[plugin]
-        except KeyError:
-            latest = self.latest_versions[plugin] = self.asdf.latest_version(plugin)
-            return latest
+        # Show the last known tree straight away; `asdf info` and the live refresh run once the window is up
+        for view in self.views:
+            self.show_snapshot(view)
+        # A running `asdfg daemon` serving a root answers its refreshes from memory; the first refresh of each root
+        # starts once that is settled, in direct mode without one
+        QTimer.singleShot(0, lambda: [view.engine.attach_async() for view in self.views])
+        QTimer.singleShot(0, lambda: self.asdf.asdf_async(['info'], parent=self))
+
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() in USER_INPUT_EVENTS and self.idle_timer.isActive():
+            self.idle_timer.start()
+        return False
+
+
+    def prefetch_idle(self):
+        self.idle_prefetched = True
+        QApplication.instance().removeEventFilter(self)
+        for view in self.views:
+            view.prefetcher.prefetch_idle(list(view.snapshot))
+
+
+    def snapshot_key(self) -> str:
+        return f"tree:{self.current_path}"
+
+
+    def show_snapshot(self, view: RootView):
+        snapshot = view.asdf.cache.get(self.snapshot_key()) or []
+        self.model.update(self.parent_node(view), [self.plugin_row(view, *row, disabled=True) for row in snapshot])
 
 
-    def clear_latest(self):
-        self.latest_versions.clear()
+    def parent_keys(self, view: RootView) -> list[str]:
+        return [view.key] if len(self.views) > 1 else []
+
+
+    def parent_node(self, view: RootView) -> Node:
+        return self.model.find(*self.parent_keys(view))
+
+
+    def index_target(self, index: QModelIndex) -> tuple[RootView, list[str]]:
+        # The root an index belongs to, and its keys below the root's group: [], [plugin] or [plugin, version]
+        keys = self.model.key_path(index)
+        if len(self.views) == 1:
+            return self.views[0], keys
+        view = next((view for view in self.views if keys and view.key == keys[0]), self.views[0])
+        return view, keys[1:]
+
+
+    def current_view(self) -> RootView:
+        return self.index_target(self.tree.currentIndex())[0]
+
+
+    def job_view(self, job: Job) -> RootView:
+        return next((view for view in self.views if view.asdf is job.asdf), self.views[0])
+
+
+    def submit(self, view: RootView, kind: str, plugin: str | None = None, version: str | None = None,
+               **kwargs) -> Job:
+        return self.jobs.submit(Job(kind, plugin, version, asdf=None if view is self.views[0] else view.asdf,
+                                    **kwargs))
+
+
+    def prefetch(self, index: QModelIndex, hover: bool = False):
+        view, keys = self.index_target(index)
+        plugin = keys[0] if keys else None
+        if hover:
+            view.prefetcher.hover(plugin)
+        else:
+            view.prefetcher.prefetch_plugin(plugin)
+
+
+    def get_latest(self, view: RootView, plugin: str) -> str | None:
+        if (latest := view.prefetcher.value('latest', plugin)) is not None:
+            return latest
+        return view.asdf.latest_version(plugin)
 
 
     def add_plugin(self):
-        dlg = AddPluginDialog(self.asdf)
+        from add_plugin import AddPluginDialog
+        view = self.current_view()
+        dlg = AddPluginDialog(view.prefetcher)
         if dlg.exec():
             plugin = dlg.plugin
-            self.asdf.add_plugin(plugin)
-            if dlg.install_latest_checkbox:
-                latest_version = self.get_latest(plugin)
-                self.asdf.add_version(plugin, latest_version)
-                self.asdf.set_global_version(plugin, latest_version)
-            self.clear_latest()
-            self.refresh_tree()
+            install_latest = dlg.install_latest_checkbox.isChecked()
+
+            def plugin_added():
+                if install_latest:
+                    self.add_latest_version_and_set_global(view, plugin)
+
+            self.submit(view, 'plugin-add', plugin, on_success=plugin_added)
 
 
-    def add_version(self, plugin: str):
-        dlg = AddVersionDialog(self.asdf, plugin)
+    def add_version(self, view: RootView, plugin: str):
+        from add_version import AddVersionDialog
+        dlg = AddVersionDialog(view.prefetcher, plugin)
         if dlg.exec():
             version = dlg.version
-            self.asdf.add_version(plugin, version)
-            if dlg.set_global_version:
-                self.asdf.set_global_version(plugin, version)
-            if dlg.set_local_version:
-                self.asdf.set_local_version(plugin, version)
-            self.refresh_tree()
+            set_global = dlg.set_global_version.isChecked()
+            set_local = dlg.set_local_version.isChecked()
 
+            def set_versions():
+                if set_global:
+                    view.asdf.set_global_version(plugin, version)
+                if set_local:
+                    view.asdf.set_local_version(plugin, version)
 
-    def where_version(self, plugin: str, version: str):
-        where = self.asdf.where_version(plugin, version)
+            self.submit(view, 'install', plugin, version, on_success=set_versions)
+
+
+    def scan_workspace(self):
+        from scan_workspace import ScanWorkspaceDialog
+        view = self.current_view()
+        dlg = ScanWorkspaceDialog(view.asdf, self.workspace_scanner, self.current_path)
+        if dlg.exec():
+            for plugin in dlg.missing_plugins:
+                self.submit(view, 'plugin-add', plugin)
+            for plugin, version in dlg.missing:
+                self.submit(view, 'install', plugin, version)
+
+
+    def prune(self):
+        from prune import PruneDialog
+        view = self.current_view()
+        dlg = PruneDialog(view.asdf, view.sizes)
+        if dlg.exec() and dlg.selected:
+            self.submit(view, 'prune', targets=dlg.selected)
+
+
+    def show_duplicates(self):
+        from duplicates import DuplicatesDialog
+        dlg = DuplicatesDialog([(view.root, view.sizes) for view in self.views])
+        if dlg.exec():
+            for root, plugin, version in dlg.selected:
+                view = next(view for view in self.views if view.root is root)
+                self.submit(view, 'uninstall', plugin, version)
+
+
+    def toggle_watchdog(self, enabled: bool):
+        if enabled:
+            self.watchdog.start()
+            self.log.info(f"Watchdog on: event loop stalls over {self.watchdog.threshold * 1000:.0f} ms are recorded")
+        else:
+            self.watchdog.stop()
+            self.log.info("Watchdog off")
+
+
+    def watched_change(self, view: RootView, plugins: list[str] | None):
+        for plugin in plugins or [None]:
+            view.prefetcher.invalidate(plugin)
+        self.refresh_tree(plugins, view)
+
+
+    def daemon_attached(self, view: RootView, attached: bool):
+        if attached and (daemon := view.engine.daemon) is not None:
+            self.log.info(f"Using asdfg daemon at {daemon.path.as_posix()} for {view.root.name}")
+        self.refresh_tree(view=view, fresh=False)
+
+
+    def daemon_changed(self, view: RootView, plugins: list[str] | None):
+        # The daemon has just re-resolved these itself, so its rows are already current
+        for plugin in plugins or [None]:
+            view.prefetcher.invalidate(plugin)
+        self.refresh_tree(plugins, view, fresh=False)
+
+
+    def job_finished(self, job: Job):
+        self.refresh_tree([job.plugin] if job.plugin else None, self.job_view(job))
+
+
+    def where_version(self, view: RootView, plugin: str, version: str):
+        where = view.asdf.where_version(plugin, version)
         box = QMessageBox(self)
         box.setWindowTitle(f"{plugin} {version}")
         box.setText(where)
@@ -129,35 +350,49 @@ class MainWindow(QMainWindow):
 
 
     def update_asdf(self):
-        self.asdf.update_asdf()
-        self.clear_latest()
-        self.refresh_tree()
+        self.submit(self.current_view(), 'update-asdf')
+
 
+    def remove_plugin(self, view: RootView, plugin: str):
+        self.submit(view, 'plugin-remove', plugin, on_success=lambda: view.asdf.invalidate_plugin(plugin))
 
-    def update_plugin(self, plugin: str):
-        self.asdf.update_plugin(plugin)
-        self.clear_latest()
-        self.refresh_tree()
+
+    def update_plugin(self, view: RootView, plugin: str):
+        view.asdf.update_plugins_async([plugin]).finished.connect(partial(self.plugins_updated, view))
 
 
     def update_all_plugins(self):
-        self.asdf.update_all_plugins()
-        self.clear_latest()
-        self.refresh_tree()
+        for view in self.views:
+            view.asdf.update_plugins_async().finished.connect(partial(self.plugins_updated, view))
+
 
+    def plugins_updated(self, view: RootView, updates: list[PluginUpdate]):
+        # Rows of plugins that were already up to date stay as they are
+        if moved := [update.plugin for update in updates if update.moved]:
+            for plugin in moved:
+                view.prefetcher.invalidate(plugin)
+            self.refresh_tree(moved, view)
 
-    def add_latest_version_and_set_global(self, plugin):
-        latest_version = self.get_latest(plugin)
+
+    def add_latest_version_and_set_global(self, view: RootView, plugin: str):
+        latest_version = self.get_latest(view, plugin)
         if latest_version is None:
             self.log.error(f"Invalid version for plugin {plugin}.")
             return []
 
-        self.asdf.add_version(plugin, latest_version)
-        self.asdf.set_global_version(plugin, latest_version)
+        self.log.warning(f"Installing {plugin} {latest_version}. This may take a few moments...")
+        self.submit(view, 'install', plugin, latest_version,
+                    on_success=lambda: view.asdf.set_global_version(plugin, latest_version))
 
 
     def show_context_menu(self, position):
-        item = self.tree.itemAt(position)
+        index = self.tree.indexAt(position)
+        if not index.isValid() or self.model.node(index).disabled:
+            return
+        view, keys = self.index_target(index)
+        if not keys:  # a root's group row
+            return
+        asdf = view.asdf
         menu = QMenu(self.tree)
         #menu.setWindowFlag(Qt.FramelessWindowHint)
         #menu.setAttribute(Qt.WA_TranslucentBackground)
@@ -199,143 +434,170 @@ class MainWindow(QMainWindow):
             height:18px;
         }
         """)
-        if item.parent() is None:  # Top-level (ie, plugin)
-            plugin = item.text(0)
+        if len(keys) == 1:  # Top-level (ie, plugin)
+            plugin, = keys
 
             add_latest_version_action = QAction(f"Update {plugin} to latest version and set as GLOBAL")
-            add_latest_version_action.triggered.connect(lambda: self.add_latest_version_and_set_global(plugin))
+            add_latest_version_action.triggered.connect(lambda: self.add_latest_version_and_set_global(view, plugin))
             menu.addAction(add_latest_version_action)
 
             add_version_action = QAction(f"Add {plugin} version...")
-            add_version_action.triggered.connect(lambda: self.add_version(plugin))
+            add_version_action.triggered.connect(lambda: self.add_version(view, plugin))
             menu.addAction(add_version_action)
 
             set_local_system_action = QAction(f"Set local {plugin} version to system (in {self.current_path})")
-            set_local_system_action.triggered.connect(lambda: self.asdf.set_local_system(plugin))
+            set_local_system_action.triggered.connect(lambda: asdf.set_local_system(plugin))
             menu.addAction(set_local_system_action)
 
             remove_local_version_action = QAction(f"Remove local {plugin} version, if set (use GLOBAL version)")
-            remove_local_version_action.triggered.connect(lambda: self.asdf.remove_local_version(plugin))
+            remove_local_version_action.triggered.connect(lambda: asdf.remove_local_version(plugin))
             menu.addAction(remove_local_version_action)
 
             menu.addSeparator()
 
             set_global_system_action = QAction(f"Set GLOBAL {plugin} version to system version")
-            set_global_system_action.triggered.connect(lambda: self.asdf.set_global_system(plugin))
+            set_global_system_action.triggered.connect(lambda: asdf.set_global_system(plugin))
             menu.addAction(set_global_system_action)
 
             menu.addSeparator()
 
             update_plugin_action = QAction(f"Update plugin {plugin}")
-            update_plugin_action.triggered.connect(lambda: self.update_plugin(plugin))
+            update_plugin_action.triggered.connect(lambda: self.update_plugin(view, plugin))
             menu.addAction(update_plugin_action)
 
             uninstall_plugin_action = QAction(f"Remove plugin {plugin} (and versions)")
-            uninstall_plugin_action.triggered.connect(lambda: self.asdf.remove_plugin(plugin))
+            uninstall_plugin_action.triggered.connect(lambda: self.remove_plugin(view, plugin))
             menu.addAction(uninstall_plugin_action)
 
         else:  # Nested (ie, version)
-            parent = item.parent()
-            plugin = parent.text(0)
-            version = item.text(0)
+            plugin, version = keys
             set_global_version_action = QAction(f"Set GLOBAL {plugin} version to {version}")
-            set_global_version_action.triggered.connect(lambda: self.asdf.set_global_version(plugin, version))
+            set_global_version_action.triggered.connect(lambda: asdf.set_global_version(plugin, version))
             menu.addAction(set_global_version_action)
 
             set_local_version_action = QAction(f"Set local {plugin} version to {version} (in {self.current_path})")
-            set_local_version_action.triggered.connect(lambda: self.asdf.set_local_version(plugin, version))
+            set_local_version_action.triggered.connect(lambda: asdf.set_local_version(plugin, version))
             menu.addAction(set_local_version_action)
 
             menu.addSeparator()
 
             reshim_version_action = QAction(f"Re-shim {plugin} version {version}")
-            reshim_version_action.triggered.connect(lambda: self.asdf.reshim_version(plugin, version))
+            reshim_version_action.triggered.connect(lambda: self.submit(view, 'reshim', plugin, version))
             menu.addAction(reshim_version_action)
 
             uninstall_version_action = QAction(f"Uninstall {plugin} version {version}")
-            uninstall_version_action.triggered.connect(lambda: self.asdf.uninstall_version(plugin, version))
+            uninstall_version_action.triggered.connect(lambda: self.submit(view, 'uninstall', plugin, version))
             menu.addAction(uninstall_version_action)
 
             where_version_action = QAction(f"Where is {plugin} version {version}?")
-            where_version_action.triggered.connect(lambda: self.where_version(plugin, version))
+            where_version_action.triggered.connect(lambda: self.where_version(view, plugin, version))
             menu.addAction(where_version_action)
 
         #if menu.exec(self.tree.mapToGlobal(position)):
         if menu.exec(QCursor.pos()):
         #if menu.popup(self.tree.mapToGlobal(position)):
         #if menu.popup(self.mapToGlobal(position)):
-            self.refresh_tree()
-
-
-    def refresh_tree(self):
-        self.tree.clear()
-        current_versions = self.asdf.current_versions()
-        bold_font = QFont()
-        bold_font.setPointSize(12)
-        bold_font.setBold(True)
-        #items = []
-        plugins = sorted(current_versions.keys())
-        for index, plugin in enumerate(plugins):
+            self.refresh_tree([plugin], view)
+
+
+    def refresh_tree(self, plugins: list[str] | None = None, view: RootView | None = None, fresh: bool = True):
+        # Starting a new refresh cancels the previous one; its late results are dropped by token.
+        # The old tree stays up until the new current versions arrive. Roots refresh side by side.
+        # Only startup and the daemon's own change events may take a daemon's rows as they are.
+        for view in [view] if view is not None else self.views:
+            view.engine.start(plugins, fresh)
+
+
+    def refresh_finished(self, view: RootView, token: RefreshToken):
+        if not view.engine.is_current(token):
+            return
+        if not self.idle_prefetched and not self.idle_timer.isActive():
+            self.idle_timer.start()
+        view.engine.start_sizes()
+        view.asdf.cache.set(self.snapshot_key(), list(view.snapshot.values()))
+        if self.profile is not None and all(v.engine.token is not None and v.engine.token.done for v in self.views):
+            self.profile.mark('refresh')
+            report = json.dumps(self.profile.report())
+            self.log.info(f"Startup profile (ms): {report}")
+            print(report)
+            self.profile = None
+            QApplication.quit()
+
+
+    def current_resolved(self, view: RootView, token: RefreshToken, current_versions: dict):
+        if not view.engine.is_current(token):
+            return
+        # Rows keep their latest column and versions until the plugin itself resolves. A targeted refresh only
+        # replaces the rows it covers; its plugins missing from the result have been removed.
+        previous, view.snapshot = view.snapshot, {}
+        kept = {} if token.plugins is None else {p: row for p, row in previous.items() if p not in token.plugins}
+        for plugin in sorted(set(current_versions) | set(kept)):
+            if plugin in kept:
+                view.snapshot[plugin] = kept[plugin]
+                continue
             current, path = current_versions[plugin]
-            latest = self.get_latest(plugin) or "(unknown)"
-            item = QTreeWidgetItem([plugin, current, latest, path])
-            if current == latest:
-                item.setFont(1, bold_font)
-            versions, current = self.asdf.versions_list_installed(plugin)
-            for ver in semver_sort(versions):
-                if 'No versions installed' not in ver:  # TODO: REVISIT!
-                    child = QTreeWidgetItem([ver])
-                    if ver == current:
-                        child.setFont(0, bold_font)
-                    item.addChild(child)
-            #items.append(item)
-            self.tree.insertTopLevelItem(index, item)
-
-        #self.tree.insertTopLevelItems(0, items)
-
-        # if self.latest_thread is None:
-        #     self.latest_thread = LatestThread(plugins, self.log, self)
-        #     self.latest_thread.latestSignal.connect(self.latest_thread_result)
-        #     self.latest_thread.start()
-
-
-    def latest_thread_result(self, plugin: str, latest: str):
-        if plugin is None:
-            self.latest_thread = None
+            row = previous.get(plugin) or [plugin, current, None, path, [], None]
+            row[1], row[3] = current, path
+            view.snapshot[plugin] = row
+        self.model.update(self.parent_node(view), [self.plugin_row(view, *row, pending=row[0] not in previous,
+                                                                   versions_known=False)
+                                                   for row in view.snapshot.values()])
+        if self.profile is not None and not self.live:
+            self.profile.mark('first data')
+        self.live = True
+
+
+    def plugin_resolved(self, view: RootView, token: RefreshToken, plugin: str, latest: str | None,
+                        versions: list[str], installed_current: str | None):
+        if not view.engine.is_current(token) or (row := view.snapshot.get(plugin)) is None:
             return
-
-        print(plugin, latest)
+        row[2], row[4], row[5] = latest, versions, installed_current
+        if (node := self.model.find(*self.parent_keys(view), plugin)) is not None:
+            self.model.update_node(node, self.plugin_row(view, *row))
 
 
-class LatestThread(QThread):
-    latestSignal = Signal(str, str)
+    def sizes_resolved(self, view: RootView, sizes: dict[str, dict[str, int]]):
+        view.sizes = sizes
+        self.model.update(self.parent_node(view), [self.plugin_row(view, *row) for row in view.snapshot.values()])
+        if len(self.views) > 1:
+            self.model.update_node(self.parent_node(view), self.root_row(view))
 
-    def __init__(self, plugins: list, log_widget: LogWidget, parent: QObject=None):
-        self.plugins = plugins
-        self.asdf = ASDF(None)
-        super().__init__(parent)
 
+    def root_row(self, view: RootView) -> Row:
+        size = format_size(sum(sum(sizes.values()) for sizes in view.sizes.values())) if view.sizes else ''
+        return Row(view.key, (view.root.name, '', '', view.root.data_dir.as_posix(), size), frozenset({0}))
 
-    def run(self):
-        for plugin in self.plugins:
-            latest = self.asdf.latest_version(plugin)
-            # print(plugin, latest)
-            self.latestSignal.emit(plugin, latest)
 
-        self.latestSignal.emit(None, None)
+    def plugin_row(self, view: RootView, plugin: str, current: str, latest: str | None, path: str,
+                   versions: list[str], installed_current: str | None, disabled: bool = False,
+                   pending: bool = False, versions_known: bool = True) -> Row:
+        latest = "…" if pending else latest or "(unknown)"
+        sizes = view.sizes.get(plugin, {})
+        children = [Row(ver, (ver, '', '', '', format_size(sizes.get(ver))),
+                        frozenset({0}) if ver == installed_current else frozenset(), disabled)
+                    for ver in sort_versions(versions)
+                    if 'No versions installed' not in ver]  # TODO: REVISIT!
+        size = format_size(sum(sizes.values())) if sizes else ''
+        return Row(plugin, (plugin, current, latest, path, size), frozenset({1}) if current == latest else frozenset(),
+                   disabled, children if versions_known else None)
 
 
-def main() -> int:
+def main(profile: StartupProfile | None = None) -> int:
     app = QApplication([])
     app.setStyle('Material')
     font = QFont()
     font.setPointSize(12)
     app.setFont(font)
-    widget = MainWindow()
+    if profile is not None:
+        profile.mark('application')
+    widget = MainWindow(profile=profile)
     widget.resize(1024, 1024)
+    if profile is not None:
+        profile.mark('window')
     widget.show()
+    if profile is not None:
+        QTimer.singleShot(0, lambda: profile.mark('first paint'))
     #app.processEvents()
-    #latest_thread = LatestThread()
     return app.exec()
 
 
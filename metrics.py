@@ -0,0 +1,204 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+
+
+# Frames of the subprocess plumbing itself; the caller is the first frame outside these
+PLUMBING = {'asdf', 'run_asdf', 'asdf_streaming', 'asdf_async'}
+
+
+def subcommand(params: list[str]) -> str:
+    if not params:
+        return '(none)'
+    if params[0] in ('plugin', 'plugins') and len(params) > 1:
+        return ' '.join(params[:3] if params[1:3] == ['list', 'all'] else params[:2])
+    if params[0] == 'list' and params[1:2] == ['all']:
+        return 'list all'
+    return params[0]
+
+
+def caller(depth: int = 1) -> str:
+    frame = sys._getframe(depth)
+    while frame is not None and frame.f_code.co_name in PLUMBING:
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    return f"{frame.f_code.co_name} ({Path(frame.f_code.co_filename).name}:{frame.f_lineno})"
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class CallRecord:
+    __slots__ = ('subcommand', 'cmd', 'start', 'elapsed', 'returncode', 'output_bytes', 'caller', 'thread')
+
+    def __init__(self, subcommand: str, cmd: list[str], start: float, elapsed: float, returncode: int | None,
+                 output_bytes: int, caller: str, thread: int):
+        self.subcommand = subcommand
+        self.cmd = cmd
+        self.start = start
+        self.elapsed = elapsed
+        self.returncode = returncode
+        self.output_bytes = output_bytes
+        self.caller = caller
+        self.thread = thread
+
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Histogram:
+    def __init__(self, max_samples: int = 1024):
+        self.samples: deque[float] = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.output_bytes = 0
+
+
+    def add(self, record: CallRecord):
+        self.samples.append(record.elapsed)
+        self.count += 1
+        self.total += record.elapsed
+        self.errors += record.returncode != 0
+        self.output_bytes += record.output_bytes
+
+
+    def summary(self) -> dict:
+        samples = list(self.samples)
+        return {
+            'count': self.count,
+            'p50_ms': percentile(samples, 0.50) * 1000,
+            'p95_ms': percentile(samples, 0.95) * 1000,
+            'total_ms': self.total * 1000,
+            'errors': self.errors,
+            'output_bytes': self.output_bytes,
+        }
+
+
+class Metrics:
+    def __init__(self, max_records: int = 10000, max_refreshes: int = 50):
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.records: deque[CallRecord] = deque(maxlen=max_records)
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: Counter[str] = Counter()
+        self.refreshes: deque[dict] = deque(maxlen=max_refreshes)
+        self.refresh_started: dict[int, float] = {}
+
+
+    def now(self) -> float:
+        return time.perf_counter() - self.origin
+
+
+    def record(self, cmd: list[str], start: float, elapsed: float, returncode: int | None, output_bytes: int,
+               caller_name: str):
+        name = subcommand(cmd[1:])
+        record = CallRecord(name, cmd, start, elapsed, returncode, output_bytes, caller_name, threading.get_ident())
+        with self.lock:
+            self.records.append(record)
+            if (histogram := self.histograms.get(name)) is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(record)
+
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] += n
+
+
+    def begin_refresh(self, generation: int):
+        with self.lock:
+            self.refresh_started[generation] = self.now()
+
+
+    def discard_refresh(self, generation: int):
+        with self.lock:
+            self.refresh_started.pop(generation, None)
+
+
+    def end_refresh(self, generation: int):
+        end = self.now()
+        with self.lock:
+            if (start := self.refresh_started.pop(generation, None)) is None:
+                return
+            calls = [r for r in self.records if r.start >= start and r.start + r.elapsed <= end]
+            self.refreshes.append({
+                'generation': generation,
+                'start': start,
+                'elapsed_ms': (end - start) * 1000,
+                'calls': len(calls),
+                'call_ms': sum(r.elapsed for r in calls) * 1000,
+            })
+
+
+    def summary(self) -> dict[str, dict]:
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+
+    def cache_stats(self) -> dict[str, tuple[int, int]]:
+        with self.lock:
+            kinds = {name.split('.')[1] for name in self.counters if name.startswith('cache.')}
+            return {kind: (self.counters[f"cache.{kind}.hit"], self.counters[f"cache.{kind}.miss"])
+                    for kind in sorted(kinds)}
+
+
+    def reset(self):
+        with self.lock:
+            self.records.clear()
+            self.histograms.clear()
+            self.counters.clear()
+            self.refreshes.clear()
+
+
+    def to_json(self) -> dict:
+        summary = self.summary()
+        with self.lock:
+            return {
+                'subcommands': summary,
+                'counters': dict(self.counters),
+                'refreshes': list(self.refreshes),
+                'calls': [r.as_dict() for r in self.records],
+            }
+
+
+    def chrome_trace(self) -> dict:
+        # Loadable in chrome://tracing or https://ui.perfetto.dev
+        pid = os.getpid()
+        with self.lock:
+            events = [{
+                'name': r.subcommand,
+                'cat': 'asdf',
+                'ph': 'X',
+                'ts': r.start * 1e6,
+                'dur': r.elapsed * 1e6,
+                'pid': pid,
+                'tid': r.thread,
+                'args': {'cmd': ' '.join(r.cmd), 'returncode': r.returncode, 'output_bytes': r.output_bytes,
+                         'caller': r.caller},
+            } for r in self.records]
+            events.extend({
+                'name': f"refresh #{r['generation']}",
+                'cat': 'refresh',
+                'ph': 'X',
+                'ts': r['start'] * 1e6,
+                'dur': r['elapsed_ms'] * 1e3,
+                'pid': pid,
+                'tid': 0,
+                'args': {'calls': r['calls'], 'call_ms': r['call_ms']},
+            } for r in self.refreshes)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+    def export(self, path: Path, trace: bool = False):
+        path.write_text(json.dumps(self.chrome_trace() if trace else self.to_json(), indent=1), 'utf-8')
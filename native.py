@@ -0,0 +1,155 @@
+import os
+from pathlib import Path
+from subprocess import run, TimeoutExpired
+
+from toolversions import ToolVersionsCache
+
+
+NO_VERSION_SET = "______"
+
+
+def default_data_dir() -> Path:
+    return Path(os.environ.get('ASDF_DATA_DIR') or '~/.asdf').expanduser()
+
+
+def version_env_var(plugin: str) -> str:
+    return f"ASDF_{plugin.upper().replace('-', '_')}_VERSION"
+
+
+class NativeBackend:
+    def __init__(self, data_dir: Path | None = None, tool_versions_cache: ToolVersionsCache | None = None):
+        self.data_dir = data_dir or default_data_dir()
+        self.plugins_path = self.data_dir / 'plugins'
+        self.installs_path = self.data_dir / 'installs'
+        self.home = Path.home()
+        self.tool_versions_filename = os.environ.get('ASDF_DEFAULT_TOOL_VERSIONS_FILENAME', '.tool-versions')
+        self.legacy_enabled = self.read_legacy_setting()
+        self.legacy_filenames: dict[str, list[str]] = {}
+        self.tool_versions_cache = tool_versions_cache or ToolVersionsCache()
+
+
+    def available(self) -> bool:
+        return self.plugins_path.is_dir()
+
+
+    def read_legacy_setting(self) -> bool:
+        config = Path(os.environ.get('ASDF_CONFIG_FILE') or self.home / '.asdfrc')
+        try:
+            lines = config.read_text('utf-8').splitlines()
+        except OSError:
+            return False
+        for line in lines:
+            key, _, value = line.partition('=')
+            if key.strip() == 'legacy_version_file':
+                return value.strip() == 'yes'
+        return False
+
+
+    def plugins_list_installed(self) -> list[str]:
+        try:
+            with os.scandir(self.plugins_path) as entries:
+                return sorted(entry.name for entry in entries if entry.is_dir())
+        except OSError:
+            return []
+
+
+    def installed_versions(self, plugin: str) -> list[str]:
+        try:
+            with os.scandir(self.installs_path / plugin) as entries:
+                names = [entry.name for entry in entries if entry.is_dir()]
+        except OSError:
+            return []
+        return sorted(f"ref:{name[4:]}" if name.startswith('ref-') else name for name in names)
+
+
+    def versions_list_installed(self, plugin: str, current_path: Path) -> tuple[list[str], str | None]:
+        versions = self.installed_versions(plugin)
+        resolved = self.resolve_version(plugin, current_path)
+        current = None
+        if resolved is not None:
+            current = next((v for v in resolved[0] if v in versions), None)
+        return versions, current
+
+
+    def current_versions(self, current_path: Path, plugins: list[str] | None = None) -> dict:
+        installed = self.plugins_list_installed()
+        if plugins is not None:
+            installed = [plugin for plugin in installed if plugin in plugins]
+        return {plugin: self.current_version(plugin, current_path) for plugin in installed}
+
+
+    def current_version(self, plugin: str, current_path: Path) -> tuple[str, str]:
+        resolved = self.resolve_version(plugin, current_path)
+        if resolved is None:
+            return NO_VERSION_SET, f'No version is set. Run "asdf <global|shell|local> {plugin} <version>"'
+        versions, source = resolved
+        installed = self.installed_versions(plugin)
+        missing = next((v for v in versions if v != 'system' and not v.startswith('path:')
+                        and v not in installed), None)
+        if missing is not None:
+            return missing, f'Not installed. Run "asdf install {plugin} {missing}"'
+        return versions[0], source
+
+
+    def resolve_version(self, plugin: str, current_path: Path) -> tuple[list[str], str] | None:
+        env_var = version_env_var(plugin)
+        if value := os.environ.get(env_var):
+            return value.split(), f"{env_var} environment variable"
+
+        directory = current_path
+        while True:
+            if (found := self.find_in_directory(plugin, directory)) is not None:
+                return found
+            if directory.parent == directory:
+                break
+            directory = directory.parent
+
+        # The global file lives in $HOME even when the working directory is outside of it
+        if not current_path.is_relative_to(self.home):
+            return self.find_in_directory(plugin, self.home)
+        return None
+
+
+    def find_in_directory(self, plugin: str, directory: Path) -> tuple[list[str], str] | None:
+        path = directory / self.tool_versions_filename
+        if (versions := self.tool_versions(path).get(plugin)) is not None:
+            return versions, path.as_posix()
+        if self.legacy_enabled:
+            for filename in self.list_legacy_filenames(plugin):
+                legacy_path = directory / filename
+                if legacy_path.is_file() and (versions := self.parse_legacy_file(plugin, legacy_path)):
+                    return versions, legacy_path.as_posix()
+        return None
+
+
+    def tool_versions(self, path: Path) -> dict[str, list[str]]:
+        return self.tool_versions_cache.read(path)
+
+
+    def list_legacy_filenames(self, plugin: str) -> list[str]:
+        try:
+            return self.legacy_filenames[plugin]
+        except KeyError:
+            script = self.plugins_path / plugin / 'bin' / 'list-legacy-filenames'
+            filenames = self.run_plugin_script(script).split() if script.is_file() else []
+            self.legacy_filenames[plugin] = filenames
+            return filenames
+
+
+    def parse_legacy_file(self, plugin: str, path: Path) -> list[str]:
+        script = self.plugins_path / plugin / 'bin' / 'parse-legacy-file'
+        if script.is_file():
+            return self.run_plugin_script(script, path.as_posix()).split()
+        try:
+            return path.read_text('utf-8').split()
+        except (OSError, UnicodeDecodeError):
+            return []
+
+
+    @staticmethod
+    def run_plugin_script(script: Path, *args: str) -> str:
+        try:
+            process = run([script.as_posix(), *args], capture_output=True, timeout=30)
+        except (OSError, TimeoutExpired):
+            return ''
+        return process.stdout.decode() if process.returncode == 0 else ''
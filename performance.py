@@ -0,0 +1,142 @@
+import time
+from pathlib import Path
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import (QDockWidget, QFileDialog, QHBoxLayout, QLabel, QPushButton, QTreeWidget,
+                               QTreeWidgetItem, QVBoxLayout, QWidget)
+
+from metrics import Metrics
+from stalls import StallWatchdog
+
+
+class PerformancePanel(QDockWidget):
+    def __init__(self, metrics: Metrics, parent: QWidget | None = None):
+        super().__init__("Performance", parent)
+        self.metrics = metrics
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(6)
+        self.tree.setHeaderLabels(['subcommand', 'calls', 'p50', 'p95', 'total', 'errors'])
+        self.tree.setColumnWidth(0, 200)
+        self.tree.setRootIsDecorated(False)
+        self.cache_label = QLabel()
+        self.refresh_label = QLabel()
+
+        export_json_button = QPushButton("Export JSON…")
+        export_json_button.clicked.connect(lambda: self.export(trace=False))
+        export_trace_button = QPushButton("Export trace…")
+        export_trace_button.setToolTip("Chrome trace format, for chrome://tracing or ui.perfetto.dev")
+        export_trace_button.clicked.connect(lambda: self.export(trace=True))
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(export_json_button)
+        buttons.addWidget(export_trace_button)
+        buttons.addWidget(reset_button)
+        buttons.addStretch()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.tree)
+        layout.addWidget(self.refresh_label)
+        layout.addWidget(self.cache_label)
+        layout.addLayout(buttons)
+        widget = QWidget()
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        # Only polls while the panel is on screen
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.update_stats)
+        self.visibilityChanged.connect(lambda visible: self.timer.start() if visible else self.timer.stop())
+
+
+    def update_stats(self):
+        summary = self.metrics.summary()
+        self.tree.clear()
+        for name, stats in summary.items():
+            self.tree.addTopLevelItem(QTreeWidgetItem([
+                name, str(stats['count']), f"{stats['p50_ms']:.0f} ms", f"{stats['p95_ms']:.0f} ms",
+                f"{stats['total_ms'] / 1000:.2f} s", str(stats['errors'])]))
+
+        refreshes = list(self.metrics.refreshes)
+        if refreshes:
+            last = refreshes[-1]
+            self.refresh_label.setText(f"Last refresh: {last['elapsed_ms']:.0f} ms, {last['calls']} asdf calls "
+                                       f"({last['call_ms']:.0f} ms in subprocesses); {len(refreshes)} recorded")
+        else:
+            self.refresh_label.setText("No refresh recorded yet")
+        cache = ', '.join(f"{kind} {hits}/{hits + misses}" for kind, (hits, misses) in self.metrics.cache_stats().items())
+        self.cache_label.setText(f"Cache hits: {cache or '(none)'}")
+
+
+    def export(self, trace: bool):
+        name = 'asdfg-trace.json' if trace else 'asdfg-metrics.json'
+        filename, _ = QFileDialog.getSaveFileName(self, "Export", (Path.cwd() / name).as_posix(), "JSON (*.json)")
+        if filename:
+            self.metrics.export(Path(filename), trace)
+
+
+    def reset(self):
+        self.metrics.reset()
+        self.update_stats()
+
+
+class StallsPanel(QDockWidget):
+    def __init__(self, watchdog: StallWatchdog, parent: QWidget | None = None):
+        super().__init__("Stalls", parent)
+        self.watchdog = watchdog
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(5)
+        self.tree.setHeaderLabels(['call site', 'stalls', 'total', 'max', 'last'])
+        self.tree.setColumnWidth(0, 400)
+        self.tree.setRootIsDecorated(False)
+        self.status_label = QLabel()
+
+        export_button = QPushButton("Export collapsed stacks…")
+        export_button.setToolTip("One `frame;frame;frame ms` line per stack, for flamegraph.pl or speedscope.app")
+        export_button.clicked.connect(self.export)
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(export_button)
+        buttons.addWidget(reset_button)
+        buttons.addStretch()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.tree)
+        layout.addWidget(self.status_label)
+        layout.addLayout(buttons)
+        widget = QWidget()
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.update_stats)
+        self.visibilityChanged.connect(lambda visible: self.timer.start() if visible else self.timer.stop())
+
+
+    def update_stats(self):
+        self.tree.clear()
+        for entry in self.watchdog.report():
+            self.tree.addTopLevelItem(QTreeWidgetItem([
+                entry['site'], str(entry['count']), f"{entry['total_ms']:.0f} ms", f"{entry['max_ms']:.0f} ms",
+                time.strftime('%H:%M:%S', time.localtime(entry['last']))]))
+        stalls = len(self.watchdog.stalls) + self.watchdog.dropped
+        state = f"on, stalls over {self.watchdog.threshold * 1000:.0f} ms" if self.watchdog.running else "off"
+        self.status_label.setText(f"Watchdog {state}; {stalls} stall(s) recorded"
+                                  f"{f', oldest {self.watchdog.dropped} dropped' if self.watchdog.dropped else ''}")
+
+
+    def export(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "Export", (Path.cwd() / 'asdfg-stalls.folded').as_posix(),
+                                                  "Collapsed stacks (*.folded *.txt)")
+        if filename:
+            self.watchdog.export(Path(filename))
+
+
+    def reset(self):
+        self.watchdog.reset()
+        self.update_stats()
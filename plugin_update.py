@@ -0,0 +1,126 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from subprocess import run, CompletedProcess, TimeoutExpired
+
+from cache import git_head
+
+
+UPDATE_TIMEOUT = 120.0
+UP_TO_DATE = 'up-to-date'
+UPDATED = 'updated'
+FAILED = 'failed'
+TIMED_OUT = 'timed out'
+
+
+def first_line(text: str) -> str:
+    return next((line.strip() for line in text.splitlines() if line.strip()), '')
+
+
+class PluginUpdate:
+    __slots__ = ('plugin', 'branch', 'old', 'new', 'status', 'error', 'elapsed')
+
+    def __init__(self, plugin: str, old: str | None):
+        self.plugin = plugin
+        self.branch: str | None = None
+        self.old = old
+        self.new = old
+        self.status = UP_TO_DATE
+        self.error: str | None = None
+        self.elapsed = 0.0
+
+
+    @property
+    def moved(self) -> bool:
+        return self.new != self.old
+
+
+    def describe(self) -> str:
+        if self.status in (FAILED, TIMED_OUT):
+            return f"{self.plugin}: {self.status}{f': {self.error}' if self.error else ''}"
+        if not self.moved:
+            return f"{self.plugin}: up to date at {(self.old or '?')[:8]}"
+        return f"{self.plugin}: {(self.old or '?')[:8]} -> {(self.new or '?')[:8]} ({self.branch})"
+
+
+class PluginUpdater:
+    # What `asdf plugin update` does per plugin, run for many plugins at once. A cheap `git ls-remote` first
+    # tells whether the remote default branch moved, so repos that are already current are never fetched.
+    def __init__(self, plugins_path: Path, max_workers: int = 8, timeout: float = UPDATE_TIMEOUT):
+        self.plugins_path = plugins_path
+        self.max_workers = max_workers
+        self.timeout = timeout
+        # Never wait on a credentials prompt or an ssh host key question
+        self.env = {**os.environ, 'GIT_TERMINAL_PROMPT': '0', 'GIT_SSH_COMMAND': os.environ.get(
+            'GIT_SSH_COMMAND', 'ssh -o BatchMode=yes')}
+
+
+    def git(self, repo: Path, args: list[str], deadline: float) -> CompletedProcess:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutExpired(['git', *args], 0)
+        return run(['git', '-C', repo.as_posix(), *args], capture_output=True, text=True, env=self.env,
+                   timeout=remaining)
+
+
+    def remote_head(self, repo: Path, deadline: float) -> tuple[str, str]:
+        process = self.git(repo, ['ls-remote', '--symref', 'origin', 'HEAD'], deadline)
+        if process.returncode != 0:
+            raise RuntimeError(first_line(process.stderr) or f"git ls-remote exited with {process.returncode}")
+        branch = sha = None
+        for line in process.stdout.splitlines():
+            ref, _, name = line.partition('\t')
+            if name != 'HEAD':
+                continue
+            if ref.startswith('ref: refs/heads/'):
+                branch = ref[len('ref: refs/heads/'):]
+            else:
+                sha = ref
+        if branch is None or sha is None:
+            raise RuntimeError("origin has no HEAD branch")
+        return branch, sha
+
+
+    def update(self, plugin: str) -> PluginUpdate:
+        repo = self.plugins_path / plugin
+        started = time.monotonic()
+        deadline = started + self.timeout
+        result = PluginUpdate(plugin, git_head(repo))
+        try:
+            result.branch, remote = self.remote_head(repo, deadline)
+            if remote != result.old:
+                branch = result.branch
+                for name, args in (('fetch', ['fetch', '--prune', '--update-head-ok', 'origin', f"{branch}:{branch}"]),
+                                   ('checkout', ['-c', 'advice.detachedHead=false', 'checkout', '--force', branch])):
+                    process = self.git(repo, args, deadline)
+                    if process.returncode != 0:
+                        raise RuntimeError(first_line(process.stderr) or f"git {name} exited with {process.returncode}")
+                result.new = git_head(repo)
+                result.status = UPDATED
+                self.post_update(repo, result, deadline)
+        except TimeoutExpired:
+            result.status, result.new = TIMED_OUT, git_head(repo)
+        except (OSError, RuntimeError) as e:
+            result.status, result.error, result.new = FAILED, str(e), git_head(repo)
+        result.elapsed = time.monotonic() - started
+        return result
+
+
+    def post_update(self, repo: Path, result: PluginUpdate, deadline: float):
+        script = repo / 'bin' / 'post-plugin-update'
+        if not script.is_file():
+            return
+        env = {**self.env, 'ASDF_PLUGIN_PATH': repo.as_posix(), 'ASDF_PLUGIN_PREV_REF': result.old or '',
+               'ASDF_PLUGIN_POST_REF': result.new or ''}
+        process = run([script.as_posix()], capture_output=True, text=True, env=env,
+                      timeout=max(0.1, deadline - time.monotonic()))
+        if process.returncode != 0:
+            raise RuntimeError(first_line(process.stderr) or f"post-plugin-update exited with {process.returncode}")
+
+
+    def update_all(self, plugins: list[str]) -> list[PluginUpdate]:
+        if not plugins:
+            return []
+        with ThreadPoolExecutor(min(self.max_workers, len(plugins))) as executor:
+            return list(executor.map(self.update, plugins))
@@ -0,0 +1,105 @@
+from concurrent.futures import Future
+from threading import Lock
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+from asdf import ASDF
+
+
+FETCHERS = {
+    'latest': lambda asdf, plugin: asdf.latest_version(plugin),
+    'list-all': lambda asdf, plugin: asdf.versions_list_all(plugin),
+    'installed': lambda asdf, plugin: asdf.versions_list_installed(plugin)[0],
+    'plugins-all': lambda asdf, plugin: asdf.plugins_list_all(),
+    'plugins-installed': lambda asdf, plugin: asdf.plugins_list_installed(),
+}
+# Cheap to recompute and changed by every install, so never kept between requests
+VOLATILE = {'installed', 'plugins-installed'}
+
+
+class FetchTask(QRunnable):
+    def __init__(self, prefetcher: 'Prefetcher', kind: str, plugin: str, future: Future):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.kind = kind
+        self.plugin = plugin
+        self.future = future
+
+
+    def run(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            value = FETCHERS[self.kind](self.prefetcher.asdf, self.plugin)
+        except Exception as e:
+            self.future.set_exception(e)
+            value = None
+        else:
+            self.future.set_result(value)
+        self.prefetcher.fetched.emit(self.kind, self.plugin, value)
+
+
+class Prefetcher(QObject):
+    fetched = Signal(str, str, object)  # kind, plugin ('' for global lists), value
+
+    def __init__(self, asdf: ASDF, max_workers: int = 3, parent: QObject | None = None):
+        super().__init__(parent)
+        self.asdf = asdf.worker_copy()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.futures: dict[tuple[str, str], Future] = {}
+        self.lock = Lock()
+        self.hover_plugin: str | None = None
+        self.hover_timer = QTimer(self)
+        self.hover_timer.setSingleShot(True)
+        self.hover_timer.setInterval(300)
+        self.hover_timer.timeout.connect(lambda: self.prefetch_plugin(self.hover_plugin))
+
+
+    def get(self, kind: str, plugin: str = '', fresh: bool = False) -> Future:
+        key = (kind, plugin)
+        with self.lock:
+            if (future := self.futures.get(key)) is not None:
+                if not future.done():
+                    return future  # already in flight: share it
+                if not fresh and kind not in VOLATILE and future.exception() is None:
+                    return future
+            future = self.futures[key] = Future()
+        self.pool.start(FetchTask(self, kind, plugin, future))
+        return future
+
+
+    def value(self, kind: str, plugin: str = ''):
+        future = self.futures.get((kind, plugin))
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+
+    def invalidate(self, plugin: str | None = None):
+        with self.lock:
+            for key in [key for key in self.futures if plugin is None or key[1] == plugin]:
+                if self.futures[key].done():
+                    del self.futures[key]
+
+
+    def prefetch_plugin(self, plugin: str | None):
+        if plugin:
+            self.get('latest', plugin)
+            self.get('list-all', plugin)
+
+
+    def hover(self, plugin: str | None):
+        self.hover_plugin = plugin
+        self.hover_timer.start()
+
+
+    def prefetch_idle(self, plugins: list[str]):
+        # Only what the disk cache is missing or has let expire: anything else is already a cheap read
+        if self.asdf.cached_plugins_list_all() is None:
+            self.get('plugins-all')
+        for plugin in plugins:
+            if self.asdf.latest_version(plugin, cached_only=True) is None:
+                self.get('latest', plugin)
+            if self.asdf.cached_versions_list_all(plugin) is None:
+                self.get('list-all', plugin)
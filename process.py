@@ -0,0 +1,142 @@
+import time
+from concurrent.futures import Future
+
+from PySide6.QtCore import QObject, QProcess, QProcessEnvironment, QTimer, Signal
+
+
+class CommandResult:
+    def __init__(self, cmd: list[str], returncode: int, stdout_lines: list[str], stderr_lines: list[str],
+                 elapsed: float, cancelled: bool = False, error: str | None = None):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stdout_lines = stdout_lines
+        self.stderr_lines = stderr_lines
+        self.elapsed = elapsed
+        self.cancelled = cancelled
+        self.error = error
+
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.cancelled and self.error is None
+
+
+    def lines(self) -> list[str]:
+        return self.stdout_lines + self.stderr_lines
+
+
+class CommandHandle(QObject):
+    started = Signal()
+    stdoutLine = Signal(str)
+    stderrLine = Signal(str)
+    progress = Signal(int)  # lines of output received so far
+    finished = Signal(object)  # CommandResult
+
+    def __init__(self, cmd: list[str], cwd: str | None = None, env: dict[str, str] | None = None,
+                 parent: QObject | None = None):
+        super().__init__(parent)
+        self.cmd = cmd
+        self.future: Future = Future()
+        self.stdout_lines: list[str] = []
+        self.stderr_lines: list[str] = []
+        self.stdout_tail = b''
+        self.stderr_tail = b''
+        self.cancelled = False
+        self.start_time = 0.0
+        self.process = QProcess(self)
+        if cwd is not None:
+            self.process.setWorkingDirectory(cwd)
+        if env is not None:
+            environment = QProcessEnvironment()
+            for key, value in env.items():
+                environment.insert(key, value)
+            self.process.setProcessEnvironment(environment)
+        self.process.readyReadStandardOutput.connect(self.read_stdout)
+        self.process.readyReadStandardError.connect(self.read_stderr)
+        self.process.finished.connect(self.process_finished)
+        self.process.errorOccurred.connect(self.process_error)
+
+
+    def start(self):
+        self.future.set_running_or_notify_cancel()
+        self.start_time = time.perf_counter()
+        self.process.start(self.cmd[0], self.cmd[1:])
+        self.started.emit()
+
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time if self.start_time else 0.0
+
+
+    def running(self) -> bool:
+        return not self.future.done()
+
+
+    def cancel(self, grace_msecs: int = 3000):
+        if self.future.done():
+            return
+        self.cancelled = True
+        self.process.terminate()
+        QTimer.singleShot(grace_msecs, self.kill)
+
+
+    def kill(self):
+        if not self.future.done():
+            self.cancelled = True
+            self.process.kill()
+
+
+    def split_lines(self, data: bytes, tail: bytes) -> tuple[list[str], bytes]:
+        *lines, tail = (tail + data).split(b'\n')
+        return [line.rstrip(b'\r').decode(errors='replace') for line in lines], tail
+
+
+    def read_stdout(self):
+        lines, self.stdout_tail = self.split_lines(self.process.readAllStandardOutput().data(), self.stdout_tail)
+        self.emit_lines(lines, self.stdout_lines, self.stdoutLine)
+
+
+    def read_stderr(self):
+        lines, self.stderr_tail = self.split_lines(self.process.readAllStandardError().data(), self.stderr_tail)
+        self.emit_lines(lines, self.stderr_lines, self.stderrLine)
+
+
+    def emit_lines(self, lines: list[str], collected: list[str], signal: Signal):
+        if not lines:
+            return
+        collected.extend(lines)
+        for line in lines:
+            signal.emit(line)
+        self.progress.emit(len(self.stdout_lines) + len(self.stderr_lines))
+
+
+    def flush_tails(self):
+        self.read_stdout()
+        self.read_stderr()
+        if self.stdout_tail:
+            self.emit_lines([self.stdout_tail.decode(errors='replace')], self.stdout_lines, self.stdoutLine)
+            self.stdout_tail = b''
+        if self.stderr_tail:
+            self.emit_lines([self.stderr_tail.decode(errors='replace')], self.stderr_lines, self.stderrLine)
+            self.stderr_tail = b''
+
+
+    def process_finished(self, exit_code: int, exit_status: QProcess.ExitStatus):
+        self.flush_tails()
+        returncode = exit_code if exit_status == QProcess.NormalExit else -1
+        self.complete(returncode)
+
+
+    def process_error(self, error: QProcess.ProcessError):
+        if error == QProcess.FailedToStart:
+            self.complete(-1, self.process.errorString())
+
+
+    def complete(self, returncode: int, error: str | None = None):
+        if self.future.done():
+            return
+        result = CommandResult(self.cmd, returncode, self.stdout_lines, self.stderr_lines, self.elapsed,
+                               self.cancelled, error)
+        self.future.set_result(result)
+        self.finished.emit(result)
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Qt, Signal
+from PySide6.QtWidgets import QDialog, QDialogButtonBox, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem
+
+from asdf import ASDF
+from disk_usage import format_size, prune_plan
+from native import NativeBackend
+
+
+class PlanSignals(QObject):
+    planned = Signal(list)  # [(plugin, version)]
+
+
+class PlanTask(QRunnable):
+    # Reads every .tool-versions file in reach and lists every install, so it stays off the GUI thread
+    def __init__(self, native: NativeBackend, current_path: Path, signals: PlanSignals):
+        super().__init__()
+        self.native = native
+        self.current_path = current_path
+        self.signals = signals
+
+
+    def run(self):
+        self.signals.planned.emit(prune_plan(self.native, self.current_path))
+
+
+class PruneDialog(QDialog):
+    def __init__(self, asdf: ASDF, sizes: dict[str, dict[str, int]]):
+        super().__init__()
+        self.sizes = sizes
+        self.selected: list[tuple[str, str]] = []
+        self.setWindowTitle("Prune unreferenced versions")
+        self.resize(700, 600)
+
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(2)
+        self.tree.setColumnWidth(0, 350)
+        self.tree.setHeaderLabels(['plugin/version', 'size'])
+        self.summary = QLabel()
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Cancel)
+        self.uninstall_button = self.button_box.addButton("Uninstall selected", QDialogButtonBox.AcceptRole)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(super().reject)
+
+        native = asdf.native or NativeBackend(asdf.data_dir)
+        self.layout = QVBoxLayout()
+        self.layout.addWidget(QLabel(f"Installed versions not referenced by ~/{native.tool_versions_filename}, "
+                                     f"the directories above {asdf.current_path} or ASDF_*_VERSION:"))
+        self.layout.addWidget(self.tree)
+        self.layout.addWidget(self.summary)
+        self.layout.addWidget(self.button_box)
+        self.setLayout(self.layout)
+
+        self.uninstall_button.setEnabled(False)
+        self.summary.setText("Looking for unreferenced versions...")
+        self.signals = PlanSignals(self)
+        self.signals.planned.connect(self.planned)
+        self.pool = QThreadPool(self)
+        self.pool.start(PlanTask(native, asdf.current_path, self.signals))
+
+
+    def planned(self, plan: list[tuple[str, str]]):
+        plugin_items: dict[str, QTreeWidgetItem] = {}
+        for plugin, version in plan:
+            if (plugin_item := plugin_items.get(plugin)) is None:
+                plugin_item = plugin_items[plugin] = QTreeWidgetItem([plugin])
+                plugin_item.setFlags(plugin_item.flags() | Qt.ItemIsAutoTristate | Qt.ItemIsUserCheckable)
+                self.tree.addTopLevelItem(plugin_item)
+            item = QTreeWidgetItem([version, format_size(self.size(plugin, version))])
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(0, Qt.Checked)
+            plugin_item.addChild(item)
+        for plugin, plugin_item in plugin_items.items():
+            plugin_item.setText(1, format_size(sum(self.size(plugin, plugin_item.child(i).text(0)) or 0
+                                                   for i in range(plugin_item.childCount()))))
+        self.tree.expandAll()
+        self.tree.itemChanged.connect(self.update_selection)
+        self.update_selection()
+
+
+    def size(self, plugin: str, version: str) -> int | None:
+        return self.sizes.get(plugin, {}).get(version)
+
+
+    def update_selection(self):
+        self.selected = []
+        for i in range(self.tree.topLevelItemCount()):
+            plugin_item = self.tree.topLevelItem(i)
+            self.selected += [(plugin_item.text(0), plugin_item.child(j).text(0))
+                              for j in range(plugin_item.childCount())
+                              if plugin_item.child(j).checkState(0) == Qt.Checked]
+        total = sum(self.size(plugin, version) or 0 for plugin, version in self.selected)
+        self.summary.setText(f"{len(self.selected)} version(s) selected, {format_size(total)} to free")
+        self.uninstall_button.setEnabled(bool(self.selected))
@@ -0,0 +1,222 @@
+from threading import Lock
+
+from PySide6.QtCore import QObject, QRunnable, QThread, QThreadPool, Signal
+
+from asdf import ASDF
+from daemon import DaemonClient, DaemonError
+from disk_usage import SizeScanner
+
+
+class RefreshToken:
+    def __init__(self, generation: int, plugins: list[str] | None = None, fresh: bool = True):
+        self.generation = generation
+        self.plugins = plugins  # None: every plugin; otherwise only these rows are re-resolved
+        self.fresh = fresh  # False: a daemon may answer from its last poll
+        self.cancelled = False
+        self.done = False
+        self.pending = 0
+        self.lock = Lock()
+
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class RefreshSignals(QObject):
+    currentResolved = Signal(object, dict)  # token, {plugin: (current, path)}
+    pluginResolved = Signal(object, str, object, list, object)  # token, plugin, latest, versions, installed current
+    finished = Signal(object)  # token
+    sizesResolved = Signal(dict)  # {plugin: {version: bytes}}
+    daemonChanged = Signal(object)  # plugins the daemon saw change, None for all
+    daemonAttached = Signal(bool)  # whether refreshes now go to a daemon
+
+
+class CurrentTask(QRunnable):
+    def __init__(self, engine: 'RefreshEngine', token: RefreshToken):
+        super().__init__()
+        self.engine = engine
+        self.token = token
+
+
+    def run(self):
+        if self.token.cancelled:
+            return
+        current_versions = self.engine.asdf.current_versions(self.token.plugins)
+        if self.token.cancelled:
+            return
+        self.engine.signals.currentResolved.emit(self.token, current_versions)
+        plugins = sorted(current_versions.keys())
+        if not plugins:
+            self.token.done = True
+            self.engine.asdf.metrics.end_refresh(self.token.generation)
+            self.engine.signals.finished.emit(self.token)
+            return
+        with self.token.lock:
+            self.token.pending = len(plugins)
+        for plugin in plugins:
+            self.engine.pool.start(PluginTask(self.engine, self.token, plugin))
+
+
+class AttachTask(QRunnable):
+    # Connecting, pinging and subscribing are socket round trips; a stuck daemon must not hold up the window
+    def __init__(self, engine: 'RefreshEngine'):
+        super().__init__()
+        self.engine = engine
+
+
+    def run(self):
+        daemon = DaemonClient.connect()
+        self.engine.signals.daemonAttached.emit(daemon is not None and self.engine.attach(daemon))
+
+
+class DaemonTask(QRunnable):
+    # The whole refresh as one request to the daemon, whose rows are already warm; if it has gone away the
+    # engine drops it and this refresh continues in-process
+    def __init__(self, engine: 'RefreshEngine', token: RefreshToken):
+        super().__init__()
+        self.engine = engine
+        self.token = token
+
+
+    def run(self):
+        if self.token.cancelled:
+            return
+        if (daemon := self.engine.daemon) is None:  # detached since this task was queued
+            CurrentTask(self.engine, self.token).run()
+            return
+        try:
+            rows = daemon.call('tree', root=self.engine.asdf.data_dir.as_posix(),
+                               cwd=self.engine.asdf.current_path.as_posix(), plugins=self.token.plugins,
+                               fresh=self.token.fresh)
+        except DaemonError:
+            self.engine.detach()
+            CurrentTask(self.engine, self.token).run()
+            return
+        if self.token.cancelled:
+            return
+        self.engine.signals.currentResolved.emit(self.token, {row[0]: (row[1], row[3]) for row in rows})
+        for plugin, _, latest, _, versions, installed_current in rows:
+            self.engine.signals.pluginResolved.emit(self.token, plugin, latest, versions, installed_current)
+        if not self.token.cancelled:
+            self.token.done = True
+            self.engine.asdf.metrics.end_refresh(self.token.generation)
+            self.engine.signals.finished.emit(self.token)
+
+
+class PluginTask(QRunnable):
+    def __init__(self, engine: 'RefreshEngine', token: RefreshToken, plugin: str):
+        super().__init__()
+        self.engine = engine
+        self.token = token
+        self.plugin = plugin
+
+
+    def run(self):
+        try:
+            if self.token.cancelled:
+                return
+            latest = self.engine.asdf.latest_version(self.plugin)
+            if self.token.cancelled:
+                return
+            versions, current = self.engine.asdf.versions_list_installed(self.plugin)
+            if self.token.cancelled:
+                return
+            self.engine.signals.pluginResolved.emit(self.token, self.plugin, latest, versions, current)
+        finally:
+            with self.token.lock:
+                self.token.pending -= 1
+                done = self.token.pending == 0
+            if done and not self.token.cancelled:
+                self.token.done = True
+                self.engine.asdf.metrics.end_refresh(self.token.generation)
+                self.engine.signals.finished.emit(self.token)
+
+
+class SizesTask(QRunnable):
+    def __init__(self, engine: 'RefreshEngine'):
+        super().__init__()
+        self.engine = engine
+
+
+    def run(self):
+        try:
+            self.engine.signals.sizesResolved.emit(self.engine.size_scanner.scan())
+        finally:
+            self.engine.sizes_running = False
+
+
+class RefreshEngine(QObject):
+    def __init__(self, asdf: ASDF, max_workers: int | None = None, parent: QObject | None = None):
+        super().__init__(parent)
+        self.asdf = asdf.worker_copy()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers or min(8, max(2, QThread.idealThreadCount())))
+        self.signals = RefreshSignals(self)
+        self.token: RefreshToken | None = None
+        self.generation = 0
+        self.size_scanner = SizeScanner(self.asdf.data_dir / 'installs', self.asdf.cache)
+        # A pool of its own, so cancelling a refresh never drops a queued scan (which would leave sizes_running set)
+        self.sizes_pool = QThreadPool(self)
+        self.sizes_pool.setMaxThreadCount(1)
+        self.sizes_running = False
+        self.daemon: DaemonClient | None = None
+
+
+    def attach(self, daemon: DaemonClient) -> bool:
+        if not daemon.serves(self.asdf.root) or \
+                not daemon.subscribe(self.asdf.root, self.asdf.current_path, self.signals.daemonChanged.emit):
+            daemon.close()
+            return False
+        self.daemon = daemon
+        return True
+
+
+    def attach_async(self):
+        self.pool.start(AttachTask(self))
+
+
+    def detach(self):
+        if (daemon := self.daemon) is not None:
+            self.daemon = None
+            daemon.close()
+
+
+    def start(self, plugins: list[str] | None = None, fresh: bool = True) -> RefreshToken:
+        # A targeted refresh replaces an unfinished one, so it has to cover whatever that one still had to do
+        if self.token is not None and not self.token.done:
+            fresh = fresh or self.token.fresh
+            if plugins is not None:
+                plugins = None if self.token.plugins is None else sorted(set(plugins) | set(self.token.plugins))
+        self.cancel()
+        self.generation += 1
+        self.token = RefreshToken(self.generation, plugins, fresh)
+        self.asdf.metrics.begin_refresh(self.generation)
+        self.pool.start(DaemonTask(self, self.token) if self.daemon is not None else CurrentTask(self, self.token))
+        return self.token
+
+
+    def start_sizes(self):
+        # Sizes are slow on a cold cache and change rarely, so they run apart from (and after) the tree refresh
+        if not self.sizes_running:
+            self.sizes_running = True
+            self.sizes_pool.start(SizesTask(self))
+
+
+    def cancel(self):
+        if self.token is not None:
+            self.token.cancel()
+            self.asdf.metrics.discard_refresh(self.token.generation)
+            self.pool.clear()  # Drop queued (not yet running) tasks of the stale refresh
+        self.token = None
+
+
+    def is_current(self, token: RefreshToken) -> bool:
+        return token is self.token and not token.cancelled
+
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self.pool.waitForDone(msecs)
+
+
+    def wait_sizes(self, msecs: int = -1) -> bool:
+        return self.sizes_pool.waitForDone(msecs)
@@ -4,6 +4,10 @@ pip install --upgrade pip
 pip3 install pyinstaller
 pip3 install --upgrade PyInstaller pyinstaller-hooks-contrib
 pip3 install -r requirements.txt --force-reinstall
-pyinstaller --name="asdfg" --windowed --exclude-module _bootlocale --onefile main.py --noupx
-cp dist/asdfg ~/.local/bin/asdfg
-chmod a+x ~/.local/bin/asdfg
+# One directory rather than one file, so launching doesn't unpack the whole bundle to a temp dir every time
+pyinstaller --name="asdfg" --windowed --exclude-module _bootlocale --onedir cli.py --noupx
+tar -C dist -czf dist/asdfg.tar.gz asdfg
+rm -rf ~/.local/lib/asdfg
+mkdir -p ~/.local/lib ~/.local/bin
+cp -r dist/asdfg ~/.local/lib/asdfg
+ln -sf ~/.local/lib/asdfg/asdfg ~/.local/bin/asdfg
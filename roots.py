@@ -0,0 +1,107 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cache import default_cache_dir
+from native import NativeBackend, default_data_dir
+
+
+class Root:
+    __slots__ = ('name', 'data_dir', 'asdf_dir')
+
+    def __init__(self, name: str, data_dir: Path, asdf_dir: Path | None = None):
+        self.name = name
+        self.data_dir = data_dir
+        self.asdf_dir = asdf_dir  # None: whichever asdf is found on PATH, left to work out its own ASDF_DIR
+
+
+    def __repr__(self):
+        return f"Root({self.name!r}, {self.data_dir.as_posix()!r})"
+
+
+    def env(self) -> dict[str, str]:
+        env = {'ASDF_DATA_DIR': self.data_dir.as_posix()}
+        if self.asdf_dir is not None:
+            env['ASDF_DIR'] = self.asdf_dir.as_posix()
+        return env
+
+
+    def asdf_bin(self) -> Path | None:
+        if self.asdf_dir is not None and (path := self.asdf_dir / 'bin' / 'asdf').is_file():
+            return path
+        return None
+
+
+    def cache_path(self) -> Path:
+        # The default root keeps the cache it always had; other roots get one each, as their keys would collide
+        if self.data_dir.resolve() == default_data_dir().resolve():
+            return default_cache_dir()
+        digest = hashlib.sha1(self.data_dir.resolve().as_posix().encode()).hexdigest()
+        return default_cache_dir() / 'roots' / digest[:12]
+
+
+def display_path(path: Path) -> str:
+    try:
+        return f"~/{path.relative_to(Path.home()).as_posix()}"
+    except ValueError:
+        return path.as_posix()
+
+
+def default_root() -> Root:
+    data_dir = default_data_dir()
+    asdf_dir = os.environ.get('ASDF_DIR')
+    return Root(display_path(data_dir), data_dir, Path(asdf_dir).expanduser() if asdf_dir else None)
+
+
+def parse_root(entry: str) -> Root:
+    # `[name=]data_dir[,asdf_dir]`; a data dir with its own bin/asdf (a git clone install) is its own ASDF_DIR
+    name, sep, rest = entry.strip().partition('=')
+    if not sep:
+        name, rest = '', name
+    data, _, asdf = rest.partition(',')
+    data_dir = Path(data.strip()).expanduser()
+    if asdf.strip():
+        asdf_dir = Path(asdf.strip()).expanduser()
+    else:
+        asdf_dir = data_dir if (data_dir / 'bin' / 'asdf').is_file() else None
+    return Root(name.strip() or display_path(data_dir), data_dir, asdf_dir)
+
+
+def configured_roots() -> list[Root]:
+    # ASDFG_ROOTS lists the roots, separated like PATH; without it there is the one root asdf itself would use
+    roots: list[Root] = []
+    for entry in os.environ.get('ASDFG_ROOTS', '').split(os.pathsep):
+        if not entry.strip():
+            continue
+        root = parse_root(entry)
+        if all(root.data_dir != other.data_dir for other in roots):
+            roots.append(root)
+    return roots or [default_root()]
+
+
+def install_dirname(version: str) -> str:
+    return f"ref-{version[4:]}" if version.startswith('ref:') else version
+
+
+def installed_versions(root: Root) -> dict[tuple[str, str], Path]:
+    native = NativeBackend(root.data_dir)
+    try:
+        plugins = sorted(os.listdir(native.installs_path))
+    except OSError:
+        return {}
+    return {(plugin, version): native.installs_path / plugin / install_dirname(version)
+            for plugin in plugins for version in native.installed_versions(plugin)}
+
+
+def duplicate_versions(roots: list[Root]) -> list[tuple[str, str, list[tuple[Root, Path]]]]:
+    # (plugin, version, [(root, install path), ...]) for every version installed in more than one root
+    if not roots:
+        return []
+    with ThreadPoolExecutor(len(roots)) as executor:
+        scans = list(executor.map(installed_versions, roots))
+    found: dict[tuple[str, str], list[tuple[Root, Path]]] = {}
+    for root, versions in zip(roots, scans):
+        for key, path in versions.items():
+            found.setdefault(key, []).append((root, path))
+    return [(plugin, version, places) for (plugin, version), places in sorted(found.items()) if len(places) > 1]
@@ -0,0 +1,125 @@
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import (QDialog, QDialogButtonBox, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel,
+                               QTreeWidget, QTreeWidgetItem, QFileDialog)
+
+from asdf import ASDF
+from workspace import WorkspaceIndex, WorkspaceScanner
+
+
+class ScanSignals(QObject):
+    scanned = Signal(object, dict)  # WorkspaceIndex, {plugin: installed versions}
+
+
+class ScanTask(QRunnable):
+    def __init__(self, scanner: WorkspaceScanner, asdf: ASDF, root: Path, signals: ScanSignals):
+        super().__init__()
+        self.scanner = scanner
+        self.asdf = asdf
+        self.root = root
+        self.signals = signals
+
+
+    def run(self):
+        index = self.scanner.scan(self.root)
+        installed_plugins = set(self.asdf.plugins_list_installed())
+        installed = {plugin: self.asdf.versions_list_installed(plugin)[0]
+                     for plugin in index.plugins() if plugin in installed_plugins}
+        self.signals.scanned.emit(index, installed)
+
+
+class ScanWorkspaceDialog(QDialog):
+    def __init__(self, asdf: ASDF, scanner: WorkspaceScanner, root: Path):
+        super().__init__()
+        self.asdf = asdf.worker_copy()  # only ScanTask uses it, on the pool
+        self.scanner = scanner
+        self.missing: list[tuple[str, str]] = []
+        self.missing_plugins: list[str] = []
+        self.setWindowTitle("Scan workspace")
+        self.resize(900, 600)
+
+        self.root_edit = QLineEdit(root.as_posix())
+        self.browse_button = QPushButton("Browse...")
+        self.browse_button.clicked.connect(self.browse)
+        self.scan_button = QPushButton("Scan")
+        self.scan_button.clicked.connect(self.scan)
+        root_layout = QHBoxLayout()
+        root_layout.addWidget(self.root_edit)
+        root_layout.addWidget(self.browse_button)
+        root_layout.addWidget(self.scan_button)
+
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(3)
+        self.tree.setColumnWidth(0, 250)
+        self.tree.setColumnWidth(1, 150)
+        self.tree.setHeaderLabels(['plugin/version', 'status', 'used by'])
+        self.summary = QLabel()
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        self.install_button = self.button_box.addButton("Install missing", QDialogButtonBox.AcceptRole)
+        self.install_button.setEnabled(False)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(super().reject)
+
+        self.layout = QVBoxLayout()
+        self.layout.addLayout(root_layout)
+        self.layout.addWidget(self.tree)
+        self.layout.addWidget(self.summary)
+        self.layout.addWidget(self.button_box)
+        self.setLayout(self.layout)
+
+        self.signals = ScanSignals(self)
+        self.signals.scanned.connect(self.scanned)
+        self.pool = QThreadPool(self)
+        self.scanning = False
+        self.scan()
+
+
+    def browse(self):
+        directory = QFileDialog.getExistingDirectory(self, "Workspace root", self.root_edit.text())
+        if directory:
+            self.root_edit.setText(directory)
+            self.scan()
+
+
+    def scan(self):
+        if self.scanning:
+            return
+        root = Path(self.root_edit.text()).expanduser()
+        if not root.is_dir():
+            self.summary.setText(f"{root} is not a directory.")
+            return
+        self.scanning = True
+        self.scan_button.setEnabled(False)
+        self.browse_button.setEnabled(False)
+        self.install_button.setEnabled(False)
+        self.summary.setText(f"Scanning {root}...")
+        self.pool.start(ScanTask(self.scanner, self.asdf, root, self.signals))
+
+
+    def scanned(self, index: WorkspaceIndex, installed: dict[str, list[str]]):
+        self.scanning = False
+        self.scan_button.setEnabled(True)
+        self.browse_button.setEnabled(True)
+        self.tree.clear()
+        self.missing = index.missing(installed)
+        self.missing_plugins = sorted(index.plugins() - set(installed))
+        missing = set(self.missing)
+        red = QColor('red')
+        plugin_items: dict[str, QTreeWidgetItem] = {}
+        for (plugin, version), paths in sorted(index.tools.items()):
+            if (plugin_item := plugin_items.get(plugin)) is None:
+                status = "plugin not installed" if plugin in self.missing_plugins else ""
+                plugin_item = plugin_items[plugin] = QTreeWidgetItem([plugin, status])
+                self.tree.addTopLevelItem(plugin_item)
+            status = "missing" if (plugin, version) in missing else "installed"
+            item = QTreeWidgetItem([version, status, f"{len(paths)} file(s)"])
+            if status == "missing":
+                item.setForeground(1, red)
+            for path in paths:
+                item.addChild(QTreeWidgetItem(['', '', path.parent.relative_to(index.root).as_posix()]))
+            plugin_item.addChild(item)
+        self.summary.setText(f"{len(index.files)} file(s) in {index.directories} directories; "
+                             f"{len(self.missing)} missing version(s), {len(self.missing_plugins)} missing plugin(s).")
+        self.install_button.setEnabled(bool(self.missing))
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+from gzip import GzipFile
+from pathlib import Path
+
+from cache import default_cache_dir
+
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(text: str) -> int | None:
+    text = text.strip().upper().removesuffix('B')
+    try:
+        if text and text[-1] in SIZE_UNITS:
+            return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+        return int(text)
+    except ValueError:
+        return None
+
+
+def tree_digest(archive: str) -> str:
+    # sha256 over each member's path, type, mode, link target and contents, in archive order. Timestamps and owners
+    # are left out so the same install archived twice (or installed twice) gets the same digest.
+    digest = hashlib.sha256()
+    with tarfile.open(archive, 'r:gz') as tar:
+        for member in tar:
+            digest.update(json.dumps([member.name, member.type.decode('latin-1'), member.mode, member.linkname,
+                                      member.size]).encode('utf-8'))
+            if member.isfile() and (f := tar.extractfile(member)) is not None:
+                while chunk := f.read(1024 * 1024):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SnapshotStore:
+    # Archives of install directories, taken before an uninstall so a later install of the same version is an
+    # extraction instead of a rebuild. Archives are stored by the tree_digest of what they hold; a small ref file per
+    # install path points at one, and refs are evicted least-recently-used (by mtime) beyond `max_bytes`.
+    def __init__(self, path: Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path or default_cache_dir() / 'snapshots'
+        self.objects_path = self.path / 'objects'
+        self.refs_path = self.path / 'refs'
+        self.max_bytes = max_bytes
+
+
+    @classmethod
+    def create(cls) -> 'SnapshotStore | None':
+        # Opt-in: ASDFG_SNAPSHOTS=1, capped at ASDFG_SNAPSHOTS_MAX_SIZE (e.g. 20G, default 5G)
+        if os.environ.get('ASDFG_SNAPSHOTS', '0') in ('', '0'):
+            return None
+        max_bytes = parse_size(os.environ.get('ASDFG_SNAPSHOTS_MAX_SIZE', '')) or DEFAULT_MAX_BYTES
+        return cls(max_bytes=max_bytes)
+
+
+    def ref_path(self, install_path: Path) -> Path:
+        return self.refs_path / f"{hashlib.sha1(install_path.as_posix().encode()).hexdigest()}.json"
+
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects_path / f"{digest}.tar.gz"
+
+
+    def load_ref(self, install_path: Path) -> dict | None:
+        try:
+            ref = json.loads(self.ref_path(install_path).read_text('utf-8'))
+        except (OSError, ValueError):
+            return None
+        if ref.get('path') != install_path.as_posix() or not self.object_path(ref.get('digest', '')).is_file():
+            return None
+        return ref
+
+
+    def has(self, install_path: Path) -> bool:
+        return self.load_ref(install_path) is not None
+
+
+    def save(self, plugin: str, version: str, install_path: Path) -> dict | None:
+        if not install_path.is_dir() or install_path.is_symlink():
+            return None
+        self.objects_path.mkdir(parents=True, exist_ok=True)
+        self.refs_path.mkdir(parents=True, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=self.objects_path, prefix='.', suffix='.tmp')
+        try:
+            # Level 1 gzip: most of the size win at a fraction of the time, and extraction speed hardly differs.
+            # Member mtimes are kept so a restore looks like the original install (.pyc checks compare them).
+            with os.fdopen(fd, 'wb') as f, \
+                    GzipFile(filename='', mode='wb', compresslevel=1, fileobj=f, mtime=0) as gz, \
+                    tarfile.open(fileobj=gz, mode='w') as tar:
+                tar.add(install_path.as_posix(), arcname='.')
+            digest = tree_digest(temp)
+            size = os.path.getsize(temp)
+            if self.object_path(digest).is_file():
+                os.unlink(temp)
+            else:
+                os.replace(temp, self.object_path(digest))
+        except BaseException:
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+            raise
+        ref = {'path': install_path.as_posix(), 'plugin': plugin, 'version': version, 'digest': digest,
+               'size': size}
+        fd, temp = tempfile.mkstemp(dir=self.refs_path, prefix='.', suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(ref, f)
+        os.replace(temp, self.ref_path(install_path))
+        self.evict(keep=install_path)
+        return ref
+
+
+    def restore(self, install_path: Path) -> bool:
+        # Extracts next to the target and renames it into place, so a failed restore never leaves half a version
+        if install_path.exists() or (ref := self.load_ref(install_path)) is None:
+            return False
+        install_path.parent.mkdir(parents=True, exist_ok=True)
+        temp = Path(tempfile.mkdtemp(dir=install_path.parent, prefix=f".{install_path.name}.", suffix='.tmp'))
+        try:
+            with tarfile.open(self.object_path(ref['digest']), 'r:gz') as tar:
+                if hasattr(tarfile, 'tar_filter'):
+                    tar.extractall(temp, filter='tar')
+                else:
+                    tar.extractall(temp)
+            os.chmod(temp, 0o755)
+            os.rename(temp, install_path)
+        except BaseException:
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+        try:
+            os.utime(self.ref_path(install_path))  # most recently used
+        except OSError:
+            pass
+        return True
+
+
+    def refs(self) -> list[tuple[float, Path, dict]]:
+        found = []
+        try:
+            with os.scandir(self.refs_path) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.json'):
+                        continue
+                    try:
+                        found.append((entry.stat().st_mtime, Path(entry.path),
+                                      json.loads(Path(entry.path).read_text('utf-8'))))
+                    except (OSError, ValueError):
+                        continue
+        except OSError:
+            pass
+        return sorted(found, key=lambda item: item[0])
+
+
+    def evict(self, keep: Path | None = None):
+        refs = self.refs()
+        sizes = {ref.get('digest'): ref.get('size', 0) for _, _, ref in refs}
+        total = sum(sizes.values())
+        for _, ref_path, ref in refs:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and ref.get('path') == keep.as_posix():
+                continue
+            try:
+                ref_path.unlink()
+            except OSError:
+                continue
+            digest = ref.get('digest')
+            if not any(other.get('digest') == digest for _, path, other in refs if path.exists()):
+                try:
+                    self.object_path(digest).unlink()
+                except OSError:
+                    pass
+                total -= sizes.pop(digest, 0)
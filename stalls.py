@@ -0,0 +1,177 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QTimer
+
+
+DEFAULT_THRESHOLD_MS = 100
+HEARTBEAT_MS = 20
+SAMPLE_INTERVAL = 0.01
+APP_DIR = Path(__file__).resolve().parent
+MAX_STALLS = 256
+
+
+def frame_name(frame) -> str:
+    return f"{frame.f_code.co_name} ({Path(frame.f_code.co_filename).name}:{frame.f_lineno})"
+
+
+def stack(frame) -> tuple[str, ...]:
+    # Outermost frame first, as collapsed stacks are written
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    return tuple(frame_name(f) for f in reversed(frames))
+
+
+def call_site(frame) -> str:
+    # The innermost frame of asdfg's own code: the leaf is usually in Qt, subprocess or selectors, which says
+    # little about which of our calls blocked
+    leaf = frame
+    while frame is not None:
+        if Path(frame.f_code.co_filename).resolve().parent == APP_DIR:
+            return frame_name(frame)
+        frame = frame.f_back
+    return frame_name(leaf) if leaf is not None else '?'
+
+
+def threshold_from_env() -> int | None:
+    # ASDFG_WATCHDOG=1 turns it on at the default threshold, any larger number is the threshold in ms
+    value = os.environ.get('ASDFG_WATCHDOG', '0').strip()
+    try:
+        number = int(value or '0')
+    except ValueError:
+        return None
+    if number <= 0:
+        return None
+    return DEFAULT_THRESHOLD_MS if number == 1 else number
+
+
+class Stall:
+    __slots__ = ('started', 'duration', 'site', 'samples')
+
+    def __init__(self, started: float, duration: float, site: str, samples: list[tuple[str, ...]]):
+        self.started = started
+        self.duration = duration
+        self.site = site
+        self.samples = samples
+
+
+class StallWatchdog(QObject):
+    # A heartbeat timer on the GUI thread and a monitor thread that watches it. While the heartbeat is late by
+    # more than `threshold_ms` the monitor samples the main thread's Python stack every 10 ms; when the heartbeat
+    # comes back the samples become one stall, attributed to the call site seen most often.
+    def __init__(self, threshold_ms: int = DEFAULT_THRESHOLD_MS, parent: QObject | None = None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.main_thread = threading.main_thread().ident
+        self.timer = QTimer(self)
+        self.timer.setInterval(HEARTBEAT_MS)
+        self.timer.timeout.connect(self.heartbeat)
+        self.lock = threading.Lock()
+        self.last_beat = time.monotonic()
+        self.samples: list[tuple[str, ...]] = []
+        self.sites: list[str] = []
+        self.sampled_beat = self.last_beat
+        self.stalls: list[Stall] = []
+        self.dropped = 0
+        self.stopping = threading.Event()
+        self.thread: threading.Thread | None = None
+
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None
+
+
+    def start(self):
+        if self.running:
+            return
+        self.last_beat = time.monotonic()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.monitor, name='asdfg-stalls', daemon=True)
+        self.thread.start()
+        self.timer.start()
+
+
+    def stop(self):
+        if not self.running:
+            return
+        self.timer.stop()
+        self.stopping.set()
+        self.thread.join()
+        self.thread = None
+
+
+    def heartbeat(self):
+        now = time.monotonic()
+        with self.lock:
+            previous, self.last_beat = self.last_beat, now
+            samples, sites = (self.samples, self.sites) if self.sampled_beat == previous else ([], [])
+            self.samples, self.sites = [], []
+        # The timer's own interval is not part of the stall
+        duration = now - previous - HEARTBEAT_MS / 1000
+        if duration < self.threshold:
+            return
+        site = Counter(sites).most_common(1)[0][0] if sites else '(ended before it was sampled)'
+        self.stalls.append(Stall(time.time() - duration, duration, site, samples))
+        if len(self.stalls) > MAX_STALLS:
+            del self.stalls[0]
+            self.dropped += 1
+
+
+    def monitor(self):
+        while not self.stopping.wait(SAMPLE_INTERVAL):
+            with self.lock:
+                beat = self.last_beat
+            if time.monotonic() - beat < self.threshold + HEARTBEAT_MS / 1000:
+                continue
+            if (frame := sys._current_frames().get(self.main_thread)) is None:
+                continue
+            sample, site = stack(frame), call_site(frame)
+            del frame
+            with self.lock:
+                if self.last_beat != beat:
+                    continue  # the loop came back while we were looking
+                if self.sampled_beat != beat:
+                    self.sampled_beat, self.samples, self.sites = beat, [], []
+                self.samples.append(sample)
+                self.sites.append(site)
+
+
+    def report(self) -> list[dict]:
+        # Stalls by call site, the worst total first
+        sites: dict[str, dict] = {}
+        for stall in self.stalls:
+            entry = sites.setdefault(stall.site, {'site': stall.site, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                  'last': 0.0})
+            entry['count'] += 1
+            entry['total_ms'] += stall.duration * 1000
+            entry['max_ms'] = max(entry['max_ms'], stall.duration * 1000)
+            entry['last'] = max(entry['last'], stall.started)
+        return sorted(sites.values(), key=lambda entry: entry['total_ms'], reverse=True)
+
+
+    def collapsed_stacks(self) -> str:
+        # Brendan Gregg's collapsed format (`frame;frame;frame weight`) for flamegraph.pl, speedscope or inferno.
+        # Sampling only starts once a stall passes the threshold, so each stall's samples share its whole duration
+        # and the weights are its milliseconds.
+        weights: Counter[tuple[str, ...]] = Counter()
+        for stall in self.stalls:
+            for sample in stall.samples:
+                weights[sample] += stall.duration * 1000 / len(stall.samples)
+        return ''.join(f"{';'.join(frames)} {round(weight)}\n" for frames, weight in weights.most_common()
+                       if round(weight) > 0)
+
+
+    def export(self, path: Path):
+        path.write_text(self.collapsed_stacks(), 'utf-8')
+
+
+    def reset(self):
+        self.stalls.clear()
+        self.dropped = 0
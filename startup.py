@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+
+STARTED = time.perf_counter()
+
+
+def process_age(pid: int | str = 'self') -> float | None:
+    # Seconds since the process was exec'd, from the kernel's start time (Linux only)
+    try:
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+        start_ticks = int(stat[stat.rindex(')') + 2:].split()[19])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+INTERPRETER = process_age()
+# A one-file PyInstaller bundle (unpacked to a `_MEI*` temp dir) is unpacked by a parent bootloader process before
+# Python starts; a one-directory bundle has nothing to unpack
+ONEFILE = os.path.basename(getattr(sys, '_MEIPASS', '')).startswith('_MEI')
+UNPACK = (process_age(os.getppid()) or 0.0) - (INTERPRETER or 0.0) if ONEFILE else None
+
+
+class StartupProfile:
+    def __init__(self):
+        self.last = STARTED
+        self.phases: list[tuple[str, float]] = []
+        if UNPACK is not None:
+            self.phases.append(('unpack', UNPACK))
+        if INTERPRETER is not None:
+            self.phases.append(('interpreter', INTERPRETER))
+
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+
+    def report(self) -> dict[str, float]:
+        report = {phase: round(elapsed * 1000, 1) for phase, elapsed in self.phases}
+        report['total'] = round(sum(elapsed for _, elapsed in self.phases) * 1000, 1)
+        return report
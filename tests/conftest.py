@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules live flat at the top of the repository
+sys.path.insert(0, Path(__file__).resolve().parent.parent.as_posix())
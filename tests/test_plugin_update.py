@@ -0,0 +1,81 @@
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from cache import git_head
+from plugin_update import FAILED, UP_TO_DATE, UPDATED, PluginUpdater
+
+
+def git(*args: str, cwd: Path) -> str:
+    env = {**os.environ, 'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@example.com',
+           'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@example.com'}
+    return subprocess.run(['git', *args], cwd=cwd, env=env, check=True, capture_output=True, text=True).stdout
+
+
+def commit(work: Path, name: str):
+    (work / name).write_text(name)
+    git('add', name, cwd=work)
+    git('commit', '-q', '-m', name, cwd=work)
+    git('push', '-q', 'origin', 'HEAD:main', cwd=work)
+
+
+@pytest.fixture
+def plugins(tmp_path: Path) -> Path:
+    # A bare "remote", a working clone that pushes to it, and the plugin checkout asdf would have made
+    origin = tmp_path / 'origin.git'
+    git('init', '-q', '--bare', '-b', 'main', origin.as_posix(), cwd=tmp_path)
+    work = tmp_path / 'work'
+    git('clone', '-q', origin.as_posix(), work.as_posix(), cwd=tmp_path)
+    git('checkout', '-q', '-b', 'main', cwd=work)
+    commit(work, 'one')
+    plugins = tmp_path / 'plugins'
+    plugins.mkdir()
+    git('clone', '-q', origin.as_posix(), (plugins / 'demo').as_posix(), cwd=tmp_path)
+    return plugins
+
+
+def test_up_to_date_plugin_is_not_fetched(plugins: Path):
+    head = git_head(plugins / 'demo')
+    [update] = PluginUpdater(plugins).update_all(['demo'])
+    assert update.status == UP_TO_DATE
+    assert not update.moved
+    assert update.branch == 'main'
+    assert git_head(plugins / 'demo') == head
+
+
+def test_moved_remote_is_fetched_and_checked_out(plugins: Path, tmp_path: Path):
+    old = git_head(plugins / 'demo')
+    commit(tmp_path / 'work', 'two')
+    [update] = PluginUpdater(plugins).update_all(['demo'])
+    assert update.status == UPDATED
+    assert update.moved
+    assert update.old == old
+    assert update.new == git_head(plugins / 'demo') == git_head(tmp_path / 'work')
+    assert (plugins / 'demo' / 'two').is_file()
+
+
+def test_post_plugin_update_hook_gets_the_refs(plugins: Path, tmp_path: Path):
+    work = tmp_path / 'work'
+    (work / 'bin').mkdir()
+    hook = work / 'bin' / 'post-plugin-update'
+    hook.write_text('#!/bin/sh\necho "$ASDF_PLUGIN_PREV_REF $ASDF_PLUGIN_POST_REF" > "$ASDF_PLUGIN_PATH/hook.out"\n')
+    hook.chmod(0o755)
+    git('add', 'bin', cwd=work)
+    git('commit', '-q', '-m', 'hook', cwd=work)
+    git('push', '-q', 'origin', 'HEAD:main', cwd=work)
+    old = git_head(plugins / 'demo')
+    [update] = PluginUpdater(plugins).update_all(['demo'])
+    assert update.status == UPDATED
+    assert (plugins / 'demo' / 'hook.out').read_text().split() == [old, update.new]
+
+
+def test_unreachable_remote_fails_without_moving(plugins: Path, tmp_path: Path):
+    head = git_head(plugins / 'demo')
+    git('remote', 'set-url', 'origin', (tmp_path / 'missing.git').as_posix(), cwd=plugins / 'demo')
+    [update] = PluginUpdater(plugins).update_all(['demo'])
+    assert update.status == FAILED
+    assert update.error
+    assert not update.moved
+    assert git_head(plugins / 'demo') == head
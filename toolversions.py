@@ -0,0 +1,146 @@
+import os
+import secrets
+from pathlib import Path
+from threading import Lock
+
+
+def parse_tool_versions(text: str) -> dict[str, list[str]]:
+    tools = {}
+    for line in text.splitlines():
+        fields = line.split('#', 1)[0].split()
+        if len(fields) >= 2 and fields[0] not in tools:
+            tools[fields[0]] = fields[1:]
+    return tools
+
+
+def line_plugin(line: str) -> str | None:
+    fields = line.split('#', 1)[0].split()
+    return fields[0] if fields else None
+
+
+def write_atomic(path: Path, text: str):
+    # Write next to the target and rename over it, so readers never see a half-written file. A symlinked
+    # file (e.g. a dotfiles checkout) is replaced at its target, keeping the link.
+    target = path.resolve()
+    try:
+        mode = target.stat().st_mode & 0o7777
+    except OSError:
+        mode = None  # a new file: created 0o666 and left to the kernel to apply the umask, as asdf's would be
+    while True:
+        temp = target.parent / f".{target.name}.{secrets.token_hex(4)}.tmp"
+        try:
+            fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(temp, mode)
+        os.replace(temp, target)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+
+
+class ToolVersionsFile:
+    # The raw lines of a .tool-versions file. Edits only touch the lines of the plugins they name, so comments,
+    # blank lines, ordering and multi-version lines all survive.
+    def __init__(self, path: Path, lines: list[str] | None = None):
+        self.path = path
+        self.lines = lines or []
+
+
+    @classmethod
+    def read(cls, path: Path) -> 'ToolVersionsFile':
+        try:
+            return cls(path, path.read_text('utf-8').splitlines())
+        except FileNotFoundError:
+            return cls(path)
+
+
+    def tools(self) -> dict[str, list[str]]:
+        return parse_tool_versions('\n'.join(self.lines))
+
+
+    def set(self, plugin: str, versions: list[str]):
+        # Plugin names are matched exactly, so nodejs never touches nodejs-lts
+        found = False
+        for i, line in enumerate(self.lines):
+            if line_plugin(line) != plugin:
+                continue
+            code, sep, comment = line.partition('#')
+            trailing = code[len(code.rstrip()):] or (' ' if sep else '')
+            self.lines[i] = f"{plugin} {' '.join(versions)}{trailing}{sep}{comment}"
+            found = True
+        if not found:
+            self.lines.append(f"{plugin} {' '.join(versions)}")
+
+
+    def remove(self, plugin: str) -> bool:
+        lines = [line for line in self.lines if line_plugin(line) != plugin]
+        removed = len(lines) != len(self.lines)
+        self.lines = lines
+        return removed
+
+
+    def text(self) -> str:
+        return ''.join(f"{line}\n" for line in self.lines)
+
+
+    def write(self):
+        write_atomic(self.path, self.text())
+
+
+class ToolVersionsCache:
+    # Parsed .tool-versions contents keyed by path, re-read only when the file's mtime or size changes
+    def __init__(self):
+        self.parsed: dict[Path, tuple[tuple[int, int], dict[str, list[str]]]] = {}
+        self.lock = Lock()
+
+
+    @staticmethod
+    def stat(path: Path) -> tuple[int, int] | None:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+
+    def read(self, path: Path) -> dict[str, list[str]]:
+        if (key := self.stat(path)) is None:
+            return {}
+        with self.lock:
+            cached = self.parsed.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        try:
+            tools = parse_tool_versions(path.read_text('utf-8'))
+        except (OSError, UnicodeDecodeError):
+            tools = {}
+        with self.lock:
+            self.parsed[path] = (key, tools)
+        return tools
+
+
+    def edit(self, path: Path, changes: dict[str, list[str] | None]) -> tuple[list[str], list[str]]:
+        # Applies every change in one write; None removes the plugin. Returns the lines before and after.
+        file = ToolVersionsFile.read(path)
+        before = list(file.lines)
+        for plugin, versions in changes.items():
+            if versions is None:
+                file.remove(plugin)
+            else:
+                file.set(plugin, versions)
+        if file.lines != before:
+            file.write()
+        with self.lock:
+            self.parsed.pop(path, None)
+        return before, file.lines
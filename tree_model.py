@@ -0,0 +1,183 @@
+from typing import Any
+
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, QPersistentModelIndex, Qt
+from PySide6.QtGui import QFont
+
+
+class Row:
+    __slots__ = ('key', 'values', 'bold', 'disabled', 'children')
+
+    def __init__(self, key: str, values: tuple, bold: frozenset[int] = frozenset(), disabled: bool = False,
+                 children: list['Row'] | None = None):
+        self.key = key
+        self.values = values
+        self.bold = bold  # columns drawn in the bold font
+        self.disabled = disabled
+        self.children = children  # None leaves the node's current children alone
+
+
+class Node:
+    __slots__ = ('key', 'parent', 'row', 'values', 'bold', 'disabled', 'children')
+
+    def __init__(self, key: str, parent: 'Node | None', values: tuple = (), bold: frozenset[int] = frozenset(),
+                 disabled: bool = False):
+        self.key = key
+        self.parent = parent
+        self.row = 0
+        self.values = values
+        self.bold = bold
+        self.disabled = disabled
+        self.children: list[Node] = []
+
+
+    def child(self, key: str) -> 'Node | None':
+        return next((child for child in self.children if child.key == key), None)
+
+
+class TreeModel(QAbstractItemModel):
+    # A tree of keyed nodes. `update` diffs the wanted rows against what is there and only emits the
+    # insert/remove/move/dataChanged signals for the difference, so views keep expansion, selection and scroll
+    # position, and an unchanged refresh emits nothing. Any node can be a parent, e.g. a group per asdf root.
+    def __init__(self, headers: list[str], parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.root = Node('', None)
+        self.bold_font = QFont()
+        self.bold_font.setPointSize(12)
+        self.bold_font.setBold(True)
+        self.changes = 0  # rows inserted, removed, moved or changed; for tests and benchmarks
+
+
+    def index_of(self, node: Node, column: int = 0) -> QModelIndex:
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row, column, node)
+
+
+    def node(self, index: QModelIndex | QPersistentModelIndex) -> Node:
+        return index.internalPointer() if index.isValid() else self.root
+
+
+    def find(self, *keys: str) -> Node | None:
+        node = self.root
+        for key in keys:
+            if (node := node.child(key)) is None:
+                return None
+        return node
+
+
+    def key_path(self, index: QModelIndex) -> list[str]:
+        keys = []
+        node = self.node(index)
+        while node is not self.root:
+            keys.append(node.key)
+            node = node.parent
+        return keys[::-1]
+
+
+    def update(self, parent: Node, rows: list[Row]) -> int:
+        before = self.changes
+        wanted = {row.key for row in rows}
+        parent_index = self.index_of(parent)
+
+        # Drop vanished keys, a contiguous run at a time, from the bottom up so rows stay valid
+        end = len(parent.children)
+        while end > 0:
+            if parent.children[end - 1].key in wanted:
+                end -= 1
+                continue
+            start = end - 1
+            while start > 0 and parent.children[start - 1].key not in wanted:
+                start -= 1
+            self.beginRemoveRows(parent_index, start, end - 1)
+            del parent.children[start:end]
+            self.renumber(parent, start)
+            self.endRemoveRows()
+            self.changes += end - start
+            end = start
+
+        for position, row in enumerate(rows):
+            existing = parent.children[position] if position < len(parent.children) else None
+            if existing is None or existing.key != row.key:
+                if (node := parent.child(row.key)) is not None:
+                    self.beginMoveRows(parent_index, node.row, node.row, parent_index, position)
+                    parent.children.remove(node)
+                    parent.children.insert(position, node)
+                    self.renumber(parent, position)
+                    self.endMoveRows()
+                else:
+                    node = Node(row.key, parent, row.values, row.bold, row.disabled)
+                    self.beginInsertRows(parent_index, position, position)
+                    parent.children.insert(position, node)
+                    self.renumber(parent, position)
+                    self.endInsertRows()
+                self.changes += 1
+            else:
+                node = existing
+            self.update_node(node, row)
+        return self.changes - before
+
+
+    def update_node(self, node: Node, row: Row) -> int:
+        before = self.changes
+        if (node.values, node.bold, node.disabled) != (row.values, row.bold, row.disabled):
+            node.values, node.bold, node.disabled = row.values, row.bold, row.disabled
+            self.dataChanged.emit(self.index_of(node), self.index_of(node, len(self.headers) - 1))
+            self.changes += 1
+        if row.children is not None:
+            self.update(node, row.children)
+        return self.changes - before
+
+
+    @staticmethod
+    def renumber(parent: Node, start: int):
+        for row in range(start, len(parent.children)):
+            parent.children[row].row = row
+
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        node = self.node(parent)
+        if not 0 <= row < len(node.children) or not 0 <= column < len(self.headers):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        return self.index_of(index.internalPointer().parent)
+
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self.headers)
+
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid() or self.node(index).disabled:
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section < len(self.headers):
+            return self.headers[section]
+        return None
+
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        node = self.node(index)
+        if role == Qt.DisplayRole:
+            return node.values[index.column()] if index.column() < len(node.values) else None
+        if role == Qt.FontRole and index.column() in node.bold:
+            return self.bold_font
+        if role == Qt.UserRole:
+            return node.key
+        return None
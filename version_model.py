@@ -0,0 +1,115 @@
+import re
+from bisect import bisect_left, bisect_right
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QObject, Qt
+
+from versioning import parse_version, sort_versions
+
+
+class VersionIndex:
+    def __init__(self, versions: list[str]):
+        self.versions = versions
+        lowered = [v.lower() for v in versions]
+        # Substring search runs over one joined string (C speed); offsets map hits back to rows
+        self.haystack = '\n'.join(lowered)
+        self.offsets = []
+        offset = 0
+        for text in lowered:
+            self.offsets.append(offset)
+            offset += len(text) + 1
+        # Prefix search: sorted (text, row) pairs, answered with two bisections
+        self.prefixes = sorted((text, row) for row, text in enumerate(lowered))
+        self.prefix_keys = [text for text, _ in self.prefixes]
+        parsed = [parse_version(v) for v in versions]
+        self.stable = [v.stable for v in parsed]
+        self.lines = [v.line() for v in parsed]
+
+
+    def substring(self, query: str) -> list[int]:
+        rows = []
+        last = -1
+        for m in re.finditer(re.escape(query), self.haystack):
+            row = bisect_right(self.offsets, m.start()) - 1
+            if row != last:
+                rows.append(row)
+                last = row
+        return rows
+
+
+    def prefix(self, query: str) -> list[int]:
+        start = bisect_left(self.prefix_keys, query)
+        end = bisect_left(self.prefix_keys, query + '\uffff', start)
+        return sorted(row for _, row in self.prefixes[start:end])
+
+
+    def search(self, query: str) -> list[int]:
+        query = query.strip().lower()
+        if not query:
+            return list(range(len(self.versions)))
+        if query.startswith('^'):
+            return self.prefix(query[1:])
+        return self.substring(query)
+
+
+class VersionListModel(QAbstractListModel):
+    def __init__(self, versions: list[str] | None = None, parent: QObject | None = None):
+        super().__init__(parent)
+        self.index_ = VersionIndex([])
+        self.rows: list[int] = []
+        self.query = ''
+        self.stable_only = False
+        self.group_major = False
+        self.set_versions(versions or [])
+
+
+    def set_versions(self, versions: list[str]):
+        self.beginResetModel()
+        self.index_ = VersionIndex(sort_versions(versions))
+        self.rows = self.filtered_rows()
+        self.endResetModel()
+
+
+    def set_filter(self, query: str | None = None, stable_only: bool | None = None, group_major: bool | None = None):
+        self.query = self.query if query is None else query
+        self.stable_only = self.stable_only if stable_only is None else stable_only
+        self.group_major = self.group_major if group_major is None else group_major
+        rows = self.filtered_rows()
+        if rows != self.rows:
+            self.beginResetModel()
+            self.rows = rows
+            self.endResetModel()
+
+
+    def filtered_rows(self) -> list[int]:
+        index = self.index_
+        rows = index.search(self.query)
+        if self.stable_only:
+            stable = index.stable
+            rows = [row for row in rows if stable[row]]
+        if self.group_major:
+            # Versions are sorted ascending, so the last row seen for a line is its newest
+            newest = {}
+            for row in rows:
+                newest[index.lines[row]] = row
+            rows = sorted(newest.values())
+        return rows
+
+
+    def version(self, index: QModelIndex) -> str | None:
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        return self.index_.versions[self.rows[index.row()]]
+
+
+    def total(self) -> int:
+        return len(self.index_.versions)
+
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return self.version(index)
+        return None
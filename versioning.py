@@ -0,0 +1,133 @@
+import re
+from functools import lru_cache
+from typing import Iterable
+
+
+# `<vendor>-` prefix (temurin-17.0.2+8, pypy3.9-7.3.11), optional `v`, dotted release, then whatever follows
+VERSION_PATTERN = re.compile(r"""(?:([^\d].*?)[-_])?v?(\d+(?:\.\d+)*)(.*)""", re.DOTALL)
+TOKEN_PATTERN = re.compile(r"""\d+|[a-zA-Z]+""")
+# Same exclusions `asdf latest` applies before picking a version
+UNSTABLE_PATTERN = re.compile(r"""(^Available versions:|-src|-dev|-latest|-stm|[-.]rc|-milestone|-alpha|-beta|[-.]pre|"""
+                              r"""-next|(a|b|c)[0-9]+|snapshot|master)""", re.IGNORECASE)
+
+PRE_RELEASE_RANKS = {
+    'dev': 0, 'snapshot': 0, 'nightly': 0, 'master': 0, 'main': 0,
+    'a': 1, 'alpha': 1,
+    'b': 2, 'beta': 2,
+    'm': 3, 'milestone': 3, 'pre': 3, 'preview': 3, 'ea': 3, 'next': 3,
+    'c': 4, 'rc': 4, 'cr': 4,
+}
+RELEASE_RANK = 5
+POST_RELEASE_RANK = 6
+
+
+class Version:
+    __slots__ = ('text', 'prefix', 'release', 'key', 'stable')
+
+    def __init__(self, text: str):
+        self.text = text
+        if (m := VERSION_PATTERN.fullmatch(text)) is None:
+            self.prefix, self.release, rank, suffix = text.lower(), (), RELEASE_RANK, ()
+        else:
+            self.prefix = (m.group(1) or '').lower()
+            self.release = tuple(int(part) for part in m.group(2).split('.'))
+            tokens = TOKEN_PATTERN.findall(m.group(3))
+            if not tokens:
+                rank = RELEASE_RANK
+            elif tokens[0].isdigit():
+                rank = POST_RELEASE_RANK  # build numbers: 17.0.2+8, 1.2.3-1
+            else:
+                rank = PRE_RELEASE_RANKS.get(tokens[0].lower(), POST_RELEASE_RANK)
+            suffix = tuple((1, int(token), '') if token.isdigit() else (0, 0, token.lower()) for token in tokens)
+        release = self.release
+        while release and release[-1] == 0:  # 1.2 and 1.2.0 sort together
+            release = release[:-1]
+        self.key = (self.prefix, release, rank, suffix, text)
+        self.stable = UNSTABLE_PATTERN.search(text) is None
+
+
+    @property
+    def major(self) -> int | None:
+        return self.release[0] if self.release else None
+
+
+    def line(self, depth: int = 1) -> tuple:
+        return (self.prefix,) + self.release[:depth]
+
+
+    def __repr__(self):
+        return f"Version({self.text!r})"
+
+
+    def __str__(self):
+        return self.text
+
+
+    def __eq__(self, other):
+        return isinstance(other, Version) and self.key == other.key
+
+
+    def __lt__(self, other: 'Version') -> bool:
+        return self.key < other.key
+
+
+    def __le__(self, other: 'Version') -> bool:
+        return self.key <= other.key
+
+
+    def __gt__(self, other: 'Version') -> bool:
+        return self.key > other.key
+
+
+    def __ge__(self, other: 'Version') -> bool:
+        return self.key >= other.key
+
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+@lru_cache(maxsize=65536)
+def parse_version(text: str) -> Version:
+    return Version(text)
+
+
+def version_key(text: str) -> tuple:
+    return parse_version(text).key
+
+
+def sort_versions(items: Iterable[str], reverse: bool = False) -> list[str]:
+    return sorted(items, key=version_key, reverse=reverse)
+
+
+def max_version(items: Iterable[str]) -> str | None:
+    return max(items, key=version_key, default=None)
+
+
+def filter_stable(items: Iterable[str]) -> list[str]:
+    return [item for item in items if parse_version(item).stable]
+
+
+def latest_stable(versions: Iterable[str], query: str | None = None) -> str | None:
+    # What `asdf latest <plugin> [query]` prints without a latest-stable script: not the highest version, but the
+    # last stable entry in list-all order that starts with the query (with a digit when there is none)
+    latest = None
+    for version in versions:
+        version = version.strip()
+        if (version.startswith(query) if query else version[:1].isdigit()) and parse_version(version).stable:
+            latest = version
+    return latest
+
+
+def latest_in_line(versions: Iterable[str], current: str, depth: int = 1) -> str | None:
+    # Latest stable entry sharing `current`'s vendor prefix and first `depth` release numbers (1 = major, 2 = minor)
+    parsed = parse_version(current)
+    if len(parsed.release) < depth:
+        return None
+    line = parsed.line(depth)
+    latest = None
+    for version in versions:
+        version = version.strip()
+        if (candidate := parse_version(version)).stable and candidate.line(depth) == line:
+            latest = version
+    return latest
@@ -0,0 +1,108 @@
+import os
+from pathlib import Path
+
+from PySide6.QtCore import QFileSystemWatcher, QObject, QTimer, Signal
+
+from toolversions import parse_tool_versions
+
+
+class AsdfWatcher(QObject):
+    changed = Signal(object)  # sorted plugins whose rows are stale, or None when the set of plugins changed
+
+    def __init__(self, data_dir: Path, current_path: Path, debounce_msecs: int = 100, parent: QObject | None = None):
+        super().__init__(parent)
+        self.installs_path = data_dir / 'installs'
+        self.plugins_path = data_dir / 'plugins'
+        self.filename = os.environ.get('ASDF_DEFAULT_TOOL_VERSIONS_FILENAME', '.tool-versions')
+        # Directories are watched too: editors save by rename, and renames and new files only show up there
+        self.tool_versions_dirs = list(current_path.parents)[::-1] + [current_path]
+        if (home := Path.home()) not in self.tool_versions_dirs:
+            self.tool_versions_dirs.insert(0, home)
+        self.tool_versions: dict[Path, tuple[tuple[int, int] | None, dict[str, list[str]]]] = {}
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.path_changed)
+        self.watcher.fileChanged.connect(self.path_changed)
+        self.installed_plugins = {p.name for p in self.subdirectories(self.installs_path)}
+        self.dirty_plugins: set[str] = set()
+        self.dirty_all = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce_msecs)
+        self.timer.timeout.connect(self.flush)
+        for directory in self.tool_versions_dirs:
+            self.read_tool_versions(directory / self.filename)
+        self.sync_watches()
+
+
+    @staticmethod
+    def subdirectories(path: Path) -> list[Path]:
+        try:
+            with os.scandir(path) as entries:
+                return [Path(entry.path) for entry in entries if entry.is_dir()]
+        except OSError:
+            return []
+
+
+    def sync_watches(self):
+        wanted = [self.installs_path, self.plugins_path, *self.subdirectories(self.installs_path)]
+        for plugin_path in self.subdirectories(self.plugins_path):
+            wanted += [plugin_path, plugin_path / '.git']  # a fetch or merge touches .git, not the checkout
+        for directory in self.tool_versions_dirs:
+            wanted += [directory, directory / self.filename]
+        watched = set(self.watcher.directories()) | set(self.watcher.files())
+        missing = [p.as_posix() for p in wanted if p.as_posix() not in watched and p.exists()]
+        if missing:
+            self.watcher.addPaths(missing)
+
+
+    def stat(self, path: Path) -> tuple[int, int] | None:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+
+    def read_tool_versions(self, path: Path) -> dict[str, list[str]]:
+        try:
+            tools = parse_tool_versions(path.read_text('utf-8'))
+        except (OSError, UnicodeDecodeError):
+            tools = {}
+        self.tool_versions[path] = (self.stat(path), tools)
+        return tools
+
+
+    def path_changed(self, name: str):
+        path = Path(name)
+        if path == self.plugins_path:
+            self.dirty_all = True
+        elif path == self.installs_path:
+            installed = {p.name for p in self.subdirectories(path)}
+            self.dirty_plugins.update(installed ^ self.installed_plugins)
+            self.installed_plugins = installed
+        elif path.parent in (self.installs_path, self.plugins_path):
+            self.dirty_plugins.add(path.name)
+        elif path.parent.parent == self.plugins_path:
+            self.dirty_plugins.add(path.parent.name)
+        else:
+            # A directory in the chain changes for any file in it; only its .tool-versions matters
+            tool_versions = path if path.name == self.filename else path / self.filename
+            if tool_versions not in self.tool_versions:
+                return
+            if self.stat(tool_versions) == self.tool_versions[tool_versions][0]:
+                return
+            old = self.tool_versions[tool_versions][1]
+            new = self.read_tool_versions(tool_versions)
+            self.dirty_plugins.update(p for p in old.keys() | new.keys() if old.get(p) != new.get(p))
+        self.timer.start()
+
+
+    def flush(self):
+        # A renamed-over file drops out of the watch list, and new plugin or install directories need watching
+        self.sync_watches()
+        if self.dirty_all:
+            self.changed.emit(None)
+        elif self.dirty_plugins:
+            self.changed.emit(sorted(self.dirty_plugins))
+        self.dirty_plugins.clear()
+        self.dirty_all = False
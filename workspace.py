@@ -0,0 +1,152 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+
+from cache import DiskCache
+from toolversions import parse_tool_versions
+
+
+PRUNED_DIRS = {
+    '.git', '.hg', '.svn', '.idea', '.vscode', 'node_modules', 'bower_components', '.venv', 'venv', 'virtualenv',
+    '__pycache__', '.tox', '.nox', '.mypy_cache', '.pytest_cache', '.ruff_cache', '.gradle', '.terraform',
+    '.cache', '_build', 'deps', 'target', 'dist', 'build',
+}
+UNVERSIONED = ('system',)
+
+
+class WorkspaceIndex:
+    def __init__(self, root: Path):
+        self.root = root
+        self.tools: dict[tuple[str, str], list[Path]] = {}
+        self.files: list[Path] = []
+        self.directories = 0
+
+
+    def add(self, path: Path, tools: dict[str, list[str]]):
+        self.files.append(path)
+        for plugin, versions in tools.items():
+            for version in versions:
+                self.tools.setdefault((plugin, version), []).append(path)
+
+
+    def plugins(self) -> set[str]:
+        return {plugin for plugin, _ in self.tools}
+
+
+    def missing(self, installed: dict[str, list[str]]) -> list[tuple[str, str]]:
+        return sorted((plugin, version) for plugin, version in self.tools
+                      if version not in UNVERSIONED and not version.startswith('path:')
+                      and version not in installed.get(plugin, ()))
+
+
+class WorkspaceScanner:
+    def __init__(self, filename: str | None = None, cache: DiskCache | None = None, max_workers: int | None = None):
+        self.filename = filename or os.environ.get('ASDF_DEFAULT_TOOL_VERSIONS_FILENAME', '.tool-versions')
+        self.cache = cache
+        self.max_workers = max_workers or min(16, (os.cpu_count() or 2) * 2)
+        # path -> [dir mtime_ns, subdirectories, has tool file, tool file mtime_ns, parsed tools]
+        self.dirs: dict[str, list] = {}
+        self.dirs_root: Path | None = None  # the scan root `dirs` were loaded for and are saved under
+        self.visited: set[str] = set()
+        self.lock = Lock()
+        self.scan_lock = Lock()  # one scan at a time: `dirs` and `visited` belong to the scan in progress
+
+
+    def cache_key(self, root: Path) -> str:
+        return f"workspace:{root.as_posix()}:{self.filename}"
+
+
+    def scan_dir(self, path: str) -> tuple[list[str], dict[str, list[str]] | None]:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return [], None
+        cached = self.dirs.get(path)
+        if cached is None or cached[0] != mtime:
+            subdirs, has_file, is_venv = [], False, False
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if name == self.filename:
+                            has_file = entry.is_file()
+                        elif name == 'pyvenv.cfg':
+                            is_venv = True
+                        elif name not in PRUNED_DIRS and entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+            except OSError:
+                pass
+            cached = [mtime, [] if is_venv else subdirs, has_file, None, None]
+
+        tools = None
+        if cached[2]:
+            # Editing a file doesn't touch its directory's mtime, so the file is checked on its own
+            tool_file = os.path.join(path, self.filename)
+            try:
+                file_mtime = os.stat(tool_file).st_mtime_ns
+                if cached[3] != file_mtime:
+                    with open(tool_file, encoding='utf-8') as f:
+                        cached[4] = parse_tool_versions(f.read())
+                    cached[3] = file_mtime
+                tools = cached[4]
+            except (OSError, UnicodeDecodeError):
+                cached[3] = cached[4] = None
+        with self.lock:
+            self.dirs[path] = cached
+            self.visited.add(path)
+        return cached[1], tools
+
+
+    def walk(self, top: str) -> list[tuple[str, dict[str, list[str]]]]:
+        found = []
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            subdirs, tools = self.scan_dir(path)
+            if tools is not None:
+                found.append((path, tools))
+            stack.extend(subdirs)
+        return found
+
+
+    def scan(self, root: Path) -> WorkspaceIndex:
+        with self.scan_lock:
+            return self.scan_locked(root.resolve())
+
+
+    def scan_locked(self, root: Path) -> WorkspaceIndex:
+        if root != self.dirs_root:
+            # Saved under this root's key, so they must not carry another root's directories along
+            self.dirs = (self.cache.get(self.cache_key(root)) if self.cache is not None else None) or {}
+            self.dirs_root = root
+        index = WorkspaceIndex(root)
+        self.visited = set()
+
+        # Breadth-first until there are enough independent subtrees to keep the pool busy
+        found = []
+        frontier = [root.as_posix()]
+        while frontier and len(frontier) < self.max_workers * 4:
+            next_frontier = []
+            for path in frontier:
+                subdirs, tools = self.scan_dir(path)
+                if tools is not None:
+                    found.append((path, tools))
+                next_frontier.extend(subdirs)
+            frontier = next_frontier
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for subtree in executor.map(self.walk, frontier):
+                found.extend(subtree)
+
+        for path, tools in sorted(found):
+            index.add(Path(path) / self.filename, tools)
+        index.directories = len(self.visited)
+
+        # Forget directories that are gone, then persist for the next (incremental) scan
+        prefix = root.as_posix()
+        for path in [p for p in self.dirs if p not in self.visited]:
+            if path == prefix or path.startswith(prefix + '/'):
+                del self.dirs[path]
+        if self.cache is not None:
+            self.cache.set(self.cache_key(root), self.dirs)
+        return index